@@ -0,0 +1,336 @@
+import argparse
+import glob
+import hashlib
+import os
+import signal
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from main import validate_file, open_document, extract_document, connect_sql_storage, store_document, \
+    image_processing_summary
+from data_extractor.extractor import DataExtractor, EXTRACTOR_VERSION
+from data_extractor.records import PageText, Link, ImageRef, RecordBatch
+from data_extractor.image_processing import ImageOptions, ImageProcessor, ImageProcessingStats, EXECUTORS, PILLOW_FORMATS
+from storage.sqlite_storage import SQLiteStorage
+from storage.image_store import ImageStore, DedupStats
+from storage.extraction_cache import ExtractionCache, CacheRecorder, DEFAULT_MAX_BYTES
+from storage.search_index import SearchIndex
+from storage.ingest_manifest import IngestManifest, file_fingerprint, changed_pages
+from storage.storage import document_key
+from metrics import METRICS, PROFILERS, document, configure_log, serve_metrics
+
+SUPPORTED_EXTENSIONS = (".pdf", ".docx", ".pptx")
+
+class FileTimeoutError(Exception):
+    """Raised inside a worker when a single file takes longer than the per-file timeout."""
+    pass
+
+def collect_files(inputs, manifest=None):
+    """Expand directories, glob patterns and an optional manifest (one path per line) into file paths."""
+    candidates = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, names in os.walk(item):
+                candidates.extend(os.path.join(root, name) for name in sorted(names))
+        elif glob.has_magic(item):
+            candidates.extend(sorted(glob.glob(item, recursive=True)))
+        else:
+            candidates.append(item)
+    if manifest:
+        with open(manifest) as file:
+            candidates.extend(line.strip() for line in file if line.strip() and not line.startswith("#"))
+
+    files, seen = [], set()
+    for path in candidates:
+        if path.lower().endswith(SUPPORTED_EXTENSIONS) and path not in seen:
+            seen.add(path)
+            files.append(path)
+    return files
+
+def output_name(file_path):
+    """Name of a file's output folders and text files: its stem and a hash of its path.
+
+    Workers write concurrently, so same-named files from different folders (or a.pdf next
+    to a.docx) must not share output paths.
+    """
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+    digest = hashlib.sha256(document_key(file_path).encode("utf-8", "surrogateescape")).hexdigest()
+    return f"{stem}-{digest[:10]}"
+
+def _raise_timeout(signum, frame):
+    raise FileTimeoutError("Error : File processing timed out.")
+
+def _unchanged(file_path, fingerprint, start):
+    return {"file_name": os.path.basename(file_path), "ingest": "unchanged", "fingerprint": fingerprint}, \
+        time.perf_counter() - start
+
+def process_file(file_path, output_root, timeout=None, cache_dir=None, cache_max_bytes=DEFAULT_MAX_BYTES,
+                 write_images=True, image_store_dir=None, stage_threads=1, output_format="txt",
+                 ingest=False, previous=None, image_options=None, image_workers=1, image_executor="thread"):
+    """Worker entry point: loader -> DataExtractor -> file outputs for one file.
+
+    The timeout is enforced inside the worker with SIGALRM, so a slow file fails
+    on its own without blocking the rest of the batch. The signal is only handled between
+    Python bytecodes: a single long call into PyMuPDF or tabula runs to its end first.
+
+    With ingest=True the result carries the file's manifest fingerprint. `previous` is the
+    manifest entry of the last run: unchanged content is not extracted again, and of a
+    changed PDF/PPTX only the pages whose hash differs are.
+
+    With ImageOptions, images go through an ImageProcessor of image_workers before they are stored.
+    """
+    start = time.perf_counter()
+    extractor = image_processor = None
+    if timeout and hasattr(signal, "setitimer"):
+        signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        # Logged by the parent once the document is stored, as one line with the storage stages
+        with document(os.path.basename(file_path), log=False) as document_metrics:
+            fingerprint = file_fingerprint(file_path) if ingest else None
+            pages = changed = None
+            if previous is not None and previous["extractor_version"] == EXTRACTOR_VERSION:
+                if previous["content_hash"] == fingerprint["content_hash"]:
+                    # Touched or copied, but the same content
+                    return _unchanged(file_path, dict(fingerprint, page_hashes=previous["page_hashes"]), start)
+                # Per-page runs only rewrite complete text and link files, which the other formats go beyond
+                if previous["page_hashes"] and output_format == "txt":
+                    extractor = validate_file(file_path)
+                    fingerprint["page_hashes"] = extractor.page_hashes()
+                    changed, removed = changed_pages(previous["page_hashes"], fingerprint["page_hashes"])
+                    if not changed and not removed:
+                        return _unchanged(file_path, fingerprint, start)
+                    pages = changed | removed
+
+            cache = ExtractionCache(cache_dir, cache_max_bytes) if cache_dir else None
+            image_store = ImageStore(image_store_dir) if image_store_dir else None
+            if image_options is not None and image_options.enabled:
+                image_processor = ImageProcessor(image_options, image_workers, image_executor)
+            if extractor is None:
+                extractor = open_document(file_path, cache)
+            # Each document gets its own output folders so image and table names do not collide
+            name = output_name(file_path)
+            results = extract_document(
+                extractor,
+                output_image=os.path.join(output_root, "output_images", name) if write_images else None,
+                output_text=os.path.join(output_root, "output_text"),
+                output_tables=os.path.join(output_root, "output_tables", name),
+                output_name=name,
+                image_store=image_store,
+                concurrency=stage_threads,
+                output_format=output_format,
+                changed_pages=sorted(changed) if pages is not None else None,
+                image_processor=image_processor
+            )
+            # Columns are pickled back to the parent as a few objects per field instead of one per record
+            for kind, record_type in (("text_data", PageText), ("hyperlinks", Link), ("images", ImageRef)):
+                results[kind] = RecordBatch.from_records(record_type, results[kind])
+            if image_store is not None:
+                results["image_store_stats"] = image_store.stats.as_dict()
+            if image_processor is not None:
+                results["image_processing_stats"] = image_processor.stats.as_dict()
+            if ingest:
+                results["pages"] = pages
+                results["ingest"] = "full" if pages is None else "pages"
+                if pages is None:
+                    # Served from the extraction cache there is no document to hash pages of
+                    target = extractor.extractor if isinstance(extractor, CacheRecorder) else extractor
+                    fingerprint["page_hashes"] = target.page_hashes() if isinstance(target, DataExtractor) else None
+                results["fingerprint"] = fingerprint
+            if isinstance(extractor, CacheRecorder):
+                extractor.commit()
+        results["metrics"] = document_metrics.summary
+    except Exception:
+        if isinstance(extractor, CacheRecorder):
+            extractor.discard()
+        raise
+    finally:
+        if timeout and hasattr(signal, "setitimer"):
+            signal.setitimer(signal.ITIMER_REAL, 0)
+        if image_processor is not None:
+            image_processor.close()
+    return results, time.perf_counter() - start
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+def run_batch(files, workers=None, timeout=None, max_in_flight=None, output_root=".", sql_storage=None,
+              cache_dir=None, cache_max_bytes=DEFAULT_MAX_BYTES, write_images=True, image_store_dir=None,
+              stage_threads=1, output_format="txt", search_index=None, ingest_manifest=None, metrics_file=None,
+              image_options=None, image_workers=1, image_executor="thread"):
+    """Extract files in a process pool and store the results from this (single writer) process.
+
+    With an IngestManifest, files whose size and mtime are unchanged are skipped without being
+    submitted, and each stored file is recorded in the manifest after its rows are committed.
+    With metrics_file, the Prometheus text metrics are rewritten there after every file.
+    With ImageOptions, every worker also transcodes, downscales and thumbnails its file's images.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or workers * 2
+    latencies, failures = [], []
+    ingest_counts = {"skipped": 0, "unchanged": 0, "pages": 0, "full": 0}
+    image_store_stats = DedupStats()
+    image_processing_stats = ImageProcessingStats()
+    pending_files = iter(files)
+    in_flight = {}
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        def submit_next():
+            for file_path in pending_files:
+                previous = None
+                if ingest_manifest is not None:
+                    previous = ingest_manifest.get(file_path)
+                    if ingest_manifest.is_unchanged(previous, file_path):
+                        ingest_counts["skipped"] += 1
+                        continue
+                future = executor.submit(process_file, file_path, output_root, timeout, cache_dir, cache_max_bytes,
+                                         write_images, image_store_dir, stage_threads, output_format,
+                                         ingest_manifest is not None, previous, image_options, image_workers,
+                                         image_executor)
+                in_flight[future] = file_path
+                return True
+            return False
+
+        while len(in_flight) < max_in_flight and submit_next():
+            pass
+
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                file_path = in_flight.pop(future)
+                try:
+                    results, elapsed = future.result()
+                    if "image_store_stats" in results:
+                        image_store_stats.merge(results["image_store_stats"])
+                    if "image_processing_stats" in results:
+                        image_processing_stats.merge(results["image_processing_stats"])
+                    unchanged = results.get("ingest") == "unchanged"
+                    with document(results["file_name"], extracted=results.get("metrics")):
+                        if sql_storage is not None and not unchanged:
+                            store_document(sql_storage, results)
+                        if search_index is not None and not unchanged:
+                            search_index.add_document(results["document"], results["text_data"])
+                    if ingest_manifest is not None:
+                        ingest_manifest.record(file_path, results["fingerprint"])
+                        ingest_counts[results["ingest"]] += 1
+                    if metrics_file:
+                        METRICS.write_prometheus(metrics_file)
+                    latencies.append(elapsed)
+                    detail = f", {len(results['pages'])} pages" if results.get("pages") is not None else ""
+                    print(f"ok     {file_path} ({elapsed:.2f}s{detail})")
+                except Exception as e:
+                    failures.append((file_path, str(e) or type(e).__name__))
+                    print(f"failed {file_path}: {failures[-1][1]}")
+
+            while len(in_flight) < max_in_flight and submit_next():
+                pass
+
+    if search_index is not None:
+        search_index.commit()
+    total = time.perf_counter() - start
+    return {
+        "files": len(files) - ingest_counts["skipped"],
+        "succeeded": len(latencies),
+        "failed": len(failures),
+        "failures": failures,
+        "seconds": total,
+        "files_per_sec": len(latencies) / total if total else 0.0,
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95),
+        "image_store": image_store_stats.as_dict() if image_store_dir else None,
+        "image_db": sql_storage.image_dedup_stats() if sql_storage is not None else None,
+        "image_processing": image_processing_stats.as_dict() if image_options is not None and image_options.enabled else None,
+        "ingest": ingest_counts if ingest_manifest is not None else None
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract data from many PDF/DOCX/PPTX files in parallel.")
+    parser.add_argument("inputs", nargs="*", help="files, directories or glob patterns")
+    parser.add_argument("--manifest", help="text file with one input path per line")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--timeout", type=float, default=None,
+                        help="per-file timeout in seconds; checked between Python calls, so a long call into "
+                             "PyMuPDF or tabula finishes before the file fails")
+    parser.add_argument("--max-in-flight", type=int, default=None, help="files submitted but not yet finished (default: 2 x workers)")
+    parser.add_argument("--output", default=".", help="root folder for output_images/output_text/output_tables")
+    parser.add_argument("--sqlite", help="store into this SQLite file instead of the configured MySQL database")
+    parser.add_argument("--no-db", action="store_true", help="only write file outputs")
+    parser.add_argument("--no-image-files", action="store_true", help="keep extracted images in memory and only store them in the database")
+    parser.add_argument("--stage-threads", type=int, default=1, help="run the text/links/images/tables stages of a file concurrently")
+    parser.add_argument("--output-format", choices=("txt", "jsonl", "parquet"), default="txt",
+                        help="format of the per-file text, link, image and table records")
+    parser.add_argument("--search-index", help="add every page to the full-text index in this folder")
+    parser.add_argument("--ingest-manifest", help="SQLite file of ingested files; unchanged files and pages are skipped")
+    parser.add_argument("--metrics-log", help="append one JSON line of stage metrics per document to this file (- for stderr)")
+    parser.add_argument("--metrics-file", help="keep Prometheus text metrics in this file, e.g. for a textfile collector")
+    parser.add_argument("--metrics-port", type=int, help="serve Prometheus text metrics on http://0.0.0.0:PORT/metrics")
+    parser.add_argument("--profile-dir", help="write a profile of every document into this folder")
+    parser.add_argument("--profiler", choices=PROFILERS, default="cprofile", help="profiler used with --profile-dir")
+    parser.add_argument("--image-store", help="write each distinct image once into this content-addressed folder")
+    parser.add_argument("--cache-dir", help="reuse extraction results for unchanged files from this folder")
+    parser.add_argument("--cache-max-mb", type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024), help="extraction cache size cap")
+    parser.add_argument("--image-format", choices=tuple(PILLOW_FORMATS), help="re-encode every image in this format")
+    parser.add_argument("--image-quality", type=int, default=85, help="JPEG/WebP quality of re-encoded images")
+    parser.add_argument("--image-max-size", type=int, help="downscale images whose longer side exceeds this many pixels")
+    parser.add_argument("--thumbnail-size", type=int, help="also write a thumbnail of at most this many pixels per image")
+    parser.add_argument("--image-workers", type=int, default=1, help="threads (or processes) per file that process images")
+    parser.add_argument("--image-executor", choices=EXECUTORS, default="thread", help="pool used with --image-workers")
+    args = parser.parse_args()
+    image_options = ImageOptions(args.image_format, args.image_quality, args.image_max_size, args.thumbnail_size)
+
+    files = collect_files(args.inputs, args.manifest)
+    if not files:
+        parser.error("no PDF, DOCX or PPTX files found")
+
+    sql_storage = None
+    if args.sqlite:
+        sql_storage = SQLiteStorage(args.sqlite)
+        sql_storage.bootstrap()
+    elif not args.no_db:
+        sql_storage = connect_sql_storage()
+
+    if args.metrics_log:
+        configure_log(args.metrics_log)
+    if args.metrics_port:
+        serve_metrics(args.metrics_port)
+    if args.profile_dir:
+        # Read by every document() block, including those in the worker processes
+        os.environ["PROFILE_DIR"] = args.profile_dir
+        os.environ["PROFILER"] = args.profiler
+
+    ingest_manifest = IngestManifest(args.ingest_manifest) if args.ingest_manifest else None
+    try:
+        summary = run_batch(files, args.workers, args.timeout, args.max_in_flight, args.output, sql_storage,
+                            args.cache_dir, args.cache_max_mb * 1024 * 1024, not args.no_image_files,
+                            args.image_store, args.stage_threads, args.output_format,
+                            SearchIndex(args.search_index) if args.search_index else None, ingest_manifest,
+                            args.metrics_file, image_options, args.image_workers, args.image_executor)
+    finally:
+        if sql_storage is not None:
+            sql_storage.close()
+        if ingest_manifest is not None:
+            ingest_manifest.close()
+
+    print("------------------")
+    print(f"{summary['succeeded']}/{summary['files']} files in {summary['seconds']:.2f}s "
+          f"({summary['files_per_sec']:.2f} files/sec), {summary['failed']} failed")
+    print(f"per-file latency p50 {summary['p50']:.2f}s, p95 {summary['p95']:.2f}s")
+    if summary["ingest"]:
+        counts = summary["ingest"]
+        print(f"ingest manifest: {counts['skipped']} skipped, {counts['unchanged']} unchanged content, "
+              f"{counts['pages']} changed pages only, {counts['full']} full")
+    for label, stats in (("image store", summary["image_store"]), ("image blobs in db", summary["image_db"])):
+        if stats:
+            print(f"{label}: {stats['occurrences']} images -> {stats['unique']} new blobs, "
+                  f"dedup ratio {stats['dedup_ratio']:.2f}, {stats['bytes_saved']:,} bytes saved")
+    if summary["image_processing"]:
+        print(image_processing_summary(summary["image_processing"]))
+    sys.exit(1 if summary["failed"] else 0)
+
+if __name__ == "__main__":
+    main()
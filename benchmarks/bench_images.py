@@ -0,0 +1,48 @@
+"""Measure the image processing stage: images/sec and bytes saved per pool size, with and without draft decoding.
+
+    python -m benchmarks.bench_images sample.pdf --max-size 800 --workers 1 2 4
+
+The file's images are extracted once and kept in memory, then processed without writing
+anything. "full decode" turns off reducing_gap, so every image is decoded at full size
+and resampled in one step, as a plain resize() would.
+"""
+import argparse
+import time
+from data_extractor import image_processing
+from data_extractor.image_processing import ImageOptions, ImageProcessor
+
+def run(images, options, workers, executor):
+    start = time.perf_counter()
+    with ImageProcessor(options, workers, executor) as processor:
+        for _ in processor.process_all(images):
+            pass
+    return processor.stats.as_dict(), time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("file_path", nargs="?", default="sample.pdf")
+    parser.add_argument("--format", choices=tuple(image_processing.PILLOW_FORMATS))
+    parser.add_argument("--max-size", type=int, default=800)
+    parser.add_argument("--thumbnail-size", type=int)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--executor", choices=image_processing.EXECUTORS, default="thread")
+    args = parser.parse_args()
+
+    from main import validate_file
+    images = list(validate_file(args.file_path).iter_images(None))
+    options = ImageOptions(args.format, max_size=args.max_size, thumbnail_size=args.thumbnail_size)
+    print(f"{len(images)} images, {sum(image.size for image in images):,} bytes")
+    print(f"{'decode':12} {'workers':>7} {'images/sec':>11} {'transformed':>12} {'bytes saved':>13}")
+    reducing_gap = image_processing.REDUCING_GAP
+    for label, gap in (("draft", reducing_gap), ("full decode", None)):
+        image_processing.REDUCING_GAP = gap
+        try:
+            for workers in args.workers:
+                stats, seconds = run(images, options, workers, args.executor)
+                print(f"{label:12} {workers:>7} {len(images) / seconds:>11.1f} {stats['transformed']:>12} "
+                      f"{stats['bytes_saved']:>13,}")
+        finally:
+            image_processing.REDUCING_GAP = reducing_gap
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Compare write and read-back speed of the str(list) text dump against JSONL and Parquet output.
+
+    python -m benchmarks.bench_output_formats --pages 50000
+
+Parquet needs pyarrow; without it that format is skipped.
+"""
+import argparse
+import ast
+import os
+import tempfile
+import time
+from storage.file_storage import FileStorage
+from storage.jsonl_storage import JSONLStorage
+from storage.parquet_storage import ParquetStorage
+
+def make_pages(count):
+    return [{
+        "page_number": page_num,
+        "text": "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 20,
+        "headings": ["LOREM IPSUM"],
+        "font_styles": {"bold": 3, "italic": 1, "fonts": {"Arial": 12}, "sizes": {"11.0": 12}}
+    } for page_num in range(1, count + 1)]
+
+def read_txt(file_path):
+    with open(file_path) as file:
+        return ast.literal_eval(file.read())
+
+FORMATS = (
+    ("txt", FileStorage, read_txt, None),
+    ("jsonl", JSONLStorage, lambda path: list(JSONLStorage.read_data(path)), None),
+    ("parquet", ParquetStorage, ParquetStorage.read_data,
+     lambda path: ParquetStorage.read_data(path, columns=["page_number"])),
+)
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=20000)
+    args = parser.parse_args()
+    pages = make_pages(args.pages)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, storage_class, read, scan in FORMATS:
+            file_path = os.path.join(tmp, f"pages.{storage_class.extension}")
+            try:
+                _, write_seconds = timed(storage_class(None).store_data, pages, file_path)
+            except ImportError as e:
+                print(f"{name:8} skipped: {e}")
+                continue
+            records, read_seconds = timed(read, file_path)
+            assert len(records) == len(pages)
+            line = (f"{name:8} write {write_seconds:.3f}s  read {read_seconds:.3f}s  "
+                    f"{os.path.getsize(file_path) / 1e6:.1f} MB")
+            if scan:
+                _, scan_seconds = timed(scan, file_path)
+                line += f"  one-column scan {scan_seconds:.3f}s"
+            print(line)
+
+if __name__ == "__main__":
+    main()
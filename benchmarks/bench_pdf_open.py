@@ -0,0 +1,63 @@
+"""Compare wall-clock and peak RSS of the PyPDF2 flow against the single PyMuPDF handle.
+
+Each mode runs in a fresh interpreter so peak RSS is measured per file:
+
+    python -m benchmarks.bench_pdf_open sample.pdf --repeat 5
+
+Tables are left out because both modes hand them to tabula the same way.
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+def run_once(mode, file_path):
+    from PyPDF2 import PdfReader
+    from loader.pdf_loader import PDFLoader
+    from data_extractor.pdfExtractor import PdfExtractor
+
+    start = time.perf_counter()
+    if mode == "pypdf2":
+        # Old flow: throwaway PdfReader for validation, then the loader parses again
+        with open(file_path, 'rb') as file:
+            PdfReader(file)
+        extractor = PdfExtractor(PDFLoader())
+    else:
+        extractor = PdfExtractor(PDFLoader(backend="pymupdf"))
+    extractor.load(file_path)
+    with tempfile.TemporaryDirectory() as output_folder:
+        extractor.extract_text()
+        extractor.extract_links()
+        extractor.extract_images(output_folder)
+    elapsed = time.perf_counter() - start
+    peak_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({"seconds": elapsed, "peak_rss_kb": peak_rss_kb}))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("file_path")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--run", choices=("pypdf2", "pymupdf"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run_once(args.run, args.file_path)
+        return
+
+    for mode in ("pypdf2", "pymupdf"):
+        samples = []
+        for _ in range(args.repeat):
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_pdf_open", args.file_path, "--run", mode],
+                check=True, capture_output=True, text=True
+            ).stdout
+            samples.append(json.loads(output.strip().splitlines()[-1]))
+        best = min(sample["seconds"] for sample in samples)
+        peak = max(sample["peak_rss_kb"] for sample in samples)
+        print(f"{mode:8} best {best * 1000:.1f} ms, peak RSS {peak / 1024:.1f} MiB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Compare the in-process PyMuPDF table engine against tabula on throughput and CSV output.
+
+    python -m benchmarks.bench_pdf_tables sample.pdf --repeat 5
+    python -m benchmarks.bench_pdf_tables sample.pdf --reference output_tables
+
+Without a Java runtime the tabula run is skipped; --reference compares against
+CSVs tabula wrote earlier (table_pdf_<n>.csv) instead.
+"""
+import argparse
+import csv
+import os
+import tempfile
+import time
+from loader.pdf_loader import PDFLoader
+from data_extractor.pdfExtractor import PdfExtractor
+
+def run_engine(file_path, engine, repeat):
+    """Best wall time over repeat runs and the CSV paths of the last run."""
+    extractor = PdfExtractor(PDFLoader(backend="pymupdf"), table_engine=engine)
+    extractor.load(file_path)
+    best, output_folder = None, tempfile.mkdtemp()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        paths = extractor.extract_tables(output_folder)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, paths
+
+def normalise_cell(value):
+    # tabula infers floats for integer columns ("1998.0"), PyMuPDF keeps the text ("1998")
+    value = value.strip()
+    try:
+        number = float(value)
+    except ValueError:
+        return " ".join(value.split())
+    return str(int(number)) if number.is_integer() else str(number)
+
+def read_csv(path):
+    with open(path, newline='') as file:
+        return [[normalise_cell(cell) for cell in row] for row in csv.reader(file)]
+
+def compare(paths, reference_paths):
+    matching = sum(1 for path, reference in zip(paths, reference_paths) if read_csv(path) == read_csv(reference))
+    return f"{matching}/{max(len(paths), len(reference_paths))} tables equivalent"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("file_path")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--reference", help="folder with table_pdf_<n>.csv files previously written by tabula")
+    args = parser.parse_args()
+
+    pymupdf_seconds, pymupdf_paths = run_engine(args.file_path, "pymupdf", args.repeat)
+    print(f"pymupdf  best {pymupdf_seconds * 1000:.1f} ms, {len(pymupdf_paths)} tables")
+
+    reference_paths = None
+    try:
+        tabula_seconds, reference_paths = run_engine(args.file_path, "tabula", args.repeat)
+        print(f"tabula   best {tabula_seconds * 1000:.1f} ms, {len(reference_paths)} tables "
+              f"({tabula_seconds / pymupdf_seconds:.1f}x slower)")
+    except Exception as e:
+        print(f"tabula   skipped: {type(e).__name__}")
+
+    if args.reference:
+        reference_paths = [os.path.join(args.reference, f"table_pdf_{i + 1}.csv") for i in range(len(pymupdf_paths))]
+        reference_paths = [path for path in reference_paths if os.path.exists(path)]
+    if reference_paths is not None:
+        print(compare(pymupdf_paths, reference_paths))
+
+if __name__ == "__main__":
+    main()
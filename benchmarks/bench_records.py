@@ -0,0 +1,64 @@
+"""Compare the memory and pickling cost of dict records against the slotted record types and RecordBatch.
+
+    python -m benchmarks.bench_records sample.pdf --copies 200
+
+The text, link and image records of the file are repeated `copies` times, to stand in for a
+large corpus. Each container (dict, record, batch column) is then built around the same
+field values, so the reported bytes are the per-record overhead of the container alone.
+Pickling is measured the way batch.py hands a document from a worker to the parent.
+"""
+import argparse
+import pickle
+import tempfile
+import time
+import tracemalloc
+from data_extractor.records import PageText, Link, ImageRef, RecordBatch
+
+KINDS = (("text", PageText, "extract_text"), ("links", Link, "extract_links"), ("images", ImageRef, "extract_images"))
+
+def allocated(build):
+    """Bytes still allocated by build() once it returned, and its result."""
+    tracemalloc.start()
+    try:
+        result = build()
+        size = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return size, result
+
+def pickle_cost(value):
+    start = time.perf_counter()
+    payload = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+    pickle.loads(payload)
+    return len(payload), time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("file_path", nargs="?", default="sample.pdf")
+    parser.add_argument("--copies", type=int, default=200, help="times the file's records are repeated")
+    args = parser.parse_args()
+
+    from main import validate_file
+    extractor = validate_file(args.file_path)
+    with tempfile.TemporaryDirectory() as output_folder:
+        extracted = {kind: getattr(extractor, method)(*([output_folder] if kind == "images" else []))
+                     for kind, _, method in KINDS}
+
+    print(f"{'records':8} {'count':>8} {'dict B/rec':>11} {'slots B/rec':>12} {'batch B/rec':>12} "
+          f"{'dict pickle':>12} {'slots pickle':>13} {'batch pickle':>13}")
+    for kind, record_type, _ in KINDS:
+        # Field values are shared by every container, so only the containers are measured
+        values = [tuple(record[name] for name in record_type.__slots__) for record in extracted[kind]] * args.copies
+        if not values:
+            continue
+        names = record_type.__slots__
+        dict_bytes, dicts = allocated(lambda: [dict(zip(names, row)) for row in values])
+        record_bytes, records = allocated(lambda: [record_type(*row) for row in values])
+        batch_bytes, batch = allocated(lambda: RecordBatch.from_records(record_type, records))
+        count = len(values)
+        costs = [pickle_cost(value) for value in (dicts, records, batch)]
+        print(f"{kind:8} {count:>8} {dict_bytes / count:>11.1f} {record_bytes / count:>12.1f} {batch_bytes / count:>12.1f} "
+              + " ".join(f"{size / 1024 / 1024:>6.1f}MB {seconds * 1000:>5.0f}ms" for size, seconds in costs))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Build a SearchIndex over a generated corpus and time term, multi-term and phrase queries.
+
+    python -m benchmarks.bench_search --pages 100000 --words 200
+
+Word frequencies follow Zipf's law, so "w1" is in nearly every page and "w5000" in few.
+"""
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+from storage.search_index import SearchIndex
+
+QUERIES = ("w5000", "w3", "w20 w300 w4000", '"w1 w2"', '"w10 w11" w700')
+
+def make_pages(count, words, vocabulary, seed=0):
+    generator = np.random.default_rng(seed)
+    ranks = np.arange(1, vocabulary + 1)
+    probabilities = 1.0 / ranks
+    probabilities /= probabilities.sum()
+    # Drawing every page at once is much faster than one weighted draw per page
+    tokens = generator.choice(ranks, size=(count, words), p=probabilities)
+    for page_number, page_tokens in enumerate(tokens, start=1):
+        yield {"page_number": page_number, "text": " ".join(f"w{rank}" for rank in page_tokens), "headings": []}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=50000)
+    parser.add_argument("--words", type=int, default=200, help="words per page")
+    parser.add_argument("--vocabulary", type=int, default=50000)
+    parser.add_argument("--pages-per-file", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        search_index = SearchIndex(tmp)
+        pages = make_pages(args.pages, args.words, args.vocabulary)
+        start = time.perf_counter()
+        for file_number in range(-(-args.pages // args.pages_per_file)):
+            file_pages = (page for _, page in zip(range(args.pages_per_file), pages))
+            search_index.add_document(f"file_{file_number}.pdf", file_pages)
+        search_index.commit()
+        build_seconds = time.perf_counter() - start
+        size = sum(os.path.getsize(os.path.join(tmp, name)) for name in os.listdir(tmp))
+        print(f"indexed {args.pages} pages in {build_seconds:.1f}s ({args.pages / build_seconds:,.0f} pages/sec), "
+              f"{len(search_index.manifest['segments'])} segments, {size / 1e6:.1f} MB on disk")
+
+        # A fresh reader maps the segments like a query process would
+        search_index.close()
+        reader = SearchIndex(tmp)
+        for query in QUERIES:
+            best = None
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                hits = reader.search(query, 10)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            print(f"{query:22} {best * 1000:7.2f} ms, {len(hits)} hits")
+        reader.close()
+
+if __name__ == "__main__":
+    main()
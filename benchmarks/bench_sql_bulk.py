@@ -0,0 +1,57 @@
+"""Compare per-row inserts against the batched bulk-insert path of SQLStorage.
+
+Runs against the SQLiteStorage stand-in so no MySQL server is needed:
+
+    python -m benchmarks.bench_sql_bulk --rows 2000 --batch-size 500
+"""
+import argparse
+import os
+import tempfile
+import time
+from storage.sqlite_storage import SQLiteStorage
+
+def make_rows(count):
+    return [{
+        "page_number": page_num,
+        "text": "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 20,
+        "headings": ["LOREM IPSUM"],
+        "font_styles": {"bold": 3, "italic": 1, "fonts": {"Arial": 12}, "sizes": {11.0: 12}}
+    } for page_num in range(1, count + 1)]
+
+def run(storage_factory, insert, rows):
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = storage_factory(os.path.join(tmp, "bench.db"))
+        storage.create_table_if_not_exists()
+        start = time.perf_counter()
+        insert(storage, rows)
+        elapsed = time.perf_counter() - start
+        storage.close()
+    return elapsed
+
+def per_row(storage, rows):
+    for data in rows:
+        storage.insert_data(
+            file_name="bench.pdf",
+            page_number=data.get('page_number'),
+            text=data.get('text'),
+            headings=data.get('headings'),
+            font_styles=data.get('font_styles')
+        )
+
+def bulk(storage, rows):
+    storage.insert_text_rows("bench.pdf", rows)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    factory = lambda path: SQLiteStorage(path, batch_size=args.batch_size)
+    for name, insert in (("per-row", per_row), ("bulk", bulk)):
+        elapsed = run(factory, insert, rows)
+        print(f"{name:8} {args.rows} rows in {elapsed:.3f}s -> {args.rows / elapsed:,.0f} rows/sec")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Time typical lookups on the file_name-keyed schema, migrate it, and time them on the documents schema.
+
+Runs against the SQLiteStorage stand-in (no FULLTEXT there, so text search is not compared):
+
+    python -m benchmarks.bench_sql_queries --documents 200 --pages 50
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from storage.sqlite_storage import SQLiteStorage
+
+# The tables as SQLStorage created them before the documents table: no indexes, bytes in every image row
+LEGACY_SCHEMA = (
+    "CREATE TABLE extracted_text (id INT AUTO_INCREMENT PRIMARY KEY, file_name TEXT NOT NULL, "
+    "page_number INT, text TEXT, headings TEXT, font_styles TEXT)",
+    "CREATE TABLE extracted_links (id INT AUTO_INCREMENT PRIMARY KEY, file_name TEXT NOT NULL, "
+    "page_number INT, linked_text TEXT, url TEXT)",
+    "CREATE TABLE extracted_images (id INT AUTO_INCREMENT PRIMARY KEY, file_name TEXT NOT NULL, "
+    "page_number INT, image_path TEXT NOT NULL, image LONGBLOB, image_resolution VARCHAR(20), image_size BIGINT)",
+)
+
+LEGACY_QUERIES = {
+    "pages of a document": ("SELECT page_number, text FROM extracted_text WHERE file_name = ? ORDER BY page_number",
+                            "document_37.pdf"),
+    "links to a domain": ("SELECT file_name, page_number, url FROM extracted_links WHERE url LIKE ?",
+                          "https://site7.example.com/%"),
+    "images of a document": ("SELECT page_number, image_path FROM extracted_images WHERE file_name = ? "
+                             "ORDER BY page_number", "document_37.pdf"),
+}
+
+def fill_legacy(path, documents, pages, image_kb):
+    random.seed(0)
+    images = [os.urandom(image_kb * 1024) for _ in range(10)]
+    connection = sqlite3.connect(path)
+    for statement in LEGACY_SCHEMA:
+        connection.execute(statement)
+    for document in range(documents):
+        file_name = f"document_{document}.pdf"
+        connection.executemany("INSERT INTO extracted_text (file_name, page_number, text, headings, font_styles) "
+                               "VALUES (?, ?, ?, '[]', '{}')",
+                               [(file_name, page, "Lorem ipsum dolor sit amet. " * 60) for page in range(1, pages + 1)])
+        connection.executemany("INSERT INTO extracted_links (file_name, page_number, linked_text, url) VALUES (?, ?, ?, ?)",
+                               [(file_name, page, "link", f"https://site{random.randrange(20)}.example.com/page/{page}")
+                                for page in range(1, pages + 1)])
+        connection.executemany("INSERT INTO extracted_images (file_name, page_number, image_path, image, "
+                               "image_resolution, image_size) VALUES (?, ?, ?, ?, '640 x 480', ?)",
+                               [(file_name, page, f"image_page_{page}_1.png", images[page % 10], image_kb * 1024)
+                                for page in range(1, pages + 1)])
+    connection.commit()
+    connection.close()
+
+def best_of(repeat, function, *args):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = function(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, len(rows)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, default=200)
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--image-kb", type=int, default=32)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        fill_legacy(path, args.documents, args.pages, args.image_kb)
+
+        connection = sqlite3.connect(path)
+        legacy = {name: best_of(args.repeat, lambda query, param: connection.execute(query, (param,)).fetchall(),
+                                query, param)
+                  for name, (query, param) in LEGACY_QUERIES.items()}
+        connection.close()
+
+        start = time.perf_counter()
+        with SQLiteStorage(path) as storage:
+            storage.bootstrap()
+            migration_seconds = time.perf_counter() - start
+            indexed = {
+                "pages of a document": best_of(args.repeat, storage.document_pages, "document_37.pdf"),
+                "links to a domain": best_of(args.repeat, storage.links_to_domain, "site7.example.com"),
+                "images of a document": best_of(args.repeat, storage.document_images, "document_37.pdf"),
+            }
+
+    print(f"{args.documents} documents x {args.pages} pages, migrated in {migration_seconds:.2f}s")
+    for name in LEGACY_QUERIES:
+        (before, before_rows), (after, after_rows) = legacy[name], indexed[name]
+        print(f"{name:22} {before * 1000:8.2f} ms -> {after * 1000:6.2f} ms "
+              f"({before / after:5.0f}x, {before_rows}/{after_rows} rows)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Compare a new connection plus schema setup per document against pooled sessions on one storage.
+
+Runs against the SQLiteStorage stand-in with a database file, so no MySQL server is needed:
+
+    python -m benchmarks.bench_sql_sessions --documents 200 --threads 4 --pool-size 4
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from storage.sqlite_storage import SQLiteStorage
+from benchmarks.bench_sql_bulk import make_rows
+
+def make_images(document):
+    # Every document shares one logo and has one image of its own
+    return [{"page_number": 1, "image_path": f"logo_{document}.png", "image": b"logo" * 256, "ext": "png"},
+            {"page_number": 2, "image_path": f"own_{document}.png", "image": f"image {document}".encode(), "ext": "png"}]
+
+def store(storage, document, rows):
+    file_name = f"document_{document}.pdf"
+    with storage.transaction():
+        storage.insert_text_rows(file_name, rows)
+        storage.insert_images(file_name, make_images(document))
+
+def connection_per_document(path, documents, rows, threads, pool_size):
+    def run(document):
+        # What each run did before: connect, create the schema, write, disconnect
+        with SQLiteStorage(path) as storage:
+            storage.create_database("python")
+            storage.use_database("python")
+            storage.create_table_if_not_exists()
+            store(storage, document, rows)
+    for document in range(documents):
+        run(document)
+
+def pooled_sessions(path, documents, rows, threads, pool_size):
+    with SQLiteStorage(path, pool_size=pool_size) as storage:
+        storage.bootstrap()
+
+        def run(document):
+            with storage.session() as session:
+                store(session, document, rows)
+
+        with ThreadPoolExecutor(threads) as executor:
+            list(executor.map(run, range(documents)))
+        return storage.image_dedup_stats()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, default=200)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--pool-size", type=int, default=4)
+    args = parser.parse_args()
+
+    rows = make_rows(args.pages)
+    for name, run in (("connection per document", connection_per_document), ("pooled sessions", pooled_sessions)):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "bench.db")
+            start = time.perf_counter()
+            stats = run(path, args.documents, rows, args.threads, args.pool_size)
+            elapsed = time.perf_counter() - start
+            connection = sqlite3.connect(path)
+            text_rows = connection.execute("SELECT COUNT(*) FROM extracted_text").fetchone()[0]
+            blobs = connection.execute("SELECT COUNT(*) FROM image_blobs").fetchone()[0]
+            connection.close()
+        line = f"{name:24} {args.documents / elapsed:8.1f} documents/sec, {text_rows} text rows, {blobs} image blobs"
+        if stats:
+            line += f", dedup ratio {stats['dedup_ratio']:.2f}"
+        print(line)
+
+if __name__ == "__main__":
+    main()
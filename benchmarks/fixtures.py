@@ -0,0 +1,207 @@
+"""Generate large synthetic PDF, DOCX and PPTX documents for the benchmark suite.
+
+    python -m benchmarks.fixtures --scale medium --output bench_fixtures
+
+Documents are built from a fixed seed, so every run at a scale produces the same content.
+They mix text, bold/italic runs, headings, hyperlinks, tables and images (a small pool of
+images is reused, as logos and icons are in real documents). Existing files are kept.
+"""
+import argparse
+import io
+import os
+import random
+import fitz
+import docx
+import pptx
+from docx.opc.constants import RELATIONSHIP_TYPE
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+from docx.text.paragraph import Paragraph
+from pptx.util import Inches, Pt
+from PIL import Image
+
+# Pages, paragraphs and slides per scale
+SCALES = {
+    "small": {"pdf_pages": 200, "docx_paragraphs": 20000, "pptx_slides": 100},
+    "medium": {"pdf_pages": 2000, "docx_paragraphs": 100000, "pptx_slides": 300},
+    "large": {"pdf_pages": 5000, "docx_paragraphs": 500000, "pptx_slides": 800},
+}
+
+WORDS = ("extraction", "document", "page", "table", "image", "storage", "pipeline", "metadata", "index", "query",
+         "throughput", "latency", "memory", "segment", "cache", "render", "layout", "column", "font", "heading")
+
+# One table every TABLE_EVERY pages/slides/paragraphs, one image every IMAGE_EVERY
+TABLE_EVERY = 10
+IMAGE_EVERY = 5
+IMAGE_POOL = 8
+
+def sentence(rng, words=12):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+def make_images(seed=0, count=IMAGE_POOL, size=(160, 120)):
+    """PNG bytes of `count` distinct noisy images."""
+    rng = random.Random(seed)
+    images = []
+    for _ in range(count):
+        image = Image.frombytes("RGB", size, rng.randbytes(size[0] * size[1] * 3))
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG")
+        images.append(buffer.getvalue())
+    return images
+
+def table_rows(rng, rows=5, columns=4):
+    return [[f"{rng.choice(WORDS)} {rng.randint(1, 999)}" for _ in range(columns)] for _ in range(rows)]
+
+def make_pdf(path, pages, seed=0):
+    rng = random.Random(seed)
+    images = make_images(seed)
+    fonts = [fitz.Font(name) for name in ("helv", "tiro", "cour", "hebo")]
+    document = fitz.open()
+    for page_number in range(1, pages + 1):
+        page = document.new_page()
+        # One TextWriter per page is much faster than an insert_text call per line
+        writer = fitz.TextWriter(page.rect)
+        writer.append((72, 60), f"SECTION {page_number}", font=fonts[3], fontsize=16)
+        y = 90
+        for _ in range(20):
+            writer.append((72, y), sentence(rng, 10), font=rng.choice(fonts[:3]), fontsize=10)
+            y += 14
+        writer.append((72, y + 10), "https://example.com/docs", font=fonts[0], fontsize=10)
+        page.insert_link({"kind": fitz.LINK_URI, "from": fitz.Rect(72, y, 250, y + 14),
+                          "uri": f"https://example.com/docs/{page_number}"})
+        if page_number % IMAGE_EVERY == 0:
+            page.insert_image(fitz.Rect(350, 600, 510, 720), stream=images[page_number % len(images)])
+        if page_number % TABLE_EVERY == 0:
+            # A ruled grid, which the PyMuPDF table finder detects from its lines
+            left, top, width, height = 72, 420, 110, 20
+            rows = table_rows(rng)
+            for row_index, row in enumerate(rows):
+                for column_index, value in enumerate(row):
+                    cell = fitz.Rect(left + column_index * width, top + row_index * height,
+                                     left + (column_index + 1) * width, top + (row_index + 1) * height)
+                    page.draw_rect(cell, color=(0, 0, 0), width=0.5)
+                    writer.append((cell.x0 + 3, cell.y1 - 6), value, font=fonts[0], fontsize=8)
+        writer.write_text(page)
+    document.save(path, garbage=3, deflate=True)
+    document.close()
+
+def _add_run(parent, text, bold=False, italic=False):
+    # Setting Run.text goes through the text one character at a time, which dominates at this size
+    run = OxmlElement("w:r")
+    if bold or italic:
+        properties = OxmlElement("w:rPr")
+        if bold:
+            properties.append(OxmlElement("w:b"))
+        if italic:
+            properties.append(OxmlElement("w:i"))
+        run.append(properties)
+    text_element = OxmlElement("w:t")
+    text_element.set(qn("xml:space"), "preserve")
+    text_element.text = text
+    run.append(text_element)
+    parent.append(run)
+
+def _add_hyperlink(paragraph, url, text):
+    # python-docx has no hyperlink API; add the relationship and the w:hyperlink element directly
+    rel_id = paragraph.part.relate_to(url, RELATIONSHIP_TYPE.HYPERLINK, is_external=True)
+    hyperlink = OxmlElement("w:hyperlink")
+    hyperlink.set(qn("r:id"), rel_id)
+    _add_run(hyperlink, text)
+    paragraph._p.append(hyperlink)
+
+def make_docx(path, paragraphs, seed=0):
+    rng = random.Random(seed)
+    images = make_images(seed)
+    document = docx.Document()
+    # document.add_paragraph() scans the whole body for w:sectPr, which is quadratic at this size
+    section_properties = document.element.body.sectPr
+
+    def add_paragraph(style=None):
+        element = OxmlElement("w:p")
+        section_properties.addprevious(element)
+        paragraph = Paragraph(element, document._body)
+        if style:
+            paragraph.style = style
+        return paragraph
+
+    for index in range(1, paragraphs + 1):
+        if index % 50 == 1:
+            _add_run(add_paragraph("Heading 1")._p, f"Chapter {index // 50 + 1}")
+            continue
+        paragraph = add_paragraph()
+        _add_run(paragraph._p, sentence(rng, 8) + " ")
+        _add_run(paragraph._p, sentence(rng, 4) + " ", bold=True)
+        _add_run(paragraph._p, sentence(rng, 4), italic=True)
+        if index % 100 == 0:
+            _add_hyperlink(paragraph, f"https://example.com/docs/{index}", " see docs")
+        if index % (TABLE_EVERY * 20) == 0:
+            rows = table_rows(rng)
+            table = document.add_table(rows=len(rows), cols=len(rows[0]))
+            for row, values in zip(table.rows, rows):
+                for cell, value in zip(row.cells, values):
+                    cell.text = value
+        if index % (IMAGE_EVERY * 200) == 0:
+            image = images[index // (IMAGE_EVERY * 200) % len(images)]
+            document.add_picture(io.BytesIO(image), width=docx.shared.Inches(1.5))
+    document.save(path)
+
+def make_pptx(path, slides, seed=0):
+    rng = random.Random(seed)
+    images = make_images(seed)
+    presentation = pptx.Presentation()
+    layout = presentation.slide_layouts[5]  # Title only
+    for slide_number in range(1, slides + 1):
+        slide = presentation.slides.add_slide(layout)
+        slide.shapes.title.text = f"SLIDE {slide_number}"
+        body = slide.shapes.add_textbox(Inches(0.5), Inches(1.5), Inches(5), Inches(3)).text_frame
+        body.text = sentence(rng)
+        for _ in range(4):
+            run = body.add_paragraph().add_run()
+            run.text = sentence(rng, 8)
+            run.font.bold = rng.random() < 0.3
+            run.font.size = Pt(rng.choice((12, 14, 18)))
+        link = body.add_paragraph().add_run()
+        link.text = "Documentation"
+        link.hyperlink.address = f"https://example.com/slides/{slide_number}"
+        if slide_number % IMAGE_EVERY == 0:
+            slide.shapes.add_picture(io.BytesIO(images[slide_number % len(images)]), Inches(6), Inches(1.5), Inches(2))
+        if slide_number % TABLE_EVERY == 0:
+            rows = table_rows(rng)
+            table = slide.shapes.add_table(len(rows), len(rows[0]), Inches(0.5), Inches(4.8),
+                                           Inches(8), Inches(2)).table
+            for row_index, values in enumerate(rows):
+                for column_index, value in enumerate(values):
+                    table.cell(row_index, column_index).text = value
+    presentation.save(path)
+
+def ensure_fixtures(scale, folder, seed=0):
+    """Paths of the {"pdf", "docx", "pptx"} fixtures of a scale, generating the missing ones."""
+    sizes = SCALES[scale]
+    os.makedirs(folder, exist_ok=True)
+    fixtures = {
+        "pdf": (os.path.join(folder, f"bench-{sizes['pdf_pages']}p-s{seed}.pdf"), make_pdf, sizes["pdf_pages"]),
+        "docx": (os.path.join(folder, f"bench-{sizes['docx_paragraphs']}para-s{seed}.docx"), make_docx,
+                 sizes["docx_paragraphs"]),
+        "pptx": (os.path.join(folder, f"bench-{sizes['pptx_slides']}s-s{seed}.pptx"), make_pptx, sizes["pptx_slides"]),
+    }
+    paths = {}
+    for kind, (path, make, size) in fixtures.items():
+        if not os.path.exists(path):
+            # Written under a temporary name, so an interrupted run never leaves half a fixture behind
+            tmp_path = f"{path}.tmp.{kind}"
+            make(tmp_path, size, seed)
+            os.replace(tmp_path, path)
+        paths[kind] = path
+    return paths
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    parser.add_argument("--output", default="bench_fixtures")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    for kind, path in ensure_fixtures(args.scale, args.output, args.seed).items():
+        print(f"{kind:5} {path} ({os.path.getsize(path) / 1024 / 1024:.1f} MiB)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Compare the python-docx/python-pptx object model with the streaming lxml engine on generated fixtures.
+
+    python -m benchmarks.ooxml_engines --scale medium
+
+Each engine extracts every stage of the DOCX and PPTX fixture in a fresh process, the way
+main.py does with OOXML_ENGINE set. Reported are the wall time per stage and in total,
+and the peak RSS growth from just before the file is loaded, plus whether both engines
+produced the same records.
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from benchmarks.fixtures import SCALES, ensure_fixtures
+from benchmarks.suite import peak_rss_bytes
+
+ENGINES = ("object-model", "lxml")
+STAGES = ("extract_text", "extract_font_styles", "extract_links", "extract_images", "extract_tables")
+
+def run_engine(file_path, engine):
+    """Worker: load and extract one file with one engine; returns timings, RSS growth and an output digest."""
+    os.environ["OOXML_ENGINE"] = engine
+    from main import validate_file
+    # Imported up front so that the RSS growth is the document's, not the libraries'
+    import pandas, PIL.Image
+    baseline_rss = peak_rss_bytes()
+    output_folder = tempfile.mkdtemp(prefix="bench-")
+    timings, outputs = {}, {}
+    try:
+        start = time.perf_counter()
+        extractor = validate_file(file_path)
+        timings["load"] = time.perf_counter() - start
+        for stage in STAGES:
+            stage_start = time.perf_counter()
+            if stage in ("extract_images", "extract_tables"):
+                result = getattr(extractor, stage)(output_folder)
+            else:
+                result = getattr(extractor, stage)()
+            timings[stage] = time.perf_counter() - stage_start
+            outputs[stage] = result
+        timings["total"] = time.perf_counter() - start
+        tables = [open(path).read() for path in outputs["extract_tables"]]
+    finally:
+        shutil.rmtree(output_folder, ignore_errors=True)
+    outputs["extract_images"] = [dict(image, image=None, image_path=os.path.basename(image["image_path"]))
+                                 for image in outputs["extract_images"]]
+    outputs["extract_tables"] = tables
+    digest = hashlib.sha256(json.dumps(outputs, sort_keys=True, default=str).encode()).hexdigest()
+    return {"timings": timings, "peak_rss_growth": peak_rss_bytes() - baseline_rss, "digest": digest}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    parser.add_argument("--fixtures", default="bench_fixtures", help="folder for the generated documents (reused)")
+    args = parser.parse_args()
+
+    fixtures = ensure_fixtures(args.scale, args.fixtures)
+    context = multiprocessing.get_context("spawn")
+    print(f"{'file':6} {'engine':13} " + " ".join(f"{column:>10}" for column in ("load", "text", "fonts", "links",
+                                                                                 "images", "tables", "total", "RSS +MB")))
+    for kind in ("docx", "pptx"):
+        results = {}
+        for engine in ENGINES:
+            # A process per run, so neither engine inherits the other's memory or warm caches
+            with ProcessPoolExecutor(1, mp_context=context) as executor:
+                results[engine] = executor.submit(run_engine, fixtures[kind], engine).result()
+            timings = results[engine]["timings"]
+            columns = [timings["load"]] + [timings[stage] for stage in STAGES] + [timings["total"]]
+            print(f"{kind:6} {engine:13} " + " ".join(f"{seconds * 1000:>8.0f}ms" for seconds in columns)
+                  + f" {results[engine]['peak_rss_growth'] / 1024 / 1024:>10.1f}")
+        before, after = results["object-model"], results["lxml"]
+        speedup = before["timings"]["total"] / after["timings"]["total"] if after["timings"]["total"] else 0.0
+        memory = after["peak_rss_growth"] / before["peak_rss_growth"] if before["peak_rss_growth"] else 0.0
+        same = "identical output" if before["digest"] == after["digest"] else "OUTPUT DIFFERS"
+        print(f"{kind:6} lxml is {speedup:.1f}x faster with {memory:.0%} of the RSS growth, {same}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""Benchmark every extractor method and the main() pipeline on generated fixtures, against a baseline.
+
+    python -m benchmarks.suite --scale small --save-baseline      # record benchmarks/baselines/small.json
+    python -m benchmarks.suite --scale small                      # compare, exit 1 on a regression
+    python -m benchmarks.suite --scale medium --cases pdf.extract_text,pptx.main_pipeline
+
+Each case runs in a fresh process, so its peak RSS is its own. The document is loaded first
+(untimed, except for the load and main_pipeline cases), then the case is timed --repeat
+times. A case regresses when its p50 latency or its peak RSS growth exceeds the baseline by
+more than --tolerance. Baselines depend on the machine, so record them where you compare.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from benchmarks.fixtures import SCALES, ensure_fixtures
+
+KINDS = ("pdf", "docx", "pptx")
+METHODS = ("load", "extract_text", "extract_font_styles", "extract_links", "extract_images", "extract_tables",
+           "main_pipeline")
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), "baselines")
+
+# Differences below these are noise (timer jitter, allocator arenas), whatever the tolerance
+LATENCY_SLACK_MS = 5
+RSS_SLACK_BYTES = 16 * 1024 * 1024
+
+def peak_rss_bytes():
+    # ru_maxrss survives exec on Linux, so a spawned worker would start at its parent's peak;
+    # VmHWM is the high-water mark of this process image only
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))]
+
+def _run_main_pipeline(file_path, output_folder):
+    # What main() does for one file, with SQLiteStorage standing in for the MySQL server
+    from main import validate_file
+    from pipeline import stream_document
+    from storage.sqlite_storage import SQLiteStorage
+    with SQLiteStorage(os.path.join(output_folder, "bench.db")) as storage:
+        storage.bootstrap()
+        extractor = validate_file(file_path)
+        counts = stream_document(extractor, storage, output_image=os.path.join(output_folder, "images"),
+                                 output_text=os.path.join(output_folder, "text"),
+                                 output_tables=os.path.join(output_folder, "tables"))
+    return counts["text"]
+
+def run_case(file_path, method, repeat):
+    """Worker: time one method `repeat` times; returns latencies, units processed and peak RSS growth."""
+    from main import validate_file
+    extractor = validate_file(file_path)
+    units = len(extractor.extract_text())
+    extractor._font_styles = None
+    baseline_rss = peak_rss_bytes()
+
+    latencies = []
+    for _ in range(repeat):
+        output_folder = tempfile.mkdtemp(prefix="bench-")
+        try:
+            # Font styles are cached per loaded document; every run starts without them
+            extractor._font_styles = None
+            start = time.perf_counter()
+            if method == "load":
+                extractor.load(file_path)
+            elif method == "main_pipeline":
+                _run_main_pipeline(file_path, output_folder)
+            elif method in ("extract_images", "extract_tables"):
+                getattr(extractor, method)(output_folder)
+            else:
+                getattr(extractor, method)()
+            latencies.append(time.perf_counter() - start)
+        finally:
+            shutil.rmtree(output_folder, ignore_errors=True)
+    return {"latencies": latencies, "units": units, "peak_rss_growth": peak_rss_bytes() - baseline_rss}
+
+def summarize(result):
+    latencies = result["latencies"]
+    p50 = percentile(latencies, 0.50)
+    return {
+        "units": result["units"],
+        "p50_ms": p50 * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "mean_ms": sum(latencies) / len(latencies) * 1000,
+        "units_per_sec": result["units"] / p50 if p50 else 0.0,
+        "peak_rss_growth_mb": result["peak_rss_growth"] / 1024 / 1024
+    }
+
+def regressions(name, summary, baseline, tolerance):
+    """Why a case is worse than its baseline entry, or [] when it is not."""
+    problems = []
+    if summary["p50_ms"] > baseline["p50_ms"] * (1 + tolerance) + LATENCY_SLACK_MS:
+        problems.append(f"p50 {baseline['p50_ms']:.1f} -> {summary['p50_ms']:.1f} ms")
+    allowed_rss = baseline["peak_rss_growth_mb"] * (1 + tolerance) + RSS_SLACK_BYTES / 1024 / 1024
+    if summary["peak_rss_growth_mb"] > allowed_rss:
+        problems.append(f"peak RSS growth {baseline['peak_rss_growth_mb']:.1f} -> {summary['peak_rss_growth_mb']:.1f} MB")
+    return [f"{name}: {problem}" for problem in problems]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    parser.add_argument("--fixtures", default="bench_fixtures", help="folder for the generated documents (reused)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--cases", help="comma separated kind.method names, e.g. pdf.extract_text (default: all)")
+    parser.add_argument("--baseline", help=f"baseline JSON (default: {BASELINE_DIR}/<scale>.json)")
+    parser.add_argument("--save-baseline", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown/growth over the baseline")
+    args = parser.parse_args()
+
+    fixtures = ensure_fixtures(args.scale, args.fixtures)
+    cases = [f"{kind}.{method}" for kind in KINDS for method in METHODS]
+    if args.cases:
+        unknown = set(args.cases.split(",")) - set(cases)
+        if unknown:
+            parser.error(f"unknown cases: {', '.join(sorted(unknown))}")
+        cases = [case for case in cases if case in args.cases.split(",")]
+
+    baseline_path = args.baseline or os.path.join(BASELINE_DIR, f"{args.scale}.json")
+    baseline = {}
+    if os.path.exists(baseline_path) and not args.save_baseline:
+        with open(baseline_path) as file:
+            baseline = json.load(file)["cases"]
+
+    results, problems = {}, []
+    print(f"{'case':28} {'units':>7} {'p50 ms':>10} {'p95 ms':>10} {'units/s':>10} {'RSS +MB':>8}  vs baseline")
+    # A spawned process per case: no memory or warm caches carried over from the previous case
+    context = multiprocessing.get_context("spawn")
+    for case in cases:
+        kind, method = case.split(".")
+        with ProcessPoolExecutor(1, mp_context=context) as executor:
+            summary = summarize(executor.submit(run_case, fixtures[kind], method, args.repeat).result())
+        results[case] = summary
+        comparison = ""
+        if case in baseline:
+            change = summary["p50_ms"] / baseline[case]["p50_ms"] - 1 if baseline[case]["p50_ms"] else 0.0
+            comparison = f"{change:+.0%}"
+            case_problems = regressions(case, summary, baseline[case], args.tolerance)
+            if case_problems:
+                comparison += "  REGRESSION"
+                problems.extend(case_problems)
+        print(f"{case:28} {summary['units']:>7} {summary['p50_ms']:>10.1f} {summary['p95_ms']:>10.1f} "
+              f"{summary['units_per_sec']:>10.0f} {summary['peak_rss_growth_mb']:>8.1f}  {comparison}")
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(baseline_path)), exist_ok=True)
+        with open(baseline_path, 'w') as file:
+            json.dump({"scale": args.scale, "repeat": args.repeat, "python": platform.python_version(),
+                       "machine": platform.machine(), "cpus": os.cpu_count(), "cases": results}, file, indent=2)
+        print(f"baseline saved to {baseline_path}")
+    elif not baseline:
+        print(f"no baseline at {baseline_path}; run with --save-baseline to record one")
+
+    if problems:
+        print("------------------")
+        print("\n".join(problems))
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
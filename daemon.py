@@ -0,0 +1,462 @@
+"""Resident ingestion service: jobs from a watched inbox folder or a local HTTP endpoint.
+
+    python daemon.py --inbox inbox --http-port 8765 --sqlite daemon.db
+
+The interpreter, the loaders, the worker processes and the database connections stay warm
+between documents. Jobs wait in a bounded queue, are extracted by process_file in a process
+pool and stored by writer threads that each keep one SQLStorage connection open. The
+extracted results wait for a writer in a second bounded queue. When storage falls behind,
+that queue fills up, so the extraction slots stay taken and the job queue fills in turn.
+At that point the inbox is no longer scanned and HTTP submissions get 503 with Retry-After.
+
+HTTP (also served on a Unix socket with --socket):
+    POST /jobs {"path": "/data/report.pdf"}   202 {"id": ..., "status": "queued"}, 503 when full,
+                                              403 outside the --allow-root folders
+    GET  /jobs/<id>                           status of a recent job
+    GET  /status                              queue depth, in-flight jobs, throughput
+    GET  /metrics                             Prometheus text, stage metrics plus the daemon gauges
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import signal
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import ExitStack
+from batch import process_file, SUPPORTED_EXTENSIONS
+from data_extractor.image_processing import ImageOptions, PILLOW_FORMATS
+from main import FORMATS, _import_class, connect_sql_storage, store_document
+from storage.sqlite_storage import SQLiteStorage
+from storage.extraction_cache import DEFAULT_MAX_BYTES
+from metrics import METRICS, document, configure_log, serve_metrics
+
+# Files moved out of the inbox once their job has finished
+DONE_FOLDER = "done"
+FAILED_FOLDER = "failed"
+# Window of the files/sec gauge
+THROUGHPUT_WINDOW = 60.0
+MAX_REQUEST_BYTES = 64 * 1024
+# Times a job lost with a dead worker pool is run again on the new pool
+MAX_RETRIES = 1
+
+def _warm_worker():
+    """Process pool initializer: import every loader and extractor before the first job arrives."""
+    for loader_path, extractor_path in FORMATS.values():
+        _import_class(loader_path)
+        _import_class(extractor_path)
+
+class Job:
+    """One file to extract and store, and how far it got."""
+
+    __slots__ = ("id", "file_path", "source", "status", "error", "submitted", "finished", "retries")
+
+    def __init__(self, job_id: str, file_path: str, source: str):
+        self.id = job_id
+        self.file_path = file_path
+        self.source = source
+        self.status = "queued"
+        self.error = None
+        self.submitted = time.time()
+        self.finished = None
+        self.retries = 0
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+class IngestDaemon:
+    """The queues, pools and storage writers of a running service; run() serves until stop()."""
+
+    def __init__(self, sql_storage=None, output_root=".", inbox=None, workers=None, queue_size=64,
+                 store_backlog=4, store_writers=1, poll_interval=1.0, timeout=None, cache_dir=None,
+                 cache_max_bytes=DEFAULT_MAX_BYTES, write_images=True, image_store_dir=None,
+                 output_format="txt", search_index=None, image_options=None, image_workers=1, allowed_roots=None,
+                 keep_jobs=1000):
+        self.sql_storage = sql_storage
+        self.output_root = output_root
+        self.inbox = inbox
+        self.workers = workers or os.cpu_count() or 1
+        self.store_writers = store_writers
+        self.poll_interval = poll_interval
+        self.process_args = (timeout, cache_dir, cache_max_bytes, write_images, image_store_dir, 1, output_format,
+                             False, None, image_options, image_workers)
+        self.search_index = search_index
+        # HTTP jobs may only name files below these folders (default: the working directory)
+        self.allowed_roots = [os.path.realpath(root) for root in (allowed_roots or [os.getcwd()])]
+        self.keep_jobs = keep_jobs
+        self.queue = asyncio.Queue(queue_size)
+        self.store_queue = asyncio.Queue(store_backlog)
+        self.jobs = OrderedDict()
+        self._job_ids = itertools.count(1)
+        self._inbox_files = set()
+        self._completed = deque()
+        self._search_lock = threading.Lock()
+        self._stop = asyncio.Event()
+        self.in_flight = 0
+        self.extracting = 0
+        self.storing = 0
+        self.counts = {"submitted": 0, "rejected": 0, "done": 0, "failed": 0}
+        self.process_pool = None
+        METRICS.add_gauges(self.gauges)
+
+    # * status
+    def throughput(self) -> float:
+        """Files finished per second over the last THROUGHPUT_WINDOW seconds."""
+        # Also read by the metrics thread, so only _finish() trims the window
+        horizon = time.monotonic() - THROUGHPUT_WINDOW
+        return sum(1 for finished in list(self._completed) if finished >= horizon) / THROUGHPUT_WINDOW
+
+    def status(self):
+        return {
+            "queue_depth": self.queue.qsize(),
+            "queue_size": self.queue.maxsize,
+            "in_flight": self.in_flight,
+            "extracting": self.extracting,
+            "store_backlog": self.store_queue.qsize(),
+            "storing": self.storing,
+            "files_per_sec": self.throughput(),
+            "accepting": not self.queue.full(),
+            **{f"jobs_{name}": count for name, count in self.counts.items()}
+        }
+
+    def gauges(self):
+        status = self.status()
+        yield "daemon_queue_depth", "gauge", "Jobs waiting for a worker process.", status["queue_depth"]
+        yield "daemon_in_flight", "gauge", "Jobs being extracted, waiting for a writer or being stored.", status["in_flight"]
+        yield "daemon_store_backlog", "gauge", "Extracted jobs waiting for a storage writer.", status["store_backlog"]
+        yield "daemon_files_per_second", "gauge", f"Files finished per second over the last {THROUGHPUT_WINDOW:.0f}s.", status["files_per_sec"]
+        for name, count in self.counts.items():
+            yield f"daemon_jobs_{name}_total", "counter", f"Jobs {name}.", count
+
+    # * jobs
+    def _new_job(self, file_path: str, source: str) -> Job:
+        job = Job(str(next(self._job_ids)), file_path, source)
+        self.jobs[job.id] = job
+        while len(self.jobs) > self.keep_jobs:
+            self.jobs.popitem(last=False)
+        self.counts["submitted"] += 1
+        return job
+
+    def submit(self, file_path: str, source: str = "http") -> Job:
+        """Queue a file without waiting; raises asyncio.QueueFull when the daemon is saturated."""
+        if self.queue.full() or self._stop.is_set():
+            self.counts["rejected"] += 1
+            raise asyncio.QueueFull()
+        job = self._new_job(file_path, source)
+        self.queue.put_nowait(job)
+        return job
+
+    def is_allowed(self, file_path: str) -> bool:
+        """Whether a file, with symlinks resolved, is below one of the allowed roots."""
+        real_path = os.path.realpath(file_path)
+        return any(os.path.commonpath([real_path, root]) == root for root in self.allowed_roots)
+
+    @staticmethod
+    def _unique_path(folder: str, name: str, job_id: str) -> str:
+        """A path in folder for name that does not replace an earlier file of the same name."""
+        path = os.path.join(folder, name)
+        stem, ext = os.path.splitext(name)
+        for suffix in itertools.chain([job_id], (f"{job_id}-{n}" for n in itertools.count(2))):
+            if not os.path.exists(path):
+                return path
+            path = os.path.join(folder, f"{stem}.{suffix}{ext}")
+
+    def _finish(self, job: Job, error: str = None):
+        job.status = "failed" if error else "done"
+        job.error = error
+        job.finished = time.time()
+        self.in_flight -= 1
+        self.counts[job.status] += 1
+        self._completed.append(time.monotonic())
+        while self._completed[0] < self._completed[-1] - THROUGHPUT_WINDOW:
+            self._completed.popleft()
+        print(f"{job.status:6} {job.file_path}" + (f": {error}" if error else ""))
+        if job.source == "inbox":
+            self._inbox_files.discard(job.file_path)
+            folder = os.path.join(self.inbox, FAILED_FOLDER if error else DONE_FOLDER)
+            try:
+                os.replace(job.file_path, self._unique_path(folder, os.path.basename(job.file_path), job.id))
+            except OSError:
+                # Removed or renamed while it was processed
+                pass
+
+    # * inbox
+    async def watch_inbox(self):
+        """Queue inbox files once their size and mtime stayed the same for one poll, so half-copied files wait."""
+        for folder in (DONE_FOLDER, FAILED_FOLDER):
+            os.makedirs(os.path.join(self.inbox, folder), exist_ok=True)
+        previous = {}
+        while not self._stop.is_set():
+            current = {}
+            with os.scandir(self.inbox) as entries:
+                for entry in entries:
+                    if entry.is_file() and not entry.name.startswith(".") \
+                            and entry.name.lower().endswith(SUPPORTED_EXTENSIONS) and entry.path not in self._inbox_files:
+                        stat = entry.stat()
+                        current[entry.path] = (stat.st_size, stat.st_mtime_ns)
+            for file_path, signature in sorted(current.items()):
+                if previous.get(file_path) == signature:
+                    self._inbox_files.add(file_path)
+                    # Waits while the queue is full, which pauses the scan
+                    await self.queue.put(self._new_job(file_path, "inbox"))
+            previous = current
+            try:
+                await asyncio.wait_for(self._stop.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    # * extraction and storage
+    async def _extract(self, job: Job):
+        """Run process_file for a job in the pool; a job lost with a dead pool is retried on the new one."""
+        loop = asyncio.get_running_loop()
+        while True:
+            pool = self.process_pool
+            try:
+                return await loop.run_in_executor(pool, process_file, job.file_path, self.output_root,
+                                                  *self.process_args)
+            except BrokenProcessPool:
+                # A worker died (e.g. a crash in a native parser); later jobs get a fresh pool
+                if self.process_pool is pool:
+                    self.process_pool = ProcessPoolExecutor(self.workers, initializer=_warm_worker)
+                    pool.shutdown(wait=False)
+                # Every job in flight on the pool is lost with it, not only the one that crashed it
+                if job.retries >= MAX_RETRIES:
+                    raise
+                job.retries += 1
+
+    async def _extract_loop(self):
+        while True:
+            job = await self.queue.get()
+            job.status = "extracting"
+            self.in_flight += 1
+            self.extracting += 1
+            try:
+                try:
+                    results, _ = await self._extract(job)
+                except BrokenProcessPool:
+                    self._finish(job, "worker process died")
+                    continue
+                except Exception as e:
+                    self._finish(job, str(e) or type(e).__name__)
+                    continue
+                finally:
+                    self.extracting -= 1
+                job.status = "storing"
+                # Waits while every writer is busy and the backlog is full: this is the backpressure
+                await self.store_queue.put((job, results))
+            finally:
+                self.queue.task_done()
+
+    def _store(self, storage, results):
+        with document(results["file_name"], extracted=results.get("metrics")):
+            if storage is not None:
+                store_document(storage, results)
+        if self.search_index is not None:
+            with self._search_lock:
+                self.search_index.add_document(results["document"], results["text_data"])
+                # Pages become searchable once the daemon is idle, or in batches while it is busy
+                if self.store_queue.empty():
+                    self.search_index.commit()
+
+    async def _store_loop(self, storage):
+        loop = asyncio.get_running_loop()
+        # One thread per writer, so its connection is only ever used from that thread
+        with ThreadPoolExecutor(1, thread_name_prefix="store") as thread:
+            while True:
+                job, results = await self.store_queue.get()
+                self.storing += 1
+                try:
+                    await loop.run_in_executor(thread, self._store, storage, results)
+                    self._finish(job)
+                except Exception as e:
+                    self._finish(job, str(e) or type(e).__name__)
+                finally:
+                    self.storing -= 1
+                    self.store_queue.task_done()
+
+    # * http
+    def _route(self, method: str, path: str, body: bytes):
+        if method == "POST" and path == "/jobs":
+            try:
+                file_path = json.loads(body or b"{}")["path"]
+            except (ValueError, KeyError, TypeError):
+                return 400, {"error": 'expected a JSON body {"path": "..."}'}
+            file_path = os.path.abspath(file_path)
+            if not self.is_allowed(file_path):
+                return 403, {"error": f"not below an allowed root: {file_path}"}
+            if not os.path.isfile(file_path):
+                return 404, {"error": f"no such file: {file_path}"}
+            try:
+                job = self.submit(file_path)
+            except asyncio.QueueFull:
+                return 503, {"error": "queue full, retry later", **self.status()}
+            return 202, job.as_dict()
+        if method == "GET" and path.startswith("/jobs/"):
+            job = self.jobs.get(path[len("/jobs/"):])
+            return (200, job.as_dict()) if job else (404, {"error": "unknown job"})
+        if method == "GET" and path == "/status":
+            return 200, self.status()
+        if method == "GET" and path == "/metrics":
+            return 200, METRICS.prometheus_text()
+        return 404, {"error": f"no route {method} {path}"}
+
+    async def _handle_http(self, reader, writer):
+        try:
+            method, target, _ = (await reader.readline()).decode("latin-1").split(" ", 2)
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            length = int(headers.get("content-length", 0))
+            if length > MAX_REQUEST_BYTES:
+                raise ValueError("request body too large")
+            status, payload = self._route(method.upper(), target.split("?", 1)[0], await reader.readexactly(length))
+        except (ValueError, asyncio.IncompleteReadError):
+            status, payload = 400, {"error": "malformed request"}
+
+        if isinstance(payload, str):
+            body, content_type = payload.encode(), "text/plain; version=0.0.4"
+        else:
+            body, content_type = json.dumps(payload).encode(), "application/json"
+        reason = {200: "OK", 202: "Accepted", 400: "Bad Request", 403: "Forbidden", 404: "Not Found",
+                  503: "Service Unavailable"}[status]
+        head = [f"HTTP/1.1 {status} {reason}", f"Content-Type: {content_type}", f"Content-Length: {len(body)}",
+                "Connection: close"]
+        if status == 503:
+            head.append("Retry-After: 1")
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode() + body)
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    # * lifecycle
+    def stop(self):
+        """Stop taking jobs; run() returns once the queued and in-flight jobs are stored."""
+        self._stop.set()
+
+    async def run(self, host="127.0.0.1", port=None, socket_path=None):
+        self.process_pool = ProcessPoolExecutor(self.workers, initializer=_warm_worker)
+        servers, tasks = [], []
+        with ExitStack() as sessions:
+            # Every writer keeps its connection for the lifetime of the daemon
+            if self.sql_storage is None or self.store_writers == 1:
+                storages = [self.sql_storage] * self.store_writers
+            else:
+                storages = [sessions.enter_context(self.sql_storage.session()) for _ in range(self.store_writers)]
+            try:
+                tasks += [asyncio.create_task(self._extract_loop()) for _ in range(self.workers)]
+                tasks += [asyncio.create_task(self._store_loop(storage)) for storage in storages]
+                if port is not None:
+                    servers.append(await asyncio.start_server(self._handle_http, host, port))
+                    print(f"Listening on http://{host}:{port}")
+                if socket_path:
+                    servers.append(await asyncio.start_unix_server(self._handle_http, socket_path))
+                    print(f"Listening on {socket_path}")
+                watcher = asyncio.create_task(self.watch_inbox()) if self.inbox else None
+                if self.inbox:
+                    print(f"Watching {self.inbox}")
+
+                await self._stop.wait()
+                for server in servers:
+                    server.close()
+                if watcher is not None:
+                    await watcher
+                # Drain what was accepted before stopping
+                await self.queue.join()
+                await self.store_queue.join()
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                self.process_pool.shutdown()
+                if socket_path and os.path.exists(socket_path):
+                    os.remove(socket_path)
+        if self.search_index is not None:
+            self.search_index.commit()
+
+async def serve(daemon, host, port, socket_path):
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, daemon.stop)
+    await daemon.run(host, port, socket_path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract and store PDF/DOCX/PPTX files as a resident service.")
+    parser.add_argument("--inbox", help="watch this folder; finished files are moved into its done/ and failed/ folders")
+    parser.add_argument("--http-port", type=int, help="accept jobs on http://HOST:PORT")
+    parser.add_argument("--host", default="127.0.0.1", help="address of the HTTP endpoint (default: local only)")
+    parser.add_argument("--socket", help="accept jobs over HTTP on this Unix socket")
+    parser.add_argument("--allow-root", action="append",
+                        help="only accept HTTP jobs for files below this folder; repeatable (default: the working directory)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--queue-size", type=int, default=64, help="jobs waiting for a worker before submissions are refused")
+    parser.add_argument("--store-backlog", type=int, default=4, help="extracted jobs waiting for a storage writer before extraction pauses")
+    parser.add_argument("--store-writers", type=int, default=1, help="storage threads, each with its own database connection")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="seconds between inbox scans")
+    parser.add_argument("--timeout", type=float, default=None,
+                        help="per-file timeout in seconds; checked between Python calls, so a long call into "
+                             "PyMuPDF or tabula finishes before the file fails")
+    parser.add_argument("--output", default=".", help="root folder for output_images/output_text/output_tables")
+    parser.add_argument("--sqlite", help="store into this SQLite file instead of the configured MySQL database")
+    parser.add_argument("--no-db", action="store_true", help="only write file outputs")
+    parser.add_argument("--no-image-files", action="store_true", help="keep extracted images in memory and only store them in the database")
+    parser.add_argument("--output-format", choices=("txt", "jsonl", "parquet"), default="txt",
+                        help="format of the per-file text, link, image and table records")
+    parser.add_argument("--search-index", help="add every page to the full-text index in this folder")
+    parser.add_argument("--image-store", help="write each distinct image once into this content-addressed folder")
+    parser.add_argument("--cache-dir", help="reuse extraction results for unchanged files from this folder")
+    parser.add_argument("--cache-max-mb", type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024), help="extraction cache size cap")
+    parser.add_argument("--metrics-log", help="append one JSON line of stage metrics per document to this file (- for stderr)")
+    parser.add_argument("--metrics-port", type=int, help="also serve Prometheus text metrics on http://0.0.0.0:PORT/metrics")
+    parser.add_argument("--image-format", choices=tuple(PILLOW_FORMATS), help="re-encode every image in this format")
+    parser.add_argument("--image-quality", type=int, default=85, help="JPEG/WebP quality of re-encoded images")
+    parser.add_argument("--image-max-size", type=int, help="downscale images whose longer side exceeds this many pixels")
+    parser.add_argument("--thumbnail-size", type=int, help="also write a thumbnail of at most this many pixels per image")
+    parser.add_argument("--image-workers", type=int, default=1, help="threads per job that process images")
+    args = parser.parse_args()
+    if not (args.inbox or args.http_port or args.socket):
+        parser.error("give --inbox, --http-port or --socket")
+
+    # Sessions of more than one writer come from a pool of that many connections
+    pool_size = args.store_writers if args.store_writers > 1 else None
+    sql_storage = None
+    if args.sqlite:
+        sql_storage = SQLiteStorage(args.sqlite, pool_size=pool_size)
+        sql_storage.bootstrap()
+    elif not args.no_db:
+        sql_storage = connect_sql_storage(pool_size)
+
+    if args.metrics_log:
+        configure_log(args.metrics_log)
+    if args.metrics_port:
+        serve_metrics(args.metrics_port)
+
+    search_index = None
+    if args.search_index:
+        from storage.search_index import SearchIndex
+        search_index = SearchIndex(args.search_index)
+
+    try:
+        daemon = IngestDaemon(sql_storage, args.output, args.inbox, args.workers, args.queue_size,
+                              args.store_backlog, args.store_writers, args.poll_interval, args.timeout,
+                              args.cache_dir, args.cache_max_mb * 1024 * 1024, not args.no_image_files,
+                              args.image_store, args.output_format, search_index,
+                              ImageOptions(args.image_format, args.image_quality, args.image_max_size, args.thumbnail_size),
+                              args.image_workers, args.allow_root)
+        asyncio.run(serve(daemon, args.host, args.http_port, args.socket))
+    finally:
+        if sql_storage is not None:
+            sql_storage.close()
+    print(f"Stopped: {daemon.counts['done']} done, {daemon.counts['failed']} failed, "
+          f"{daemon.counts['rejected']} rejected")
+
+if __name__ == "__main__":
+    main()
@@ -1,34 +1,37 @@
-from typing import List, Dict, Any
-import tabula
+from typing import List, Iterator, Optional
 from loader.file_loader import FileLoader
 from data_extractor.extractor import DataExtractor
-from PIL import Image
-import io
+from data_extractor.font_styles import FontStyleCounter
+from data_extractor.records import PageText, Link, ImageRef, TableRef
+from loader.ooxml import DocxPackage
 import os
-import pandas as pd
 
 class DocxExtractor(DataExtractor):
     def __init__(self, loader: FileLoader):
         super().__init__(loader)
 
+    def _uses_lxml(self) -> bool:
+        return isinstance(self.file, DocxPackage)
+
     # * for text
-    def extract_text(self) -> List[Dict[str, Any]]:
-        """Extract text and headings from a DOCX file."""
-        extracted_data = []
+    def iter_text(self) -> Iterator[PageText]:
+        """Yield text and headings from a DOCX file, one paragraph at a time."""
         page_num = 0
-        for para in (self.file.paragraphs):
-            text = para.text
+        if self._uses_lxml():
+            texts = (text for text, _ in self.file.body()["paragraphs"])
+        else:
+            texts = (para.text for para in self.file.paragraphs)
+        for text in texts:
             if(text):
                 page_num += 1;
                 headings = self.extract_headings(text)
-                font_styles = {}  # You may add logic to extract font styles from DOCX if needed
-                extracted_data.append({
-                    "page_number":page_num,
-                    "text": text,
-                    "headings": headings,
-                    "font_styles": font_styles
-                })
-        return extracted_data
+                font_styles = self.font_styles().page(page_num)
+                yield PageText(
+                    page_number=page_num,
+                    text=text,
+                    headings=headings,
+                    font_styles=font_styles
+                )
 
     # * for heading
     def extract_headings(self, text: str) -> List[str]:
@@ -37,54 +40,84 @@ class DocxExtractor(DataExtractor):
         return headings
 
     # * for font styles
-    def extract_font_styles(self) -> Dict[str, int]:
-        """Extract font styles (bold, italic) from a DOCX file."""
-        styles = {'bold': 0, 'italic': 0}
+    def collect_font_styles(self, counter: FontStyleCounter):
+        """Count font styles (bold, italic, font, size) of every run in a DOCX file."""
+        page_num = 0
+        if self._uses_lxml():
+            for text, runs in self.file.body()["paragraphs"]:
+                page = None
+                if text:
+                    page_num += 1
+                    page = page_num
+                for bold, italic, font, size in runs:
+                    counter.add(page, bold=bool(bold), italic=bool(italic), font=font, size=size)
+            return
         for para in self.file.paragraphs:
+            # Paragraphs with text are numbered the same way as in extract_text
+            page = None
+            if para.text:
+                page_num += 1
+                page = page_num
             for run in para.runs:
-                if run.bold:
-                    styles['bold'] += 1
-                if run.italic:
-                    styles['italic'] += 1
-        return styles
+                counter.add(
+                    page,
+                    bold=bool(run.bold),
+                    italic=bool(run.italic),
+                    font=run.font.name,
+                    size=run.font.size.pt if run.font.size is not None else None
+                )
 
     # * for images
-    def extract_images(self, output_folder: str) -> List[str]:
-        """Extract images from a DOCX file."""
-        image_paths = []
+    def iter_images(self, output_folder: Optional[str] = None) -> Iterator[ImageRef]:
+        """Yield in-memory image records from a DOCX file, one image at a time."""
+        if self._uses_lxml():
+            for page_num, rel in enumerate(self.file.relationships(self.file.main_part), start=1):
+                if "image" in rel["target_ref"] and not rel["is_external"]:
+                    blob, ext, width, height = self.file.image(rel["partname"])
+                    yield self._image_record(
+                        page_num, f'docx_image_{page_num}.{ext}', blob, ext, width, height, output_folder
+                    )
+            return
         for page_num, rel in enumerate(self.file.part.rels.values(), start=1):
             if "image" in rel.target_ref:
-                image_data = rel.target_part.blob
-                image = Image.open(io.BytesIO(image_data))
-                image_path = os.path.join(output_folder, f'docx_image_{page_num}.png')
-                image.save(image_path)
-                image_paths.append([image_path, page_num])
-        return image_paths
+                image_part = rel.target_part
+                # python-docx reads the size from the image header without decoding the pixels
+                try:
+                    header = image_part.image
+                    ext, width, height = header.ext, header.px_width, header.px_height
+                except Exception:
+                    ext, width, height = os.path.splitext(image_part.partname)[1].lstrip('.'), None, None
+                yield self._image_record(
+                    page_num, f'docx_image_{page_num}.{ext}', image_part.blob, ext, width, height, output_folder
+                )
 
     # * for links
-    def extract_links(self) -> List[Dict[str, Any]]:
-        """Extract hyperlinks from a DOCX file."""
-        extracted_links = []
-
+    def iter_links(self) -> Iterator[Link]:
+        """Yield hyperlinks from a DOCX file."""
         # Access the document's relationships to find hyperlinks
-        for page_num, rel in enumerate(self.file.part.rels.values(), start=1):
-            if "hyperlink" in rel.reltype:
-                hyperlink = rel.target_ref  # Extract the hyperlink URL
-                extracted_links.append({
-                    "url": hyperlink,
-                    "page_number":page_num
-                })
-        return extracted_links
+        if self._uses_lxml():
+            rels = [(rel["type"], rel["target_ref"]) for rel in self.file.relationships(self.file.main_part)]
+        else:
+            rels = [(rel.reltype, rel.target_ref) for rel in self.file.part.rels.values()]
+        for page_num, (reltype, target_ref) in enumerate(rels, start=1):
+            if "hyperlink" in reltype:
+                hyperlink = target_ref  # Extract the hyperlink URL
+                # Relationships carry no anchor text
+                yield Link(linked_text=None, url=hyperlink, page_number=page_num)
 
     # * for tables
-    def extract_tables(self, output_folder: str) -> List[str]:
-        """Extract tables from a DOCX file and save as CSV."""
-        extracted_tables = []
-        for i, table in enumerate(self.file.tables):
+    def iter_tables(self, output_folder: str) -> Iterator[TableRef]:
+        """Save tables from a DOCX file as CSV and yield a reference to each file."""
+        # pandas takes longer to import than most documents take to extract, so only table runs pay for it
+        import pandas as pd
+        if self._uses_lxml():
+            tables = self.file.body()["tables"]
+        else:
+            tables = ([[cell.text for cell in row.cells] for row in table.rows] for table in self.file.tables)
+        for i, data in enumerate(tables):
             # Convert the table to a DataFrame
-            data = [[cell.text for cell in row.cells] for row in table.rows]
             df = pd.DataFrame(data)
             csv_file_path = os.path.join(output_folder, f'table_docx_{i + 1}.csv')
             df.to_csv(csv_file_path, index=False, header=False)
-            extracted_tables.append(csv_file_path)
-        return extracted_tables
+            # A DOCX body has no pages
+            yield TableRef(table_path=csv_file_path, page_number=None)
@@ -1,44 +1,140 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional, Sequence
 import abc
+import copy
+import hashlib
+import os
 from loader.file_loader import FileLoader
+from data_extractor.font_styles import FontStyleCounter
+from data_extractor.records import PageText, Link, ImageRef, TableRef
+from metrics import measure, collect
+
+# Bump whenever extractor output changes, so cached extraction results are not reused
+EXTRACTOR_VERSION = 6
 
 class DataExtractor(abc.ABC):
+    # Whether the extractor honours page_range
+    supports_page_range = False
+    # Stages whose output is keyed by page, so they can be re-run for some pages only
+    page_scoped_stages = ("images", "tables")
+
     def __init__(self, loader: FileLoader):
         self.loader = loader
         self.file = None
         self.file_path = None
+        self._font_styles = None
+        # 1-based page numbers to extract, e.g. range(101, 201) or [3, 7]; None means every page
+        self.page_range: Optional[Sequence[int]] = None
 
     def load(self, file_path: str):
         """Load the file using the appropriate loader based on file type."""
-        self.file = self.loader.load_file(file_path)
+        with measure("load_file"):
+            self.file = self.loader.load_file(file_path)
         self.file_path = file_path 
+        self._font_styles = None
+
+    def reopen(self) -> "DataExtractor":
+        """A copy of this extractor with its own handle on the same file, e.g. for another thread."""
+        clone = copy.copy(self)
+        clone.load(self.file_path)
+        return clone
+
+    def __getstate__(self):
+        # Parsed documents cannot be pickled; a worker process loads the file again
+        state = self.__dict__.copy()
+        state["file"] = None
+        state["_font_styles"] = None
+        return state
+
+    def pages_to_extract(self, page_count: int) -> Sequence[int]:
+        """The 1-based page numbers to extract: page_range clipped to the document, or every page."""
+        if self.page_range is None:
+            return range(1, page_count + 1)
+        if isinstance(self.page_range, range) and self.page_range.step == 1:
+            return range(max(1, self.page_range.start), min(page_count + 1, self.page_range.stop))
+        return sorted(page for page in set(self.page_range) if 1 <= page <= page_count)
+
+    def page_hashes(self) -> Optional[Dict[int, str]]:
+        """A content hash per 1-based page, or None when the format has no stable pages."""
+        return None
+
+    def font_styles(self) -> FontStyleCounter:
+        """Scan the file for font styles once and reuse the counts for every page."""
+        if self._font_styles is None:
+            counter = FontStyleCounter()
+            self.collect_font_styles(counter)
+            self._font_styles = counter
+        return self._font_styles
 
     # * for text
     @abc.abstractmethod
-    def extract_text(self) -> List[Dict[str, Any]]:
+    def iter_text(self) -> Iterator[PageText]:
+        """Yield one text record per page/slide/paragraph."""
         pass
 
+    def extract_text(self) -> List[PageText]:
+        return collect("extract_text", self.iter_text())
+
     # * for heading
     @abc.abstractmethod
     def extract_headings(self, text: str) -> List[str]:
         pass
 
     # * for font styles
+    def extract_font_styles(self) -> Dict[str, Any]:
+        """Return font style counts for the whole document."""
+        with measure("extract_font_styles"):
+            return self.font_styles().document()
+
     @abc.abstractmethod
-    def extract_font_styles(self) -> Dict[str, int]:
+    def collect_font_styles(self, counter: FontStyleCounter):
+        """Walk every run/span of the file once and add it to the counter."""
         pass
 
     # * for images
     @abc.abstractmethod
-    def extract_images(self, output_folder: str) -> List[str]:
+    def iter_images(self, output_folder: Optional[str] = None) -> Iterator[ImageRef]:
+        """Yield one in-memory image record per image, also saving it into output_folder when given."""
         pass
 
+    def extract_images(self, output_folder: Optional[str] = None) -> List[ImageRef]:
+        return collect("extract_images", self.iter_images(output_folder),
+                       lambda images: sum(image["size"] for image in images) if output_folder else 0)
+
+    @staticmethod
+    def _image_record(page_number: int, file_name: str, image_bytes: bytes, ext: str,
+                      width: Optional[int], height: Optional[int], output_folder: Optional[str] = None) -> ImageRef:
+        """Build an image record from the bytes and header metadata, writing the file only if asked to."""
+        image_path = file_name
+        if output_folder:
+            image_path = os.path.join(output_folder, file_name)
+            with open(image_path, 'wb') as image_file:
+                image_file.write(image_bytes)
+        return ImageRef(
+            page_number=page_number,
+            image_path=image_path,
+            image=image_bytes,
+            image_hash=hashlib.sha256(image_bytes).hexdigest(),
+            ext=ext,
+            width=width,
+            height=height,
+            size=len(image_bytes)
+        )
+
     # * for links
     @abc.abstractmethod
-    def extract_links(self) -> List[Dict[str, Any]]:
+    def iter_links(self) -> Iterator[Link]:
+        """Yield one record per hyperlink."""
         pass
 
+    def extract_links(self) -> List[Link]:
+        return collect("extract_links", self.iter_links())
+
     # * for tables
     @abc.abstractmethod
-    def extract_tables(self, output_folder: str) -> List[str]:
-        pass
\ No newline at end of file
+    def iter_tables(self, output_folder: str) -> Iterator[TableRef]:
+        """Save tables into output_folder as CSV and yield a reference to each file."""
+        pass
+
+    def extract_tables(self, output_folder: str) -> List[TableRef]:
+        return collect("extract_tables", self.iter_tables(output_folder),
+                       lambda tables: sum(os.path.getsize(table) for table in tables))
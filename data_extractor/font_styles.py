@@ -0,0 +1,49 @@
+from collections import Counter
+from typing import Dict, Any, Optional
+
+class FontStyleCounter:
+    """Per-page and whole-document font style counts, filled in a single pass over the file."""
+
+    def __init__(self):
+        self.pages: Dict[int, Dict[str, Any]] = {}
+        self.totals = self._new_counts()
+
+    @staticmethod
+    def _new_counts() -> Dict[str, Any]:
+        return {'bold': 0, 'italic': 0, 'fonts': Counter(), 'sizes': Counter()}
+
+    def add(self, page_number: Optional[int], bold: bool = False, italic: bool = False,
+            font: Optional[str] = None, size: Optional[float] = None):
+        """Count one run/span. Runs without a page number only go into the document totals."""
+        targets = [self.totals]
+        if page_number is not None:
+            if page_number not in self.pages:
+                self.pages[page_number] = self._new_counts()
+            targets.append(self.pages[page_number])
+
+        for counts in targets:
+            if bold:
+                counts['bold'] += 1
+            if italic:
+                counts['italic'] += 1
+            if font:
+                counts['fonts'][font] += 1
+            if size:
+                counts['sizes'][round(float(size), 1)] += 1
+
+    @staticmethod
+    def _as_dict(counts: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            'bold': counts['bold'],
+            'italic': counts['italic'],
+            'fonts': dict(counts['fonts']),
+            'sizes': dict(counts['sizes'])
+        }
+
+    def page(self, page_number: int) -> Dict[str, Any]:
+        """Font style counts for a single page/slide."""
+        return self._as_dict(self.pages.get(page_number) or self._new_counts())
+
+    def document(self) -> Dict[str, Any]:
+        """Font style counts for the whole document."""
+        return self._as_dict(self.totals)
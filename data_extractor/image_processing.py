@@ -0,0 +1,262 @@
+"""Post-processing of extracted images: format normalisation, a resolution cap and thumbnails.
+
+Images that already match the options are passed through without being decoded. The
+others are decoded by Pillow at the smallest size that still covers the target (draft()
+lets JPEG decode straight to 1/2, 1/4 or 1/8 scale, and reducing_gap shrinks by whole
+factors before resampling), then re-encoded. The work runs in a thread or process pool
+while the records keep their order.
+"""
+import hashlib
+import io
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+from data_extractor.records import ImageRef
+from metrics import Measurement
+
+# Output formats; other source formats are still read, e.g. TIFF, BMP and GIF
+PILLOW_FORMATS = {"jpeg": "JPEG", "jpg": "JPEG", "png": "PNG", "webp": "WEBP"}
+EXECUTORS = ("thread", "process")
+THUMBNAIL_FOLDER = "thumbnails"
+# Shrink by whole factors until within this factor of the target, then resample; 2-3 looks the same as a full resample
+REDUCING_GAP = 3.0
+
+@dataclass(frozen=True)
+class ImageOptions:
+    """What to do with every extracted image; the defaults leave images untouched."""
+    format: Optional[str] = None
+    quality: int = 85
+    max_size: Optional[int] = None
+    thumbnail_size: Optional[int] = None
+
+    def __post_init__(self):
+        if self.format is not None and self.format.lower() not in PILLOW_FORMATS:
+            raise ValueError(f"Unknown image format: {self.format} (expected one of {', '.join(PILLOW_FORMATS)})")
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.format or self.max_size or self.thumbnail_size)
+
+class ImageProcessingStats:
+    """Images seen by the stage, what was done to them and the bytes before and after."""
+
+    def __init__(self):
+        self.images = 0
+        self.transformed = 0
+        self.resized = 0
+        self.thumbnails = 0
+        self.failed = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.seconds = 0.0
+
+    def merge(self, stats: Dict[str, Any]):
+        for name in ("images", "transformed", "resized", "thumbnails", "failed", "bytes_in", "bytes_out", "seconds"):
+            setattr(self, name, getattr(self, name) + stats[name])
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "images": self.images,
+            "transformed": self.transformed,
+            "resized": self.resized,
+            "thumbnails": self.thumbnails,
+            "failed": self.failed,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "bytes_saved": self.bytes_in - self.bytes_out,
+            "seconds": self.seconds,
+            "images_per_sec": self.images / self.seconds if self.seconds else 0.0
+        }
+
+def _same_format(ext: Optional[str], target: str) -> bool:
+    return PILLOW_FORMATS.get((ext or "").lower()) == PILLOW_FORMATS[target.lower()]
+
+def needs_transform(image: ImageRef, options: ImageOptions) -> bool:
+    """Whether the image itself has to be re-encoded; unknown dimensions count as too large until read."""
+    if options.format and not _same_format(image.ext, options.format):
+        return True
+    if options.max_size and (image.width is None or image.height is None or
+                             max(image.width, image.height) > options.max_size):
+        return True
+    return False
+
+def _fit(img, size: int):
+    """Scale the image down in place to fit in size x size.
+
+    On a not yet decoded image, thumbnail() first calls draft() and reduce(), so a large
+    JPEG is decoded at a fraction of its size and only the rest is resampled.
+    """
+    img.thumbnail((size, size), reducing_gap=REDUCING_GAP)
+    return img
+
+def _encode(img, image_format: str, quality: int) -> bytes:
+    from PIL import Image
+    pillow_format = PILLOW_FORMATS[image_format.lower()]
+    has_alpha = img.mode in ("RGBA", "LA", "PA") or "transparency" in img.info
+    if pillow_format == "JPEG" and img.mode not in ("RGB", "L"):
+        if has_alpha:
+            # JPEG has no alpha channel, so transparent areas become white
+            rgba = img.convert("RGBA")
+            img = Image.new("RGB", img.size, "white")
+            img.paste(rgba, mask=rgba.getchannel("A"))
+        else:
+            img = img.convert("RGB")
+    elif pillow_format == "WEBP" and img.mode not in ("RGB", "RGBA"):
+        img = img.convert("RGBA" if has_alpha else "RGB")
+    elif pillow_format == "PNG" and img.mode == "CMYK":
+        img = img.convert("RGB")
+    output = io.BytesIO()
+    if pillow_format == "PNG":
+        img.save(output, format=pillow_format)
+    else:
+        img.save(output, format=pillow_format, quality=quality)
+    return output.getvalue()
+
+def _output_path(image_path: str, ext: Optional[str], output_folder: Optional[str]) -> str:
+    stem, path_ext = os.path.splitext(os.path.basename(image_path))
+    # Without a known format the image keeps the extension it was extracted with, if any
+    file_name = f"{stem}.{ext}" if ext else stem + path_ext
+    return os.path.join(output_folder, file_name) if output_folder else file_name
+
+def _write(path: str, data: bytes):
+    with open(path, 'wb') as image_file:
+        image_file.write(data)
+
+def transform_image(image: ImageRef, options: ImageOptions,
+                    output_folder: Optional[str] = None) -> Tuple[ImageRef, Dict[str, int]]:
+    """Apply the options to one image and write the result (and its thumbnail) into output_folder.
+
+    Returns the new record and what was done ("transformed", "resized", "thumbnails", "failed").
+    Images Pillow cannot read are kept as they are.
+    """
+    from PIL import Image
+    done = {"transformed": 0, "resized": 0, "thumbnails": 0, "failed": 0}
+    data, ext, width, height = image.image, image.ext, image.width, image.height
+    thumbnail = None
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            width, height = img.size
+            # Records without an extension get the format Pillow recognised
+            ext = ext or (img.format or "").lower() or None
+            # Only the header has been read so far; it may show that nothing needs to change
+            if needs_transform(image.replace(width=width, height=height), options):
+                target = min(options.max_size or max(img.size), max(img.size))
+                done["resized"] = int(target < max(img.size))
+                _fit(img, target)
+                if options.format:
+                    ext = options.format.lower()
+                elif (ext or "").lower() not in PILLOW_FORMATS:
+                    # Downscaled, but Pillow cannot write the source format
+                    ext = "png"
+                data = _encode(img, ext, options.quality)
+                width, height = img.size
+                done["transformed"] = 1
+            if options.thumbnail_size and output_folder:
+                # From the downscaled image, or decoded at thumbnail scale when the image itself is kept
+                thumbnail = _encode(_fit(img, options.thumbnail_size), options.format or "jpeg", options.quality)
+    except Exception:
+        # Vector (WMF/EMF), JBIG2 or damaged images
+        done = {"transformed": 0, "resized": 0, "thumbnails": 0, "failed": 1}
+        data, ext, width, height, thumbnail = image.image, image.ext, image.width, image.height, None
+
+    image_path = _output_path(image.image_path, ext, output_folder)
+    thumbnail_path = None
+    if output_folder:
+        _write(image_path, data)
+        if thumbnail is not None:
+            thumbnail_folder = os.path.join(output_folder, THUMBNAIL_FOLDER)
+            os.makedirs(thumbnail_folder, exist_ok=True)
+            thumbnail_path = _output_path(image.image_path, options.format or "jpeg", thumbnail_folder)
+            _write(thumbnail_path, thumbnail)
+            done["thumbnails"] = 1
+    if data is not image.image:
+        image = image.replace(image=data, image_hash=hashlib.sha256(data).hexdigest(), ext=ext,
+                              width=width, height=height, size=len(data))
+    elif ext != image.ext:
+        image = image.replace(ext=ext)
+    return image.replace(image_path=image_path, thumbnail_path=thumbnail_path), done
+
+def _pass_through(image: ImageRef, output_folder: Optional[str]) -> Tuple[ImageRef, Dict[str, int]]:
+    """Write an image that needs no change as it is, without decoding it."""
+    image_path = _output_path(image.image_path, image.ext, output_folder)
+    if output_folder:
+        _write(image_path, image.image)
+    return image.replace(image_path=image_path), {}
+
+class ImageProcessor:
+    """Run transform_image over a stream of image records in a pool, yielding them in their original order.
+
+    At most max_in_flight images are being processed at once, so a stream of images is
+    never held in memory as a whole. Images that need no change bypass the pool. With
+    thumbnails they still go through it, since they are decoded for the thumbnail.
+    """
+
+    def __init__(self, options: ImageOptions, workers: int = 1, executor: str = "thread",
+                 max_in_flight: Optional[int] = None):
+        if executor not in EXECUTORS:
+            raise ValueError(f"Unknown image executor: {executor}")
+        self.options = options
+        self.workers = max(1, workers)
+        self.executor = executor
+        self.max_in_flight = max_in_flight or self.workers * 2
+        self.stats = ImageProcessingStats()
+        self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _submit(self, image: ImageRef, output_folder: Optional[str]) -> Future:
+        if not needs_transform(image, self.options) and not (self.options.thumbnail_size and output_folder):
+            future = Future()
+            future.set_result(_pass_through(image, output_folder))
+            return future
+        if self.workers == 1:
+            future = Future()
+            future.set_result(transform_image(image, self.options, output_folder))
+            return future
+        if self._pool is None:
+            pool_class = ThreadPoolExecutor if self.executor == "thread" else ProcessPoolExecutor
+            self._pool = pool_class(self.workers)
+        return self._pool.submit(transform_image, image, self.options, output_folder)
+
+    def process_all(self, images: Iterable[ImageRef], output_folder: Optional[str] = None) -> Iterator[ImageRef]:
+        """Yield every image processed, writing the results into output_folder when given."""
+        if output_folder:
+            os.makedirs(output_folder, exist_ok=True)
+        # Only the time spent in this stage is measured, not the extraction that feeds it
+        measurement = Measurement("process_images")
+        window = deque()
+        upstream = iter(images)
+        while True:
+            for image in upstream:
+                measurement.start()
+                self.stats.bytes_in += image.size
+                window.append(self._submit(image, output_folder))
+                measurement.stop()
+                if len(window) >= self.max_in_flight:
+                    break
+            if not window:
+                break
+            measurement.start()
+            image, done = window.popleft().result()
+            measurement.stop()
+            self.stats.images += 1
+            self.stats.bytes_out += image.size
+            for name, count in done.items():
+                setattr(self.stats, name, getattr(self.stats, name) + count)
+            measurement.records += 1
+            if output_folder:
+                measurement.bytes_written += image.size
+            yield image
+        self.stats.seconds += measurement.wall_seconds
+        measurement.record()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
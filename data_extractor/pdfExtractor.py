@@ -1,29 +1,92 @@
-from typing import List, Dict, Any
-import tabula
+from typing import List, Dict, Iterator, Optional, Tuple, TYPE_CHECKING
+from contextlib import contextmanager
+import glob
+import hashlib
 from loader.file_loader import FileLoader
 from data_extractor.extractor import DataExtractor
+from data_extractor.font_styles import FontStyleCounter
+from data_extractor.records import PageText, Link, ImageRef, TableRef
 import fitz
 import os
 
+if TYPE_CHECKING:
+    import pandas as pd
+
+TABLE_ENGINES = ("pymupdf", "tabula")
+
 class PdfExtractor(DataExtractor):
-    def __init__(self, loader: FileLoader):
+    supports_page_range = True
+
+    def __init__(self, loader: FileLoader, table_engine: str = "pymupdf"):
         super().__init__(loader)
+        if table_engine not in TABLE_ENGINES:
+            raise ValueError(f"Unknown table engine: {table_engine}")
+        self.table_engine = table_engine
+
+    @property
+    def page_scoped_stages(self) -> Tuple[str, ...]:
+        # tabula tables have no page, so their files are numbered across the whole document
+        return ("images", "tables") if self._finds_tables_in_process() else ("images",)
+
+    def _finds_tables_in_process(self) -> bool:
+        return self.table_engine != "tabula" and hasattr(fitz.Page, "find_tables")
+
+    def _uses_pymupdf(self) -> bool:
+        return isinstance(self.file, fitz.Document)
+
+    @contextmanager
+    def _pymupdf_document(self):
+        """Yield the loaded PyMuPDF handle, or open one when the file was loaded with PyPDF2."""
+        if self._uses_pymupdf():
+            yield self.file
+        else:
+            with fitz.open(self.file_path) as pdf_document:
+                yield pdf_document
+
+    def page_count(self) -> int:
+        return len(self.file) if self._uses_pymupdf() else len(self.file.pages)
+
+    def _pages(self, document=None):
+        """Yield (page_number, page) for every page in page_range of the given or the loaded document."""
+        if document is None:
+            document = self.file if self._uses_pymupdf() else self.file.pages
+        for page_num in self.pages_to_extract(len(document)):
+            yield page_num, document[page_num - 1]
+
+    def page_hashes(self) -> Dict[int, str]:
+        """Hash every page's content stream together with the images, forms and links it draws."""
+        stream_hashes = {}
+
+        def stream_hash(pdf_document, xref):
+            # Shared images and forms are hashed once per document
+            if xref not in stream_hashes:
+                stream_hashes[xref] = hashlib.sha256(pdf_document.xref_stream_raw(xref) or b"").digest()
+            return stream_hashes[xref]
+
+        hashes = {}
+        with self._pymupdf_document() as pdf_document:
+            for page_num, page in enumerate(pdf_document, start=1):
+                digest = hashlib.sha256(page.read_contents())
+                for xref in [image[0] for image in page.get_images(full=True)] + [form[0] for form in page.get_xobjects()]:
+                    digest.update(stream_hash(pdf_document, xref))
+                for link in page.get_links():
+                    digest.update(repr((link.get("uri"), link.get("page"), tuple(link["from"]))).encode())
+                hashes[page_num] = digest.hexdigest()
+        return hashes
 
     # * for text
-    def extract_text(self) -> List[Dict[str, Any]]:
-        """Extract text, headings, and font styles from a PDF file."""
-        extracted_data = []
-        for page_num, page in enumerate(self.file.pages, start=1):
-            text = page.extract_text()
+    def iter_text(self) -> Iterator[PageText]:
+        """Yield text, headings, and font styles from a PDF file, one page at a time."""
+        for page_num, page in self._pages():
+            text = page.get_text() if self._uses_pymupdf() else page.extract_text()
             headings = self.extract_headings(text)
-            font_styles = self.extract_font_styles()
-            extracted_data.append({
-                "page_number": page_num,
-                "text": text,
-                "headings": headings,
-                "font_styles": font_styles
-            })
-        return extracted_data
+            font_styles = self.font_styles().page(page_num)
+            yield PageText(
+                page_number=page_num,
+                text=text,
+                headings=headings,
+                font_styles=font_styles
+            )
 
     # * for heading
     def extract_headings(self, text: str) -> List[str]:
@@ -32,51 +95,56 @@ class PdfExtractor(DataExtractor):
         return headings
 
     # * for font styles
-    def extract_font_styles(self) -> Dict[str, int]:
-        """Extract font styles from a PDF by analyzing the text for style indicators."""
-        styles = {'bold': 0, 'italic': 0}
-        for page in self.file.pages:
-            for font in page.get("fonts", []):  # Simplified example, can use more detailed parsing
-                if "Bold" in font["name"]:
-                    styles['bold'] += 1
-                if "Italic" in font["name"]:
-                    styles['italic'] += 1
-        return styles
+    def collect_font_styles(self, counter: FontStyleCounter):
+        """Count font styles from the span font flags reported by PyMuPDF."""
+        with self._pymupdf_document() as pdf_document:
+            for page_num, page in self._pages(pdf_document):
+                for block in page.get_text("dict", flags=fitz.TEXTFLAGS_TEXT)["blocks"]:
+                    for line in block.get("lines", []):
+                        for span in line["spans"]:
+                            counter.add(
+                                page_num,
+                                bold=bool(span["flags"] & fitz.TEXT_FONT_BOLD),
+                                italic=bool(span["flags"] & fitz.TEXT_FONT_ITALIC),
+                                font=span["font"],
+                                size=span["size"]
+                            )
 
     # * for images
-    def extract_images(self, output_folder: str) -> List[str]:
-        # Open the PDF file
-        pdf_document = fitz.open(self.file_path)
-        image_paths = []
-
-        # Loop through each page
-        for page_number in range(len(pdf_document)):
-            page = pdf_document[page_number]
-            image_list = page.get_images(full=True)  # Get images from the page
-            
-            for img_index, img in enumerate(image_list):
-                # Extract the image index and the XREF number
-                xref = img[0]
-                base_image = pdf_document.extract_image(xref)
+    def iter_images(self, output_folder: Optional[str] = None) -> Iterator[ImageRef]:
+        """Yield in-memory image records from a PDF file, one image at a time."""
+        with self._pymupdf_document() as pdf_document:
+            # Loop through each page
+            for page_number, page in self._pages(pdf_document):
+                image_list = page.get_images(full=True)  # Get images from the page
                 
-                # Get the image bytes
-                image_bytes = base_image["image"]
-                image_extension = base_image["ext"]  # Get the image extension
-                image_path = os.path.join(output_folder, f'image_page_{page_number + 1}_{img_index + 1}.{image_extension}')
-
-                # Save the image
-                with open(image_path, "wb") as image_file:
-                    image_file.write(image_bytes)
-
-                image_paths.append([image_path, page_number + 1])
-
-        return image_paths
+                for img_index, img in enumerate(image_list):
+                    # Extract the image index and the XREF number
+                    xref = img[0]
+                    # Bytes, extension and size come straight from the PDF image dictionary
+                    base_image = pdf_document.extract_image(xref)
+                    image_extension = base_image["ext"]  # Get the image extension
+                    yield self._image_record(
+                        page_number,
+                        f'image_page_{page_number}_{img_index + 1}.{image_extension}',
+                        base_image["image"],
+                        image_extension,
+                        base_image["width"],
+                        base_image["height"],
+                        output_folder
+                    )
 
     # * for links
-    def extract_links(self) -> List[Dict[str, Any]]:
-        """Extract hyperlinks from a PDF file."""
-        extracted_links = []
-        for page_num, page in enumerate(self.file.pages, start=1):
+    def iter_links(self) -> Iterator[Link]:
+        """Yield hyperlinks from a PDF file, one page at a time."""
+        if self._uses_pymupdf():
+            for page_num, page in self._pages():
+                for link in page.get_links():
+                    if link["kind"] == fitz.LINK_URI and link.get("uri"):
+                        yield Link(linked_text=link["uri"], url=link["uri"], page_number=page_num)
+            return
+
+        for page_num, page in self._pages():
             # Extract annotations from the page
             if '/Annots' in page:
                 annotations = page['/Annots']
@@ -85,24 +153,85 @@ class PdfExtractor(DataExtractor):
                     # Check if the annotation object has the expected structure
                     if '/A' in annot_obj and '/URI' in annot_obj['/A']:
                         link = annot_obj['/A']['/URI']
-                        extracted_links.append({
-                            "linked_text": link,  # You can also extract the text if needed
-                            "url": link,
-                            "page_number": page_num
-                        })
-        return extracted_links
+                        yield Link(
+                            linked_text=link,  # You can also extract the text if needed
+                            url=link,
+                            page_number=page_num
+                        )
 
     # * for tables
-    def extract_tables(self, output_folder: str) -> List[str]:
-        # Extract tables from PDF
-        tables = tabula.read_pdf(self.file_path, pages='all', multiple_tables=True)
-
-        extracted_tables = []
+    def iter_tables(self, output_folder: str) -> Iterator[TableRef]:
+        """Save tables from a PDF file as CSV and yield a reference to each file."""
+        if not self._finds_tables_in_process():
+            pages = 'all' if self.page_range is None else list(self.pages_to_extract(self.page_count()))
+            # tabula does not say which page a table came from
+            tables = ((None, table) for table in self._tabula_tables(pages)) if pages else []
+        else:
+            if self.page_range is not None:
+                # Drop the files of tables a re-extracted (or deleted) page no longer has
+                for page_num in self.page_range:
+                    for stale_path in glob.glob(os.path.join(glob.escape(output_folder), f'table_pdf_page_{page_num}_*.csv')):
+                        os.remove(stale_path)
+            tables = self._pymupdf_tables()
 
-        # Save each table as a CSV file
-        for i, table in enumerate(tables):
-            csv_file_path = os.path.join(output_folder, f'table_pdf_{i + 1}.csv')
+        # Save each table as a CSV file, numbered within its page so that some pages can be re-extracted alone
+        counts = {}
+        for page_num, table in tables:
+            counts[page_num] = counts.get(page_num, 0) + 1
+            if page_num is None:
+                file_name = f'table_pdf_{counts[page_num]}.csv'
+            else:
+                file_name = f'table_pdf_page_{page_num}_{counts[page_num]}.csv'
+            csv_file_path = os.path.join(output_folder, file_name)
             table.to_csv(csv_file_path, index=False)  # Save to CSV without index
-            extracted_tables.append(csv_file_path)
+            yield TableRef(table_path=csv_file_path, page_number=page_num)
+
+    def _tabula_tables(self, pages) -> List["pd.DataFrame"]:
+        # tabula starts a JVM for every call, and importing it pulls in pandas, so it is only imported here
+        import tabula
+        return tabula.read_pdf(self.file_path, pages=pages, multiple_tables=True)
+
+    def _tabula_page_tables(self, page_nums: List[int]) -> Dict[int, List["pd.DataFrame"]]:
+        """The tables tabula finds on each of the given pages, from a single tabula run (one JVM start).
+
+        tabula does not say which page a table came from, so every page is written to a PDF of its
+        own and the folder is converted in one batch, giving one JSON result per page.
+        """
+        import json
+        import tempfile
+        import tabula
+        # read_pdf builds its DataFrames from tabula's JSON output with the same function
+        from tabula.io import _extract_from
+        with tempfile.TemporaryDirectory() as folder:
+            with self._pymupdf_document() as pdf_document:
+                for page_num in page_nums:
+                    with fitz.open() as page_document:
+                        page_document.insert_pdf(pdf_document, from_page=page_num - 1, to_page=page_num - 1)
+                        page_document.save(os.path.join(folder, f"page_{page_num}.pdf"))
+            tabula.convert_into_by_batch(folder, output_format="json", pages="all")
+            tables = {}
+            for page_num in page_nums:
+                with open(os.path.join(folder, f"page_{page_num}.json")) as file:
+                    tables[page_num] = _extract_from(json.load(file))
+        return tables
 
-        return extracted_tables
\ No newline at end of file
+    def _pymupdf_tables(self) -> Iterator[Tuple[int, "pd.DataFrame"]]:
+        # Tables are streamed page by page until the table finder fails on a page. From then on
+        # they are held back until tabula has handled every failing page, to keep page order.
+        held_back, failed_pages = [], []
+        with self._pymupdf_document() as pdf_document:
+            for page_num, page in self._pages(pdf_document):
+                try:
+                    tables = [table.to_pandas() for table in page.find_tables().tables]
+                except Exception:
+                    tables = None
+                    failed_pages.append(page_num)
+                if not failed_pages:
+                    for table in tables:
+                        yield page_num, table
+                else:
+                    held_back.append((page_num, tables))
+        fallback = self._tabula_page_tables(failed_pages) if failed_pages else {}
+        for page_num, tables in held_back:
+            for table in fallback[page_num] if tables is None else tables:
+                yield page_num, table
@@ -1,28 +1,70 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Iterator, Optional
 from loader.file_loader import FileLoader
+import hashlib
 import os
 from data_extractor.extractor import DataExtractor
-import pandas as pd
+from data_extractor.font_styles import FontStyleCounter
+from data_extractor.records import PageText, Link, ImageRef, TableRef
+from loader.ooxml import PptxPackage
 
 class PPTExtractor(DataExtractor):
+    supports_page_range = True
+
     def __init__(self, loader: FileLoader):
         super().__init__(loader)
 
-    # * for text
-    def extract_text(self) -> List[Dict[str, Any]]:
-        """Extract text and headings from a PPTX file."""
-        extracted_data = []
+    def _uses_lxml(self) -> bool:
+        return isinstance(self.file, PptxPackage)
+
+    def page_count(self) -> int:
+        return self.file.slide_count() if self._uses_lxml() else len(self.file.slides)
+
+    def _slides(self):
+        """Yield (slide_number, slide) for every slide in page_range; a parsed slide dict with the lxml backend."""
+        if self._uses_lxml():
+            for slide_num in self.pages_to_extract(self.file.slide_count()):
+                yield slide_num, self.file.slide(slide_num)
+            return
+        slides = self.file.slides
+        for slide_num in self.pages_to_extract(len(slides)):
+            yield slide_num, slides[slide_num - 1]
+
+    def page_hashes(self) -> Dict[int, str]:
+        """Hash every slide's XML together with the parts it references (pictures, charts, layout)."""
+        if self._uses_lxml():
+            return self.file.page_hashes()
+        part_hashes = {}
+        hashes = {}
         for slide_num, slide in enumerate(self.file.slides, start=1):
-            text = "\n".join([shape.text for shape in slide.shapes if hasattr(shape, "text")])
+            digest = hashlib.sha256(slide.part.blob)
+            for rel_id, rel in sorted(slide.part.rels.items()):
+                if rel.is_external:
+                    digest.update(rel.target_ref.encode())
+                    continue
+                part = rel.target_part
+                # Layouts and shared media are hashed once per presentation
+                if part.partname not in part_hashes:
+                    part_hashes[part.partname] = hashlib.sha256(part.blob).digest()
+                digest.update(part_hashes[part.partname])
+            hashes[slide_num] = digest.hexdigest()
+        return hashes
+
+    # * for text
+    def iter_text(self) -> Iterator[PageText]:
+        """Yield text and headings from a PPTX file, one slide at a time."""
+        for slide_num, slide in self._slides():
+            if self._uses_lxml():
+                text = "\n".join(slide["texts"])
+            else:
+                text = "\n".join([shape.text for shape in slide.shapes if hasattr(shape, "text")])
             headings = self.extract_headings(text)
-            font_styles = self.extract_font_styles()
-            extracted_data.append({
-                "page_number": slide_num,
-                "text": text,
-                "headings": headings,
-                "font_styles": font_styles
-            })
-        return extracted_data
+            font_styles = self.font_styles().page(slide_num)
+            yield PageText(
+                page_number=slide_num,
+                text=text,
+                headings=headings,
+                font_styles=font_styles
+            )
 
     # * for heading
     def extract_headings(self, text: str) -> List[str]:
@@ -31,42 +73,59 @@ class PPTExtractor(DataExtractor):
         return headings
 
     # * for font styles
-    def extract_font_styles(self) -> Dict[str, int]:
-        """Extract font styles (bold, italic) from a PPTX file."""
-        styles = {'bold': 0, 'italic': 0}
-        for slide in self.file.slides:
+    def collect_font_styles(self, counter: FontStyleCounter):
+        """Count font styles (bold, italic, font, size) of every run in a PPTX file."""
+        for slide_num, slide in self._slides():
+            if self._uses_lxml():
+                for bold, italic, font, size in slide["runs"]:
+                    counter.add(slide_num, bold=bool(bold), italic=bool(italic), font=font, size=size)
+                continue
             for shape in slide.shapes:
                 if hasattr(shape, "text_frame"):
                     for para in shape.text_frame.paragraphs:
                         for run in para.runs:
-                            if run.font.bold:
-                                styles['bold'] += 1
-                            if run.font.italic:
-                                styles['italic'] += 1
-        return styles
+                            font = run.font
+                            counter.add(
+                                slide_num,
+                                bold=bool(font.bold),
+                                italic=bool(font.italic),
+                                font=font.name,
+                                size=font.size.pt if font.size is not None else None
+                            )
 
     # * for images
-    def extract_images(self, output_folder: str) -> List[str]:
-        """Extract images from a PPTX file."""
-        image_paths = []
-        for slide_num, slide in enumerate(self.file.slides, start=1):
+    def iter_images(self, output_folder: Optional[str] = None) -> Iterator[ImageRef]:
+        """Yield in-memory image records from a PPTX file, one image at a time."""
+        for slide_num, slide in self._slides():
+            img_index = 0
+            if self._uses_lxml():
+                for img_index, partname in enumerate(slide["pictures"], start=1):
+                    if partname is not None:
+                        blob, ext, width, height = self.file.image(partname)
+                        yield self._image_record(
+                            slide_num, f'pptx_image_{slide_num}_{img_index}.{ext}', blob, ext, width, height,
+                            output_folder
+                        )
+                continue
             for shape in slide.shapes:
                 if shape.shape_type == 13:  # 13 corresponds to 'PICTURE'
+                    img_index += 1
                     image = shape.image
-                    image_bytes = image.blob
-                    image_file_name = f'pptx_image_{slide_num}.png'
-                    image_path = os.path.join(output_folder, image_file_name)
-                    with open(image_path, 'wb') as f:
-                        f.write(image_bytes)
-                    image_paths.append([image_path, slide_num])
-        return image_paths
+                    width, height = image.size  # Read from the image header, no decode
+                    yield self._image_record(
+                        slide_num, f'pptx_image_{slide_num}_{img_index}.{image.ext}',
+                        image.blob, image.ext, width, height, output_folder
+                    )
 
     # * for links
-    def extract_links(self) -> List[Dict[str, Any]]:
-        """Extract hyperlinks from a PPTX file."""
-        extracted_links = []
+    def iter_links(self) -> Iterator[Link]:
+        """Yield hyperlinks from a PPTX file, one slide at a time."""
         # Loop through each slide in the presentation
-        for slide_num, slide in enumerate(self.file.slides, start=1):
+        for slide_num, slide in self._slides():
+            if self._uses_lxml():
+                for text, url in slide["links"]:
+                    yield Link(linked_text=text, url=url, page_number=slide_num)
+                continue
             # Loop through each shape in the slide
             for shape in slide.shapes:
                 # Check if the shape has a text frame and it is not None
@@ -77,25 +136,25 @@ class PPTExtractor(DataExtractor):
                         for run in paragraph.runs:
                             # Check if the run has a hyperlink and get the link address
                             if run.hyperlink and run.hyperlink.address:
-                                extracted_links.append({
-                                    "linked_text": run.text,  # Get the text of the hyperlink
-                                    "url": run.hyperlink.address,  # Get the hyperlink address
-                                    "page_number": slide_num  # Get the slide number
-                                })
-        return extracted_links
+                                yield Link(
+                                    linked_text=run.text,  # Get the text of the hyperlink
+                                    url=run.hyperlink.address,  # Get the hyperlink address
+                                    page_number=slide_num  # Get the slide number
+                                )
 
     # * for tables
-    def extract_tables(self, output_folder: str) -> List[str]:
-        """Extract tables from a PPTX file and save as CSV."""
-        extracted_tables = []
-        for slide_num, slide in enumerate(self.file.slides, start=1):
-            for shape in slide.shapes:
-                if shape.has_table:
-                    table = shape.table
-                    data = [[cell.text for cell in row.cells] for row in table.rows]
-                    df = pd.DataFrame(data)
-                    csv_file_path = os.path.join(output_folder, f'table_pptx_slide_{slide_num}.csv')
-                    df.to_csv(csv_file_path, index=False, header=False)
-                    extracted_tables.append(csv_file_path)
-
-        return extracted_tables
\ No newline at end of file
+    def iter_tables(self, output_folder: str) -> Iterator[TableRef]:
+        """Save tables from a PPTX file as CSV and yield a reference to each file."""
+        # pandas takes longer to import than most documents take to extract, so only table runs pay for it
+        import pandas as pd
+        for slide_num, slide in self._slides():
+            if self._uses_lxml():
+                tables = slide["tables"]
+            else:
+                tables = ([[cell.text for cell in row.cells] for row in shape.table.rows]
+                          for shape in slide.shapes if shape.has_table)
+            for data in tables:
+                df = pd.DataFrame(data)
+                csv_file_path = os.path.join(output_folder, f'table_pptx_slide_{slide_num}.csv')
+                df.to_csv(csv_file_path, index=False, header=False)
+                yield TableRef(table_path=csv_file_path, page_number=slide_num)
@@ -0,0 +1,124 @@
+"""Typed records returned by the extractors, and a columnar batch of them for bulk hand-off.
+
+Records are frozen dataclasses with __slots__: no per-record __dict__, and the same fields
+for every format. They also read like the dicts the extractors used to return
+(record["text"], record.get("url"), dict(record)), so storage code works with both.
+Measure the per-record footprint with `python -m benchmarks.bench_records`.
+"""
+from array import array
+from collections.abc import Mapping
+from dataclasses import dataclass, field, fields, replace
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Type
+
+class Record(Mapping):
+    """Read-only mapping view of a record dataclass; keys are the field names in order."""
+
+    __slots__ = ()
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.__slots__)
+
+    def __len__(self) -> int:
+        return len(self.__slots__)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __reduce__(self):
+        # Positional fields pickle several times faster than the default frozen-dataclass state
+        return type(self), tuple(getattr(self, name) for name in self.__slots__)
+
+    def replace(self, **changes) -> "Record":
+        """A copy with some fields changed; records themselves are immutable."""
+        return replace(self, **changes)
+
+@dataclass(frozen=True, slots=True)
+class PageText(Record):
+    """Text of a page, slide or DOCX paragraph."""
+    page_number: int
+    text: str
+    headings: List[str]
+    font_styles: Dict[str, Any]
+
+@dataclass(frozen=True, slots=True)
+class Link(Record):
+    """A hyperlink; linked_text is None where the format has no anchor text (DOCX relationships)."""
+    linked_text: Optional[str]
+    url: str
+    page_number: int
+
+@dataclass(frozen=True, slots=True)
+class ImageRef(Record):
+    """An image with its bytes and header metadata; image_path is where it was (or would be) written."""
+    page_number: int
+    image_path: str
+    image: bytes = field(repr=False)
+    image_hash: str
+    ext: str
+    width: Optional[int]
+    height: Optional[int]
+    size: int
+    # Set by the image processing stage when it wrote a thumbnail
+    thumbnail_path: Optional[str] = None
+
+@dataclass(frozen=True, slots=True)
+class TableRef(Record):
+    """A table saved as CSV; usable wherever a path is (open(), os.path.getsize(), shutil)."""
+    table_path: str
+    page_number: Optional[int]
+
+    def __fspath__(self) -> str:
+        return self.table_path
+
+def as_dict(record: Any) -> Any:
+    """A record as a plain dict, e.g. for repr() or json; anything else is returned unchanged."""
+    return record.as_dict() if isinstance(record, Record) else record
+
+class RecordBatch:
+    """Records of one type stored column by column.
+
+    Non-optional int fields are packed into array('q'), the others are lists. A batch pickles
+    as a few large objects instead of one per record, so it is the cheap way to hand a
+    document's records from a worker process to storage. Iterating yields the records, and
+    rows() yields selected fields as tuples without building records.
+    """
+
+    __slots__ = ("record_type", "columns")
+
+    def __init__(self, record_type: Type[Record], columns: Dict[str, Any]):
+        self.record_type = record_type
+        self.columns = columns
+
+    @classmethod
+    def from_records(cls, record_type: Type[Record], records: Iterable[Any]) -> "RecordBatch":
+        """Collect records (or dicts with the same keys) of record_type into columns."""
+        columns = {item.name: array('q') if item.type is int else [] for item in fields(record_type)}
+        appends = [(name, column.append) for name, column in columns.items()]
+        for record in records:
+            for name, append in appends:
+                append(record[name])
+        return cls(record_type, columns)
+
+    def __len__(self) -> int:
+        return len(next(iter(self.columns.values()), ()))
+
+    def __iter__(self) -> Iterator[Record]:
+        record_type = self.record_type
+        for values in zip(*self.columns.values()):
+            yield record_type(*values)
+
+    def column(self, name: str) -> Any:
+        return self.columns[name]
+
+    def rows(self, *names: str) -> Iterator[Tuple[Any, ...]]:
+        """The named fields of every record, as tuples in record order."""
+        return zip(*(self.columns[name] for name in names))
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        names = list(self.columns)
+        return [dict(zip(names, values)) for values in zip(*self.columns.values())]
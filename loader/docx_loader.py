@@ -1,6 +1,25 @@
-import docx
+from typing import Union, TYPE_CHECKING
 from .file_loader import FileLoader
 
+if TYPE_CHECKING:
+    import docx.document
+    from .ooxml import DocxPackage
+
 class DOCXLoader(FileLoader):
-    def load_file(self, file_path: str) -> docx.Document:
+    """Load a DOCX as a python-docx Document (default) or as a streaming DocxPackage.
+
+    With backend="lxml" the body is parsed once with iterparse into plain values instead
+    of building the object graph, which is several times faster on long documents.
+    """
+
+    def __init__(self, backend: str = "object-model"):
+        if backend not in ("object-model", "lxml"):
+            raise ValueError(f"Unknown DOCX backend: {backend}")
+        self.backend = backend
+
+    def load_file(self, file_path: str) -> Union["docx.document.Document", "DocxPackage"]:
+        if self.backend == "lxml":
+            from .ooxml import DocxPackage
+            return DocxPackage(file_path)
+        import docx
         return docx.Document(file_path)
@@ -0,0 +1,425 @@
+"""Streaming readers for DOCX and PPTX packages, an alternative to the python-docx/python-pptx object model.
+
+The XML parts are read straight from the zip with lxml.etree.iterparse. Every body
+paragraph/table or slide shape is turned into plain Python values as soon as its end tag
+is parsed and then cleared, so memory stays flat however large document.xml is. Each
+part is parsed once and the results are reused by every extraction stage.
+
+The values match what the object model returns for the same calls (paragraph.text,
+run.bold, cell.text, shape.text, run.hyperlink.address, ...).
+"""
+import hashlib
+import io
+import posixpath
+import threading
+import zipfile
+from typing import Any, Dict, List, Optional, Tuple
+from lxml import etree
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_A = "{http://schemas.openxmlformats.org/drawingml/2006/main}"
+_P = "{http://schemas.openxmlformats.org/presentationml/2006/main}"
+_R = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_RELS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+_CONTENT_TYPES = "{http://schemas.openxmlformats.org/package/2006/content-types}"
+
+OFFICE_DOCUMENT = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"
+TABLE_URI = "http://schemas.openxmlformats.org/drawingml/2006/table"
+
+DOCX_CONTENT_TYPES = ("application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml",)
+PPTX_CONTENT_TYPES = ("application/vnd.openxmlformats-officedocument.presentationml.presentation.main+xml",
+                      "application/vnd.ms-powerpoint.presentation.macroEnabled.main+xml")
+
+# Image formats each object model can read the header of, as PIL format -> extension
+_DOCX_IMAGE_EXTS = {"BMP": "bmp", "GIF": "gif", "JPEG": "jpg", "PNG": "png", "TIFF": "tiff"}
+_PPTX_IMAGE_EXTS = dict(_DOCX_IMAGE_EXTS, WMF="wmf")
+
+# EMU per unit of a universal measure such as "12pt", and per point
+_EMU_PER_UNIT = {"mm": 36000, "cm": 360000, "in": 914400, "pt": 12700, "pc": 152400, "pi": 152400}
+_EMU_PER_PT = 12700
+
+# WordprocessingML names used on every paragraph and run
+_W_BODY = f"{_W}body"
+_W_P = f"{_W}p"
+_W_TBL = f"{_W}tbl"
+_W_R = f"{_W}r"
+_W_RPR = f"{_W}rPr"
+_W_HYPERLINK = f"{_W}hyperlink"
+_W_T = f"{_W}t"
+_W_TAB = f"{_W}tab"
+_W_PTAB = f"{_W}ptab"
+_W_BR = f"{_W}br"
+_W_CR = f"{_W}cr"
+_W_NO_BREAK_HYPHEN = f"{_W}noBreakHyphen"
+_W_B = f"{_W}b"
+_W_I = f"{_W}i"
+_W_RFONTS = f"{_W}rFonts"
+_W_SZ = f"{_W}sz"
+_W_VAL = f"{_W}val"
+_W_TYPE = f"{_W}type"
+_W_ASCII = f"{_W}ascii"
+# w:val values that switch an on/off property such as <w:b/> off
+_OFF = ("0", "false", "off")
+
+# (bold, italic, font name, size in points) of one run
+Run = Tuple[Optional[bool], Optional[bool], Optional[str], Optional[float]]
+
+def _xsd_boolean(value: Optional[str]) -> Optional[bool]:
+    return None if value is None else value in ("1", "true")
+
+def _half_points(value: Optional[str]) -> Optional[float]:
+    """w:sz is in half points, or a universal measure like "12pt"."""
+    if value is None:
+        return None
+    if value[-2:] in _EMU_PER_UNIT:
+        return round(float(value[:-2]) * _EMU_PER_UNIT[value[-2:]]) / _EMU_PER_PT
+    return int(value) * 6350 / _EMU_PER_PT
+
+class OoxmlPackage:
+    """An opened OOXML zip: parts, content types and relationships, read on demand.
+
+    Opening one only reads the zip central directory, the package relationships and
+    [Content_Types].xml. The base class accepts any main part content type.
+    """
+
+    format_name = "OOXML"
+    content_types: Tuple[str, ...] = ()
+    image_exts: Dict[str, str] = {}
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self.zip = zipfile.ZipFile(file_path)
+        self._rels: Dict[str, List[Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+        try:
+            self.main_part = next((rel["partname"] for rel in self.relationships("")
+                                   if rel["type"] == OFFICE_DOCUMENT), None)
+            if self.main_part is None or not self.has_part(self.main_part):
+                raise ValueError(f"{file_path} has no main document part")
+            self.main_content_type = self.content_type(self.main_part)
+            if self.content_types and self.main_content_type not in self.content_types:
+                raise ValueError(f"Not a {self.format_name} package: {file_path}")
+        except Exception:
+            self.zip.close()
+            raise
+
+    def read(self, partname: str) -> bytes:
+        return self.zip.read(partname)
+
+    def has_part(self, partname: str) -> bool:
+        try:
+            self.zip.getinfo(partname)
+        except KeyError:
+            return False
+        return True
+
+    def content_type(self, partname: str) -> Optional[str]:
+        types = etree.fromstring(self.read("[Content_Types].xml"))
+        for override in types.iter(f"{_CONTENT_TYPES}Override"):
+            if override.get("PartName", "").lstrip("/") == partname:
+                return override.get("ContentType")
+        ext = posixpath.splitext(partname)[1].lstrip(".").lower()
+        for default in types.iter(f"{_CONTENT_TYPES}Default"):
+            if default.get("Extension", "").lower() == ext:
+                return default.get("ContentType")
+        return None
+
+    def relationships(self, partname: str) -> List[Dict[str, Any]]:
+        """Relationships of a part ("" for the package) in file order.
+
+        Each is {"id", "type", "target_ref", "partname", "is_external"}; target_ref is the URL
+        of an external target or the partname relative to the source, as the object model
+        reports it, and partname is the zip member of an internal target.
+        """
+        if partname not in self._rels:
+            directory, name = posixpath.split(partname)
+            rels_path = posixpath.join(directory, "_rels", f"{name}.rels")
+            relationships = []
+            if self.has_part(rels_path):
+                for rel in etree.fromstring(self.read(rels_path)).iter(f"{_RELS}Relationship"):
+                    target = rel.get("Target")
+                    is_external = rel.get("TargetMode") == "External"
+                    target_partname = None
+                    if not is_external:
+                        target_partname = posixpath.normpath(
+                            target.lstrip("/") if target.startswith("/") else posixpath.join(directory, target))
+                        target = posixpath.relpath(target_partname, directory) if directory else target_partname
+                    relationships.append({"id": rel.get("Id"), "type": rel.get("Type"), "target_ref": target,
+                                          "partname": target_partname, "is_external": is_external})
+            self._rels[partname] = relationships
+        return self._rels[partname]
+
+    def image(self, partname: str) -> Tuple[bytes, str, Optional[int], Optional[int]]:
+        """(bytes, ext, width, height) of an image part, with the size read from its header."""
+        # Pillow only parses the header on open; the pixels are never decoded
+        from PIL import Image
+        blob = self.read(partname)
+        try:
+            with Image.open(io.BytesIO(blob)) as image:
+                if image.format in self.image_exts:
+                    return blob, self.image_exts[image.format], image.width, image.height
+        except Exception:
+            pass
+        return blob, posixpath.splitext(partname)[1].lstrip("."), None, None
+
+    def _iterparse(self, partname: str, tags):
+        # huge_tree: document.xml of a long report easily exceeds libxml2's default limits
+        with self.zip.open(partname) as stream:
+            yield from etree.iterparse(stream, events=("end",), tag=tags, huge_tree=True)
+
+    @staticmethod
+    def _release(element):
+        """Free a handled element and everything before it, so the parsed tree stays one element deep."""
+        element.clear()
+        parent = element.getparent()
+        while element.getprevious() is not None:
+            del parent[0]
+
+    def close(self):
+        self.zip.close()
+
+class DocxPackage(OoxmlPackage):
+    """A DOCX file read as a stream of body paragraphs and tables."""
+
+    format_name = "DOCX"
+    content_types = DOCX_CONTENT_TYPES
+    image_exts = _DOCX_IMAGE_EXTS
+
+    def __init__(self, file_path: str):
+        super().__init__(file_path)
+        self._body = None
+
+    def body(self) -> Dict[str, Any]:
+        """{"paragraphs": [(text, [Run, ...])], "tables": [[[cell text, ...], ...]]} of the body, parsed once."""
+        with self._lock:
+            if self._body is None:
+                self._body = self._parse_body()
+            return self._body
+
+    def _parse_body(self) -> Dict[str, Any]:
+        paragraphs, tables = [], []
+        for _, element in self._iterparse(self.main_part, (_W_P, _W_TBL)):
+            # Paragraphs inside tables are read with their table, like document.paragraphs skips them
+            parent = element.getparent()
+            if parent is None or parent.tag != _W_BODY:
+                continue
+            if element.tag == _W_P:
+                paragraphs.append(self._paragraph(element))
+            else:
+                tables.append(self._table_rows(element))
+            self._release(element)
+        return {"paragraphs": paragraphs, "tables": tables}
+
+    @staticmethod
+    def _run_text(run) -> str:
+        parts = []
+        for child in run:
+            tag = child.tag
+            if tag == _W_T:
+                parts.append(child.text or "")
+            elif tag == _W_TAB or tag == _W_PTAB:
+                parts.append("\t")
+            elif tag == _W_BR:
+                # Page and column breaks have no text
+                parts.append("\n" if child.get(_W_TYPE, "textWrapping") == "textWrapping" else "")
+            elif tag == _W_CR:
+                parts.append("\n")
+            elif tag == _W_NO_BREAK_HYPHEN:
+                parts.append("-")
+        return "".join(parts)
+
+    @staticmethod
+    def _run_format(run) -> Run:
+        bold = italic = font = size = None
+        for child in run:
+            if child.tag != _W_RPR:
+                continue
+            # Children are walked once; a find() per property costs more than the whole parse
+            for prop in child:
+                tag = prop.tag
+                if tag == _W_B:
+                    bold = prop.get(_W_VAL) not in _OFF
+                elif tag == _W_I:
+                    italic = prop.get(_W_VAL) not in _OFF
+                elif tag == _W_RFONTS:
+                    font = prop.get(_W_ASCII)
+                elif tag == _W_SZ:
+                    size = _half_points(prop.get(_W_VAL))
+            break
+        return bold, italic, font, size
+
+    @classmethod
+    def _paragraph(cls, paragraph) -> Tuple[str, List[Run]]:
+        """(paragraph.text, direct formatting of paragraph.runs); runs inside hyperlinks only add text."""
+        parts, runs = [], []
+        for child in paragraph:
+            if child.tag == _W_R:
+                parts.append(cls._run_text(child))
+                runs.append(cls._run_format(child))
+            elif child.tag == _W_HYPERLINK:
+                parts.extend(cls._run_text(run) for run in child.iterchildren(_W_R))
+        return "".join(parts), runs
+
+    @classmethod
+    def _paragraph_text(cls, paragraph) -> str:
+        return cls._paragraph(paragraph)[0]
+
+    @classmethod
+    def _table_rows(cls, table) -> List[List[str]]:
+        """Cell texts per row, a spanned cell repeated per grid column, as row.cells reports them."""
+        rows = []
+        above: Dict[int, Tuple[str, int]] = {}
+        for row in table.iterchildren(f"{_W}tr"):
+            grid_before = row.find(f"{_W}trPr/{_W}gridBefore")
+            offset = int(grid_before.get(f"{_W}val", 0)) if grid_before is not None else 0
+            cells, current = [], {}
+            for cell in row.iterchildren(f"{_W}tc"):
+                span_element = cell.find(f"{_W}tcPr/{_W}gridSpan")
+                span = int(span_element.get(f"{_W}val", 1)) if span_element is not None else 1
+                merge = cell.find(f"{_W}tcPr/{_W}vMerge")
+                if merge is not None and merge.get(f"{_W}val", "continue") == "continue":
+                    # The continuation of a vertical merge shows the cell it continues
+                    text, root_span = above.get(offset, ("", span))
+                else:
+                    text = "\n".join(cls._paragraph_text(p) for p in cell.iterchildren(f"{_W}p"))
+                    root_span = span
+                current[offset] = (text, root_span)
+                cells.extend([text] * root_span)
+                offset += span
+            rows.append(cells)
+            above = current
+        return rows
+
+class PptxPackage(OoxmlPackage):
+    """A PPTX file read one slide part at a time."""
+
+    format_name = "PPTX"
+    content_types = PPTX_CONTENT_TYPES
+    image_exts = _PPTX_IMAGE_EXTS
+
+    def __init__(self, file_path: str):
+        super().__init__(file_path)
+        rels = {rel["id"]: rel for rel in self.relationships(self.main_part)}
+        presentation = etree.fromstring(self.read(self.main_part))
+        # Slide order is the order of p:sldIdLst, not of the part names
+        self.slide_parts = [rels[slide_id.get(f"{_R}id")]["partname"]
+                            for slide_id in presentation.iter(f"{_P}sldId")]
+        # python-pptx renames slide parts after their position when it lists the slides, and
+        # links between slides are reported with those names
+        self._slide_names = {partname: f"ppt/slides/slide{slide_num}.xml"
+                             for slide_num, partname in enumerate(self.slide_parts, start=1)}
+        self._slides: Dict[int, Dict[str, Any]] = {}
+
+    def slide_count(self) -> int:
+        return len(self.slide_parts)
+
+    def slide(self, slide_num: int) -> Dict[str, Any]:
+        """Everything the extractors read from a 1-based slide, parsed once:
+
+        {"texts": [shape.text of every text shape], "runs": [Run, ...], "links": [(run text, url)],
+         "pictures": [image partname or None per picture], "tables": [[[cell text, ...], ...]]}
+        """
+        with self._lock:
+            if slide_num not in self._slides:
+                self._slides[slide_num] = self._parse_slide(self.slide_parts[slide_num - 1])
+            return self._slides[slide_num]
+
+    def _parse_slide(self, partname: str) -> Dict[str, Any]:
+        rels = {rel["id"]: rel for rel in self.relationships(partname)}
+        slide = {"texts": [], "runs": [], "links": [], "pictures": [], "tables": []}
+        shape_tags = (f"{_P}sp", f"{_P}pic", f"{_P}graphicFrame", f"{_P}grpSp", f"{_P}cxnSp", f"{_P}contentPart")
+        for _, element in self._iterparse(partname, shape_tags):
+            # Only top-level shapes count, as in slide.shapes; grouped shapes go with their group
+            parent = element.getparent()
+            if parent is None or parent.tag != f"{_P}spTree":
+                continue
+            if element.tag == f"{_P}sp":
+                self._read_text_shape(element, rels, slide)
+            elif element.tag == f"{_P}pic":
+                self._read_picture(element, rels, slide)
+            elif element.tag == f"{_P}graphicFrame":
+                data = element.find(f"{_A}graphic/{_A}graphicData")
+                if data is not None and data.get("uri") == TABLE_URI:
+                    slide["tables"].append([
+                        [self._text_body_text(cell.find(f"{_A}txBody")) for cell in row.iterchildren(f"{_A}tc")]
+                        for row in data.iterfind(f"{_A}tbl/{_A}tr")
+                    ])
+            self._release(element)
+        return slide
+
+    @staticmethod
+    def _paragraph_text(paragraph) -> str:
+        parts = []
+        for child in paragraph:
+            if child.tag in (f"{_A}r", f"{_A}fld"):
+                text = child.find(f"{_A}t")
+                parts.append(text.text or "" if text is not None else "")
+            elif child.tag == f"{_A}br":
+                # A soft line break, as PowerPoint puts it on the clipboard
+                parts.append("\v")
+        return "".join(parts)
+
+    @classmethod
+    def _text_body_text(cls, body) -> str:
+        if body is None:
+            return ""
+        return "\n".join(cls._paragraph_text(paragraph) for paragraph in body.iterchildren(f"{_A}p"))
+
+    def _link_target(self, rel: Dict[str, Any]) -> str:
+        if rel["partname"] in self._slide_names:
+            return posixpath.relpath(self._slide_names[rel["partname"]], "ppt/slides")
+        return rel["target_ref"]
+
+    def _read_text_shape(self, shape, rels, slide):
+        body = shape.find(f"{_P}txBody")
+        slide["texts"].append(self._text_body_text(body))
+        if body is None:
+            return
+        for run in body.iterfind(f"{_A}p/{_A}r"):
+            properties = run.find(f"{_A}rPr")
+            if properties is None:
+                slide["runs"].append((None, None, None, None))
+                continue
+            latin = properties.find(f"{_A}latin")
+            size = properties.get("sz")
+            slide["runs"].append((
+                _xsd_boolean(properties.get("b")),
+                _xsd_boolean(properties.get("i")),
+                latin.get("typeface") if latin is not None else None,
+                int(size) / 100 if size is not None else None
+            ))
+            click = properties.find(f"{_A}hlinkClick")
+            rel = rels.get(click.get(f"{_R}id")) if click is not None else None
+            if rel is not None and rel["target_ref"]:
+                text = run.find(f"{_A}t")
+                slide["links"].append((text.text or "" if text is not None else "", self._link_target(rel)))
+
+    @staticmethod
+    def _read_picture(picture, rels, slide):
+        properties = picture.find(f"{_P}nvPicPr/{_P}nvPr")
+        # Picture placeholders and movies are not pictures to the object model
+        if properties is not None and (properties.find(f"{_P}ph") is not None
+                                       or properties.find(f"{_A}videoFile") is not None):
+            return
+        blip = picture.find(f"{_P}blipFill/{_A}blip")
+        rel = rels.get(blip.get(f"{_R}embed")) if blip is not None else None
+        # A linked picture has no image part; it keeps its place in the numbering
+        slide["pictures"].append(rel["partname"] if rel is not None and not rel["is_external"] else None)
+
+    def page_hashes(self) -> Dict[int, str]:
+        """Hash every slide's XML together with the parts it references (pictures, charts, layout)."""
+        part_hashes = {}
+        hashes = {}
+        for slide_num, partname in enumerate(self.slide_parts, start=1):
+            digest = hashlib.sha256(self.read(partname))
+            for rel in sorted(self.relationships(partname), key=lambda rel: rel["id"]):
+                if rel["is_external"]:
+                    digest.update(rel["target_ref"].encode())
+                    continue
+                # Layouts and shared media are hashed once per presentation
+                if rel["partname"] not in part_hashes:
+                    part_hashes[rel["partname"]] = hashlib.sha256(
+                        self.read(rel["partname"]) if self.has_part(rel["partname"]) else b"").digest()
+                digest.update(part_hashes[rel["partname"]])
+            hashes[slide_num] = digest.hexdigest()
+        return hashes
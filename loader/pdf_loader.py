@@ -1,7 +1,30 @@
-from PyPDF2 import PdfReader
+from typing import Union, TYPE_CHECKING
+import fitz
 from .file_loader import FileLoader
 
+if TYPE_CHECKING:
+    from PyPDF2 import PdfReader
+
 class PDFLoader(FileLoader):
-    def load_file(self, file_path: str) -> PdfReader:
-        return PdfReader(file_path)
+    """Load a PDF with PyPDF2 (default) or as a single PyMuPDF document handle.
+
+    With backend="pymupdf" every PdfExtractor method works off the one handle, so the
+    file is parsed once. MuPDF reads a file-backed document on demand instead of
+    copying it into memory.
+    """
 
+    def __init__(self, backend: str = "pypdf2"):
+        if backend not in ("pypdf2", "pymupdf"):
+            raise ValueError(f"Unknown PDF backend: {backend}")
+        self.backend = backend
+
+    def load_file(self, file_path: str) -> Union["PdfReader", fitz.Document]:
+        if self.backend == "pymupdf":
+            document = fitz.open(file_path, filetype="pdf")
+            if not document.is_pdf or document.page_count == 0:
+                document.close()
+                raise ValueError(f"Not a readable PDF: {file_path}")
+            return document
+        # Only the pypdf2 backend needs PyPDF2
+        from PyPDF2 import PdfReader
+        return PdfReader(file_path)
@@ -1,6 +1,25 @@
-from pptx import Presentation
+from typing import Union, TYPE_CHECKING
 from .file_loader import FileLoader
 
+if TYPE_CHECKING:
+    from pptx.presentation import Presentation
+    from .ooxml import PptxPackage
+
 class PPTLoader(FileLoader):
-    def load_file(self, file_path: str) -> Presentation:
+    """Load a PPTX as a python-pptx Presentation (default) or as a streaming PptxPackage.
+
+    With backend="lxml" each slide part is parsed once with iterparse into plain values
+    instead of building the object graph.
+    """
+
+    def __init__(self, backend: str = "object-model"):
+        if backend not in ("object-model", "lxml"):
+            raise ValueError(f"Unknown PPTX backend: {backend}")
+        self.backend = backend
+
+    def load_file(self, file_path: str) -> Union["Presentation", "PptxPackage"]:
+        if self.backend == "lxml":
+            from .ooxml import PptxPackage
+            return PptxPackage(file_path)
+        from pptx import Presentation
         return Presentation(file_path)
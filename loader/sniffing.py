@@ -0,0 +1,90 @@
+"""Detect a file's format from its bytes and check its structure without building the document model.
+
+A PDF is recognised by its %PDF- header alone. PDF readers rebuild a missing or damaged
+xref table, so pdf_trailer_problem() only reports one as a hint and the loader decides. A
+DOCX/PPTX is recognised from the zip central directory, the package relationships and
+[Content_Types].xml, and checked for its main part. Only the first and last few KB of a PDF
+and the zip directory plus two small XML parts of an OOXML file are read.
+"""
+import re
+import zipfile
+from typing import Optional
+from loader.ooxml import DOCX_CONTENT_TYPES, PPTX_CONTENT_TYPES, OoxmlPackage
+
+# The header may follow up to 1 KB of junk; the trailer should be within the last 1 KB, a few more are tolerated
+PDF_HEADER_WINDOW = 1024
+PDF_TRAILER_WINDOW = 4096
+
+ZIP_MAGIC = (b"PK\x03\x04", b"PK\x05\x06")
+OLE2_MAGIC = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+
+_STARTXREF = re.compile(rb"startxref\s+(\d+)")
+_XREF_STREAM = re.compile(rb"\s*\d+\s+\d+\s+obj\b")
+
+class UnsupportedFormatError(ValueError):
+    """The file is intact but not a PDF, DOCX or PPTX."""
+
+class CorruptedFileError(ValueError):
+    """The file has a supported format's signature but a broken structure."""
+
+def sniff_format(file_path: str) -> str:
+    """The extension of the file's real format (".pdf", ".docx" or ".pptx"), checked for corruption.
+
+    Raises UnsupportedFormatError or CorruptedFileError with the reason.
+    """
+    with open(file_path, 'rb') as file:
+        head = file.read(PDF_HEADER_WINDOW)
+    if head.startswith(ZIP_MAGIC):
+        return _sniff_ooxml(file_path)
+    if head.find(b"%PDF-") >= 0:
+        return ".pdf"
+    if head.startswith(OLE2_MAGIC):
+        raise UnsupportedFormatError("legacy binary Office file (.doc/.ppt); save it as .docx/.pptx")
+    raise UnsupportedFormatError("not a PDF, DOCX or PPTX file")
+
+def pdf_trailer_problem(file_path: str) -> Optional[str]:
+    """What is wrong with a PDF's trailer (%%EOF, startxref, xref), or None when it looks intact.
+
+    The reader may still repair the file, so this explains a failed load rather than deciding it.
+    """
+    with open(file_path, 'rb') as file:
+        header = file.read(PDF_HEADER_WINDOW).find(b"%PDF-")
+        size = file.seek(0, 2)
+        file.seek(max(0, size - PDF_TRAILER_WINDOW))
+        tail = file.read()
+        if b"%%EOF" not in tail:
+            return "no %%EOF marker near the end, the file may be truncated"
+        offsets = _STARTXREF.findall(tail)
+        if not offsets:
+            return "no startxref"
+        # Offsets count from the %PDF- header, which junk may precede
+        offset = int(offsets[-1]) + max(header, 0)
+        if offset >= size:
+            return "startxref points past the end of the file"
+        file.seek(offset)
+        xref = file.read(64)
+    if not (xref.lstrip().startswith(b"xref") or _XREF_STREAM.match(xref)):
+        return "startxref does not point at an xref table or stream"
+    return None
+
+def _sniff_ooxml(file_path: str) -> str:
+    try:
+        with zipfile.ZipFile(file_path) as archive:
+            is_package = "[Content_Types].xml" in archive.namelist()
+        if not is_package:
+            raise UnsupportedFormatError("zip archive that is not an Office document")
+        package = OoxmlPackage(file_path)
+    except zipfile.BadZipFile as e:
+        raise CorruptedFileError(f"broken zip archive ({e})") from None
+    except UnsupportedFormatError:
+        raise
+    except Exception as e:
+        # Unreadable relationships or content types, or no main part
+        raise CorruptedFileError(f"broken Office package ({e})") from None
+    content_type = package.main_content_type
+    package.close()
+    if content_type in DOCX_CONTENT_TYPES:
+        return ".docx"
+    if content_type in PPTX_CONTENT_TYPES:
+        return ".pptx"
+    raise UnsupportedFormatError(f"Office package of type {content_type}")
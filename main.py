@@ -1,111 +1,299 @@
+import argparse
+import importlib
 import os
 import sys
-from PyPDF2 import PdfReader
-from docx import Document
-from pptx import Presentation
 from dotenv import load_dotenv
-from loader.pdf_loader import PDFLoader
-from loader.docx_loader import DOCXLoader
-from loader.ppt_loader import PPTLoader
-from storage.file_storage import FileStorage
 from storage.sql_storage import SQLStorage
-from data_extractor.pdfExtractor import PdfExtractor
-from data_extractor.docxExtractor import DocxExtractor
-from data_extractor.pptExtractor import PPTExtractor
+from storage.image_store import ImageStore
+from storage.storage import document_key
+from data_extractor.image_processing import ImageOptions, ImageProcessor
+from storage.extraction_cache import ExtractionCache, CacheRecorder, DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES
+from pipeline import stream_document, open_file_storage, output_file_paths
+from orchestrator import run_stages, run_changed_pages
+from sharding import extract_sharded
+from metrics import METRICS, document, configure_from_env
 
 load_dotenv()
 
+# Loader and extractor class of every format. Each is imported when a file of its format is
+# opened, so a PDF run never imports python-docx or python-pptx and vice versa.
+FORMATS = {
+    ".pdf": ("loader.pdf_loader.PDFLoader", "data_extractor.pdfExtractor.PdfExtractor"),
+    ".docx": ("loader.docx_loader.DOCXLoader", "data_extractor.docxExtractor.DocxExtractor"),
+    ".pptx": ("loader.ppt_loader.PPTLoader", "data_extractor.pptExtractor.PPTExtractor"),
+}
+
+def _import_class(path):
+    module, name = path.rsplit(".", 1)
+    return getattr(importlib.import_module(module), name)
+
 class FileValidationError(Exception):
     """Custom Exception for File Validation Errors."""
     pass
 
-def main():
+def extraction_options():
+    """Environment options that change what the extractors return; they are part of the extraction cache key."""
+    return {
+        "pdf_table_engine": os.getenv("PDF_TABLE_ENGINE", "pymupdf"),
+        "ooxml_engine": os.getenv("OOXML_ENGINE", "object-model")
+    }
+
+def validate_file(file_path):
+    """Detect the file's real format, check its structure and load it with that format's extractor.
 
-    file_path = input("Enter the file path: ")
-    iterator = {".pdf" : PDFLoader(), ".docx" : DOCXLoader(), ".pptx" : PPTLoader()}
-    validator = {".pdf" : PdfReader, ".docx" : Document, ".pptx" : Presentation}
-    extractor = {".pdf" : PdfExtractor, ".docx" : DocxExtractor, ".pptx" : PPTExtractor}
-    
-    
-    # Select appropriate loader and validate file based on extension
-    for ext in iterator:
-        if file_path.endswith(ext):
-            try:
-                with open(file_path, 'rb') as file:
-                    validator[ext](file)  # This will raise an error if the file is corrupted
-                    loader = iterator[ext]
-                    fileExtractor = extractor[ext]
-            except Exception:
-                raise FileValidationError("Error : Corrupted file found.")
-            break
+    The format comes from the file's bytes, not its name, so a DOCX saved as .pdf is still
+    loaded as a DOCX. The check reads only the PDF header or the zip directory, so broken
+    packages and unsupported files are rejected before any parse. A PDF with a damaged trailer
+    is left to the loader, which repairs what it can. Loading is the last check, and the
+    parsed document is reused for extraction.
+    """
+    # lxml is only imported once a file is actually opened
+    from loader.sniffing import sniff_format, pdf_trailer_problem, UnsupportedFormatError, CorruptedFileError
+    try:
+        ext = sniff_format(file_path)
+    except UnsupportedFormatError as e:
+        raise FileValidationError(f"Error : Unsupported file format ({e}).")
+    except CorruptedFileError as e:
+        raise FileValidationError(f"Error : Corrupted file found ({e}).")
+    except OSError as e:
+        raise FileValidationError(f"Error : Cannot read file ({e.strerror}).")
+
+    loader_path, extractor_path = FORMATS[ext]
+    loader_class, extractor_class = _import_class(loader_path), _import_class(extractor_path)
+    options = extraction_options()
+    if ext == ".pdf":
+        fileExtractor = extractor_class(loader_class(backend="pymupdf"), table_engine=options["pdf_table_engine"])
     else:
-        raise FileValidationError("Error : Unsupported file format.")
+        # OOXML_ENGINE=lxml streams the XML parts instead of building the python-docx/pptx object model
+        fileExtractor = extractor_class(loader_class(backend=options["ooxml_engine"]))
+    try:
+        fileExtractor.load(file_path)  # This will raise an error if the file is corrupted
+    except Exception:
+        problem = pdf_trailer_problem(file_path) if ext == ".pdf" else None
+        raise FileValidationError("Error : Corrupted file found" + (f" ({problem})." if problem else "."))
+    return fileExtractor
+
+def open_document(file_path, cache=None):
+    """Serve a file from the extraction cache, or validate and load it while recording it into the cache."""
+    if cache is None or not os.path.isfile(file_path):
+        return validate_file(file_path)
 
-    # Load and extract data if validation is successful
-    print("------------------")
-    extractor = fileExtractor(loader)
-    extractor.load(file_path)
+    key = cache.key_for(file_path, extraction_options())
+    cached = cache.get(key, file_path)
+    if cached is not None:
+        return cached
+    return cache.recorder(key, validate_file(file_path))
 
-    output_image = "output_images"
-    output_text = "output_text"
-    output_tables = "output_tables"
+def open_extraction_cache():
+    """Extraction cache configured from the environment, or None when EXTRACTION_CACHE=off."""
+    if os.getenv("EXTRACTION_CACHE", "on").lower() in ("0", "off", "false", "no"):
+        return None
+    return ExtractionCache(
+        os.getenv("EXTRACTION_CACHE_DIR", DEFAULT_CACHE_DIR),
+        int(os.getenv("EXTRACTION_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES))
+    )
 
-    if not os.path.exists(output_image):
+def open_image_store():
+    """Content-addressed image store from IMAGE_STORE_DIR, or None to write images per occurrence."""
+    image_store_dir = os.getenv("IMAGE_STORE_DIR")
+    return ImageStore(image_store_dir) if image_store_dir else None
+
+def open_image_processor():
+    """Image processing stage from IMAGE_FORMAT, IMAGE_MAX_SIZE and IMAGE_THUMBNAIL_SIZE, or None to keep images as extracted.
+
+    IMAGE_QUALITY sets the JPEG/WebP quality, IMAGE_WORKERS the pool size and IMAGE_EXECUTOR thread or process.
+    """
+    max_size, thumbnail_size = os.getenv("IMAGE_MAX_SIZE"), os.getenv("IMAGE_THUMBNAIL_SIZE")
+    options = ImageOptions(
+        format=os.getenv("IMAGE_FORMAT") or None,
+        quality=int(os.getenv("IMAGE_QUALITY", "85")),
+        max_size=int(max_size) if max_size else None,
+        thumbnail_size=int(thumbnail_size) if thumbnail_size else None
+    )
+    if not options.enabled:
+        return None
+    return ImageProcessor(options, int(os.getenv("IMAGE_WORKERS", "1")), os.getenv("IMAGE_EXECUTOR", "thread"))
+
+def open_search_index():
+    """Full-text index in SEARCH_INDEX_DIR that ingested pages are added to, or None."""
+    search_index_dir = os.getenv("SEARCH_INDEX_DIR")
+    if not search_index_dir:
+        return None
+    # The index needs numpy, which runs without an index should not wait for
+    from storage.search_index import SearchIndex
+    return SearchIndex(search_index_dir)
+
+def extract_document(extractor, output_image="output_images",
+                     output_text="output_text", output_tables="output_tables", image_store=None,
+                     concurrency=1, process_stages=(), page_shards=1, output_format="txt", search_index=None,
+                     changed_pages=None, image_processor=None, output_name=None):
+    """Run a loaded extractor over its file and write the file outputs.
+
+    With concurrency > 1 the text, links, images and tables stages run at the same time.
+    With page_shards > 1 a PDF is split into that many page ranges extracted in separate processes.
+    With changed_pages, images and tables (see run_changed_pages) are only extracted for those pages.
+    With an ImageProcessor, images are transcoded, downscaled and thumbnailed before they are written.
+    output_name replaces the file's stem in the names of the text output files.
+    """
+    file_path = extractor.file_path
+    if image_store is not None:
+        output_image = None
+
+    # output_image=None keeps images in memory only
+    if output_image and not os.path.exists(output_image):
         os.makedirs(output_image)
     if not os.path.exists(output_text):
         os.makedirs(output_text)
     if not os.path.exists(output_tables):
         os.makedirs(output_tables)
 
-    text_data = extractor.extract_text()
-    hyperlinks = extractor.extract_links()
-    images = extractor.extract_images(output_image)
-    tables = extractor.extract_tables(output_tables)
+    # Processed images are written by the processor, so the extractor keeps them in memory
+    extracted_image = None if image_processor is not None else output_image
+    # A recorder shards the extractor it wraps and saves the merged results afterwards
+    target = extractor.extractor if isinstance(extractor, CacheRecorder) else extractor
+    if changed_pages is not None:
+        stages, timings = run_changed_pages(extractor, changed_pages, extracted_image, output_tables)
+    elif page_shards > 1 and getattr(target, "supports_page_range", False):
+        stages, timings = extract_sharded(target, extracted_image, output_tables, page_shards)
+        if target is not extractor:
+            extractor.record_results(stages)
+    else:
+        stages, timings = run_stages(extractor, extracted_image, output_tables, concurrency, process_stages)
+    if image_processor is not None:
+        stages["images"] = list(image_processor.process_all(stages["images"], output_image))
+    text_data = stages["text"]
+    hyperlinks = stages["links"]
+    images = stages["images"]
+    if image_store is not None:
+        for image in images:
+            image_store.put(image)
+    tables = stages["tables"]
 
     base_name = os.path.basename(file_path)
-    name_without_extension = os.path.splitext(base_name)[0]
-
-    # Define the full paths for the output files
-    new_filename_text = os.path.join(output_text, f"{name_without_extension}-output-text_data.txt")
-    new_filename_links = os.path.join(output_text, f"{name_without_extension}-output-hyperlinks.txt")
+    if search_index is not None:
+        search_index.add_document(document_key(file_path), text_data)
 
     # Store the extracted data with the dynamic file name
-    file_storage = FileStorage(extractor)
-    file_storage.store_data(text_data, new_filename_text)
-    file_storage.store_data(hyperlinks, new_filename_links)
-
-    # Store the extracted data into SQL database
-    sql_storage = SQLStorage(os.getenv("DATABASE_HOST"), os.getenv("DATABASE_USER"), os.getenv("DATABASE_PASSWORD"))
-
-    sql_storage.create_database("python")
-    sql_storage.use_database("python")
-
-    sql_storage.create_table_if_not_exists()
-    for data in text_data:
-        sql_storage.insert_data(
-            file_name=os.path.basename(file_path),
-            page_number=data.get('page_number'),
-            text=data.get('text'),
-            headings=data.get('headings'),
-            font_styles=data.get('font_styles')
-        )
-
-    # Store extracted hyperlinks and images into the database
-    for link in hyperlinks:
-        sql_storage.insert_link(
-            file_name=os.path.basename(file_path),
-            page_number=link.get('page_number'),
-            linked_text=link.get('linked_text'),
-            url=link.get('url')
-        )
-    
-    for image_path, page_number in images:
-        sql_storage.insert_image(
-            file_name=os.path.basename(file_path),
-            image_path=image_path,
-            page_number=page_number
-        )
+    file_storage = open_file_storage(extractor, output_format)
+    for kind, output_path in output_file_paths(file_path, output_text, output_format, output_name).items():
+        file_storage.store_data(stages[kind], output_path)
+
+    return {
+        "file_name": base_name,
+        "document": document_key(file_path),
+        "text_data": text_data,
+        "hyperlinks": hyperlinks,
+        "images": images,
+        "tables": tables,
+        "timings": timings
+    }
+
+def connect_sql_storage(pool_size=None):
+    """Connect to the configured database; the database and tables are created once per process.
+
+    pool_size defaults to DATABASE_POOL_SIZE; without either, sessions open their own connection.
+    """
+    pool_size = pool_size or os.getenv("DATABASE_POOL_SIZE")
+    sql_storage = SQLStorage(os.getenv("DATABASE_HOST"), os.getenv("DATABASE_USER"), os.getenv("DATABASE_PASSWORD"),
+                             pool_size=int(pool_size) if pool_size else None)
+    sql_storage.bootstrap("python")
+    return sql_storage
+
+def store_document(sql_storage, results):
+    """Replace the stored text, hyperlinks and images of a document (keyed by results["document"]) in one transaction.
+
+    When results["pages"] is set only the rows of those page numbers are replaced.
+    """
+    document = results["document"]
+    pages = results.get("pages")
+
+    def on_pages(records):
+        return records if pages is None else [record for record in records if record.get("page_number") in pages]
+
+    with sql_storage.transaction():
+        sql_storage.delete_pages(document, pages)
+        sql_storage.insert_text_rows(document, on_pages(results["text_data"]))
+        sql_storage.insert_links(document, on_pages(results["hyperlinks"]))
+        sql_storage.insert_images(document, on_pages(results["images"]))
+
+def image_processing_summary(stats):
+    return (f"Image processing: {stats['images']} images, {stats['transformed']} re-encoded "
+            f"({stats['resized']} downscaled), {stats['thumbnails']} thumbnails, {stats['failed']} unreadable kept, "
+            f"{stats['bytes_saved']:,} bytes saved, {stats['images_per_sec']:.1f} images/sec")
+
+def dry_run(file_path):
+    """Validate and load a file and report what a run would extract, without touching any storage."""
+    extractor = validate_file(file_path)
+    from loader.sniffing import sniff_format, pdf_trailer_problem
+    file_format, named = sniff_format(file_path), os.path.splitext(file_path)[1].lower()
+    print(f"File: {file_path}")
+    print(f"Format: {file_format}" + (f" (named {named or 'without extension'})" if named != file_format else ""))
+    problem = pdf_trailer_problem(file_path) if file_format == ".pdf" else None
+    if problem:
+        print(f"Structure: {problem}; the reader repaired it")
+    print(f"Extractor: {type(extractor).__name__}")
+    if hasattr(extractor, "page_count"):
+        print(f"Pages: {extractor.page_count()}")
+    print("File is valid; nothing was extracted or stored (--dry-run).")
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract text, fonts, links, images and tables from a PDF, DOCX or PPTX file.")
+    parser.add_argument("file_path", nargs="?", help="document to extract (prompted for when omitted)")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="only validate and load the file; no cache, outputs or database connection")
+    args = parser.parse_args()
+
+    file_path = args.file_path or input("Enter the file path: ")
+    if args.dry_run:
+        dry_run(file_path)
+        return
+    configure_from_env()
+    with document(os.path.basename(file_path)):
+        extractor = open_document(file_path, open_extraction_cache())
+
+        # Extract data if validation is successful
+        print("------------------")
+        sql_storage = connect_sql_storage()
+
+        # Stream the extracted data page by page into the output files and the SQL database
+        image_store = open_image_store()
+        image_processor = open_image_processor()
+        search_index = open_search_index()
+        concurrency = int(os.getenv("EXTRACTION_CONCURRENCY", "1"))
+        page_shards = int(os.getenv("EXTRACTION_PAGE_SHARDS", "1"))
+        output_format = os.getenv("OUTPUT_FORMAT", "txt")
+        try:
+            if concurrency > 1 or page_shards > 1:
+                # Stages or page ranges run concurrently, then the whole document is stored at once
+                process_stages = [stage for stage in os.getenv("EXTRACTION_PROCESS_STAGES", "").split(",") if stage]
+                results = extract_document(extractor, image_store=image_store, concurrency=concurrency,
+                                           process_stages=process_stages, page_shards=page_shards,
+                                           output_format=output_format, search_index=search_index,
+                                           image_processor=image_processor)
+                store_document(sql_storage, results)
+                print("Stage timings: " + ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in results["timings"].items()))
+            else:
+                stream_document(extractor, sql_storage, image_store=image_store, output_format=output_format,
+                                search_index=search_index, image_processor=image_processor)
+        except Exception:
+            if isinstance(extractor, CacheRecorder):
+                extractor.discard()
+            raise
+        finally:
+            if image_processor is not None:
+                image_processor.close()
+        if isinstance(extractor, CacheRecorder):
+            extractor.commit()
+        if search_index is not None:
+            search_index.commit()
 
+    if os.getenv("METRICS_PROMETHEUS_FILE"):
+        METRICS.write_prometheus(os.getenv("METRICS_PROMETHEUS_FILE"))
+    stats = sql_storage.image_dedup_stats()
+    print(f"Images: {stats['occurrences']} stored as {stats['unique']} new blobs "
+          f"(dedup ratio {stats['dedup_ratio']:.2f}, {stats['bytes_saved']} bytes saved).")
+    if image_processor is not None:
+        print(image_processing_summary(image_processor.stats.as_dict()))
     print("Data extraction and storage complete.")
 
 if __name__ == "__main__":
@@ -0,0 +1,373 @@
+"""Per-stage and per-document instrumentation: wall and CPU time, pages, rows, bytes written and peak RSS.
+
+Measurements are always collected (a few clock reads per call) unless METRICS=off. They are
+exported as one JSON log line per document (configure_log), as Prometheus text
+(prometheus_text, write_prometheus, serve_metrics) and, when PROFILE_DIR is set, as a
+cProfile or pyinstrument profile per document.
+
+Peak RSS is a per-process high-water mark. On Linux it is reset when a document starts
+(/proc/self/clear_refs), so the peak of a document and its stages is its own even in a
+reused pool worker. Documents handled at the same time by threads of one process still
+share that mark. Elsewhere the mark never resets: the document summary then says
+"peak_rss_scope": "process", and the value is the peak of every document so far.
+"""
+import contextvars
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections.abc import Mapping
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger("data_extractor.metrics")
+
+ENABLED = os.getenv("METRICS", "on").lower() not in ("0", "off", "false", "no")
+
+PROFILERS = ("cprofile", "pyinstrument")
+
+_VM_HWM = re.compile(r"^VmHWM:\s+(\d+) kB", re.MULTILINE)
+# Highest peak before a reset_peak_rss(); the reset clears ru_maxrss as well
+_process_peak = 0
+
+def peak_rss_bytes() -> int:
+    """Peak resident set size since the last reset_peak_rss(), or over the process life where it cannot be reset."""
+    try:
+        with open("/proc/self/status") as status:
+            match = _VM_HWM.search(status.read())
+    except OSError:
+        match = None
+    if match:
+        return int(match.group(1)) * 1024
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def process_peak_rss_bytes() -> int:
+    """Peak resident set size over the whole life of this process."""
+    return max(_process_peak, peak_rss_bytes())
+
+def reset_peak_rss() -> bool:
+    """Restart peak_rss_bytes() from the current RSS; False where the kernel does not support it."""
+    global _process_peak
+    peak = peak_rss_bytes()
+    try:
+        with open("/proc/self/clear_refs", 'w') as clear_refs:
+            clear_refs.write("5")
+    except OSError:
+        return False
+    _process_peak = max(_process_peak, peak)
+    return True
+
+class StageStats:
+    """Totals of every measurement of one stage."""
+
+    __slots__ = ("calls", "wall_seconds", "cpu_seconds", "pages", "records", "rows", "bytes_written", "peak_rss_bytes")
+
+    def __init__(self):
+        self.calls = 0
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.pages = 0
+        self.records = 0
+        self.rows = 0
+        self.bytes_written = 0
+        self.peak_rss_bytes = 0
+
+    def add(self, other: Dict[str, Any]):
+        for name in self.__slots__:
+            if name == "peak_rss_bytes":
+                self.peak_rss_bytes = max(self.peak_rss_bytes, other.get(name, 0))
+            else:
+                setattr(self, name, getattr(self, name) + other.get(name, 0))
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+_PROMETHEUS_FIELDS = (
+    ("calls", "counter", "Measured calls per stage."),
+    ("wall_seconds", "counter", "Wall time spent per stage."),
+    ("cpu_seconds", "counter", "CPU time of the measuring thread per stage."),
+    ("pages", "counter", "Pages processed per stage."),
+    ("records", "counter", "Records produced or written per stage."),
+    ("rows", "counter", "Database rows written per stage."),
+    ("bytes_written", "counter", "Bytes written to files per stage."),
+    ("peak_rss_bytes", "gauge", "Peak resident set size of the document seen at the end of a stage."),
+)
+
+class Metrics:
+    """Process-wide totals per stage; thread-safe."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stages: Dict[str, StageStats] = {}
+        self.documents = 0
+        self._gauges: List[Callable[[], Iterable[Tuple[str, str, str, float]]]] = []
+
+    def add(self, stage: str, stats: Dict[str, Any]):
+        with self._lock:
+            self.stages.setdefault(stage, StageStats()).add(stats)
+
+    def add_document(self):
+        with self._lock:
+            self.documents += 1
+
+    def add_gauges(self, collect: Callable[[], Iterable[Tuple[str, str, str, float]]]):
+        """Export the (name, type, help, value) samples of collect() with every prometheus_text()."""
+        with self._lock:
+            self._gauges.append(collect)
+
+    def prometheus_text(self) -> str:
+        """The totals in the Prometheus text exposition format."""
+        with self._lock:
+            stages = {stage: stats.as_dict() for stage, stats in sorted(self.stages.items())}
+            documents = self.documents
+            gauges = list(self._gauges)
+        lines = []
+        for field, metric_type, help_text in _PROMETHEUS_FIELDS:
+            name = f"extractor_stage_{field}" + ("_total" if metric_type == "counter" else "")
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            lines.extend(f'{name}{{stage="{stage}"}} {stats[field]}' for stage, stats in stages.items())
+        lines.append("# HELP extractor_documents_total Documents processed.")
+        lines.append("# TYPE extractor_documents_total counter")
+        lines.append(f"extractor_documents_total {documents}")
+        lines.append("# HELP extractor_peak_rss_bytes Peak resident set size of this process.")
+        lines.append("# TYPE extractor_peak_rss_bytes gauge")
+        lines.append(f"extractor_peak_rss_bytes {process_peak_rss_bytes()}")
+        for collect in gauges:
+            for name, metric_type, help_text, value in collect():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str):
+        """Write prometheus_text() atomically, e.g. for the node_exporter textfile collector."""
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        with open(tmp_path, 'w') as file:
+            file.write(self.prometheus_text())
+        os.replace(tmp_path, path)
+
+METRICS = Metrics()
+
+class DocumentMetrics:
+    """The measurements attributed to one document."""
+
+    def __init__(self, file_name: str, peak_rss_scope: str = "process"):
+        self.file_name = file_name
+        self.peak_rss_scope = peak_rss_scope
+        self.stages: Dict[str, StageStats] = {}
+        self.summary: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, stats: Dict[str, Any]):
+        with self._lock:
+            self.stages.setdefault(stage, StageStats()).add(stats)
+
+    def as_dict(self, wall_seconds: float, cpu_seconds: float) -> Dict[str, Any]:
+        stages = {stage: stats.as_dict() for stage, stats in self.stages.items()}
+        return {
+            "event": "document",
+            "file_name": self.file_name,
+            "wall_seconds": wall_seconds,
+            "cpu_seconds": cpu_seconds,
+            "pages": max((stats["pages"] for stats in stages.values()), default=0),
+            "rows": sum(stats["rows"] for stats in stages.values()),
+            "bytes_written": sum(stats["bytes_written"] for stats in stages.values()),
+            "peak_rss_bytes": peak_rss_bytes(),
+            "peak_rss_scope": self.peak_rss_scope,
+            "stages": stages
+        }
+
+_current_document: contextvars.ContextVar[Optional[DocumentMetrics]] = contextvars.ContextVar(
+    "current_document", default=None)
+
+class Measurement:
+    """Wall and CPU time of a stage plus what it processed.
+
+    As a context manager it times the block and records on exit. A streaming writer can
+    instead call start()/stop() around each write and record() once at the end.
+    """
+
+    __slots__ = ("stage", "pages", "records", "rows", "bytes_written", "wall_seconds", "cpu_seconds",
+                 "_wall_start", "_cpu_start")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.pages = self.records = self.rows = self.bytes_written = 0
+        self.wall_seconds = self.cpu_seconds = 0.0
+
+    def start(self):
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.thread_time()
+
+    def stop(self):
+        self.wall_seconds += time.perf_counter() - self._wall_start
+        self.cpu_seconds += time.thread_time() - self._cpu_start
+
+    def record(self):
+        if not ENABLED:
+            return
+        stats = {
+            "calls": 1,
+            "wall_seconds": self.wall_seconds,
+            "cpu_seconds": self.cpu_seconds,
+            "pages": self.pages,
+            "records": self.records,
+            "rows": self.rows,
+            "bytes_written": self.bytes_written,
+            "peak_rss_bytes": peak_rss_bytes()
+        }
+        METRICS.add(self.stage, stats)
+        document = _current_document.get()
+        if document is not None:
+            document.add(self.stage, stats)
+
+    def __enter__(self) -> "Measurement":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+        self.record()
+
+def measure(stage: str) -> Measurement:
+    """Time a block as one call of a stage: `with measure("extract_text") as m: ...; m.pages = n`."""
+    return Measurement(stage)
+
+def count_pages(records) -> int:
+    """Distinct page numbers among extractor records."""
+    return len({record.get("page_number") for record in records if isinstance(record, Mapping)} - {None})
+
+def collect(stage: str, records: Iterable[Any], written: Optional[Callable[[List[Any]], int]] = None) -> List[Any]:
+    """list(records), measured as one call of a stage; written(records) gives the bytes it wrote."""
+    with measure(stage) as measurement:
+        records = list(records)
+        measurement.records = len(records)
+        measurement.pages = count_pages(records)
+        if written is not None:
+            measurement.bytes_written = written(records)
+    return records
+
+def _profiler(name: str):
+    if name not in PROFILERS:
+        raise ValueError(f"Unknown profiler: {name}")
+    if name == "pyinstrument":
+        try:
+            import pyinstrument
+        except ImportError:
+            raise ImportError("PROFILER=pyinstrument requires pyinstrument: pip install pyinstrument") from None
+        return pyinstrument.Profiler()
+    import cProfile
+    return cProfile.Profile()
+
+def _save_profile(profiler, profile_dir: str, file_name: str):
+    # The pid keeps the extraction (worker) and storage (parent) profiles of a batch apart
+    safe_name = re.sub(r"[^\w.-]", "_", file_name)
+    base = os.path.join(profile_dir, f"{safe_name}.{os.getpid()}")
+    if hasattr(profiler, "output_html"):
+        with open(f"{base}.html", 'w') as file:
+            file.write(profiler.output_html())
+    else:
+        profiler.dump_stats(f"{base}.prof")
+
+@contextmanager
+def document(file_name: str, extracted: Optional[Dict[str, Any]] = None, log: bool = True):
+    """Attribute every measurement inside the block, in this thread or copied contexts, to one document.
+
+    On exit the document is logged as one JSON line (with log=True) and the summary dict is
+    left in the yielded DocumentMetrics' `summary`. `extracted` is the summary of the same
+    document from a worker process, whose stages are added here and to the totals.
+    With PROFILE_DIR set the block is profiled by PROFILER (cprofile or pyinstrument).
+    """
+    # The peak RSS of the last document is no use to this one
+    metrics = DocumentMetrics(file_name, "document" if ENABLED and reset_peak_rss() else "process")
+    wall_seconds, cpu_seconds = 0.0, 0.0
+    if extracted is not None:
+        wall_seconds, cpu_seconds = extracted["wall_seconds"], extracted["cpu_seconds"]
+        for stage, stats in extracted["stages"].items():
+            metrics.add(stage, stats)
+            METRICS.add(stage, stats)
+
+    profile_dir = os.getenv("PROFILE_DIR") if ENABLED else None
+    profiler = None
+    if profile_dir:
+        os.makedirs(profile_dir, exist_ok=True)
+        profiler = _profiler(os.getenv("PROFILER", "cprofile").lower())
+        if hasattr(profiler, "output_html"):
+            profiler.start()
+        else:
+            profiler.enable()
+
+    token = _current_document.set(metrics)
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        yield metrics
+    finally:
+        wall_seconds += time.perf_counter() - wall_start
+        cpu_seconds += time.process_time() - cpu_start
+        _current_document.reset(token)
+        if profiler is not None:
+            if hasattr(profiler, "output_html"):
+                profiler.stop()
+            else:
+                profiler.disable()
+            _save_profile(profiler, profile_dir, file_name)
+        metrics.summary = metrics.as_dict(wall_seconds, cpu_seconds)
+        if extracted is not None:
+            metrics.summary["peak_rss_bytes"] = max(metrics.summary["peak_rss_bytes"], extracted["peak_rss_bytes"])
+        if ENABLED and log:
+            METRICS.add_document()
+            logger.info(json.dumps(metrics.summary))
+
+def configure_log(path: str):
+    """Send the JSON document lines to a file, or to stderr for "-"."""
+    handler = logging.StreamHandler(sys.stderr) if path == "-" else logging.FileHandler(path)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+def serve_metrics(port: int, host: str = ""):
+    """Serve GET /metrics in Prometheus text format from a daemon thread; returns the ThreadingHTTPServer."""
+    # http.server pulls in http.client, email and ssl; only processes that serve metrics pay for them
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = METRICS.prometheus_text().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # Scrapes every few seconds would flood stderr
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+def configure_from_env():
+    """Apply METRICS_LOG and METRICS_PORT; PROFILE_DIR and PROFILER are read per document."""
+    if os.getenv("METRICS_LOG"):
+        configure_log(os.getenv("METRICS_LOG"))
+    if os.getenv("METRICS_PORT"):
+        return serve_metrics(int(os.getenv("METRICS_PORT")))
+    return None
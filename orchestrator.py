@@ -0,0 +1,90 @@
+import contextvars
+import time
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from data_extractor.extractor import DataExtractor
+
+STAGES = ("text", "links", "images", "tables")
+
+def run_stage(extractor, stage, output_image=None, output_tables=None):
+    """Run one extraction stage and return (records, wall seconds)."""
+    start = time.perf_counter()
+    if stage == "text":
+        records = extractor.extract_text()
+    elif stage == "links":
+        records = extractor.extract_links()
+    elif stage == "images":
+        records = extractor.extract_images(output_image)
+    elif stage == "tables":
+        records = extractor.extract_tables(output_tables)
+    else:
+        raise ValueError(f"Unknown extraction stage: {stage}")
+    return records, time.perf_counter() - start
+
+def run_changed_pages(extractor, pages, output_image=None, output_tables=None):
+    """Re-extract a document of which only some pages changed.
+
+    The extractor's page_scoped_stages only run for those pages. The other stages run for
+    every page: text and links because their output files are rewritten whole, and tabula
+    tables because their files are numbered across the document. Returns ({stage: records}, {stage: seconds, "total": seconds}).
+    """
+    start = time.perf_counter()
+    results, timings = {}, {}
+    try:
+        for stage in STAGES:
+            extractor.page_range = pages if stage in extractor.page_scoped_stages else None
+            results[stage], timings[stage] = run_stage(extractor, stage, output_image, output_tables)
+    finally:
+        extractor.page_range = None
+    timings["total"] = time.perf_counter() - start
+    return results, timings
+
+def _run_stage_in_thread(extractor, stage, output_image, output_tables):
+    # Document handles (PyMuPDF, lxml trees) are not thread-safe, so each thread opens its own
+    return run_stage(extractor.reopen(), stage, output_image, output_tables)
+
+def _run_stage_in_process(extractor, stage, output_image, output_tables):
+    # The extractor arrives pickled without its document handle
+    extractor.load(extractor.file_path)
+    return run_stage(extractor, stage, output_image, output_tables)
+
+def run_stages(extractor, output_image=None, output_tables=None, max_workers=1, process_stages=()):
+    """Run the independent extraction stages of one document, concurrently when max_workers > 1.
+
+    I/O-bound stages (image writes, table CSVs, tabula) run in threads. Stages named in
+    process_stages run in a process pool, which suits CPU-bound text extraction.
+    Returns ({stage: records}, {stage: seconds, "total": seconds}).
+    """
+    start = time.perf_counter()
+    results, timings = {}, {}
+
+    if max_workers <= 1:
+        for stage in STAGES:
+            results[stage], timings[stage] = run_stage(extractor, stage, output_image, output_tables)
+        timings["total"] = time.perf_counter() - start
+        return results, timings
+
+    # Only real extractors can be re-loaded in another process; cached results stay in threads
+    process_stages = [stage for stage in process_stages if isinstance(extractor, DataExtractor)]
+    process_pool = ProcessPoolExecutor(min(max_workers, len(process_stages))) if process_stages else nullcontext()
+    with ThreadPoolExecutor(max_workers) as thread_pool, process_pool:
+        # Thread stages run in a copy of this context, so their metrics count towards the current document
+        def submit_to_thread(*args):
+            return thread_pool.submit(contextvars.copy_context().run, *args)
+
+        futures = {}
+        handle_in_use = False
+        for stage in STAGES:
+            if stage in process_stages:
+                futures[stage] = process_pool.submit(_run_stage_in_process, extractor, stage, output_image, output_tables)
+            elif not handle_in_use:
+                # The first thread stage can use the handle that is already open
+                handle_in_use = True
+                futures[stage] = submit_to_thread(run_stage, extractor, stage, output_image, output_tables)
+            else:
+                futures[stage] = submit_to_thread(_run_stage_in_thread, extractor, stage, output_image, output_tables)
+        for stage, future in futures.items():
+            results[stage], timings[stage] = future.result()
+
+    timings["total"] = time.perf_counter() - start
+    return results, timings
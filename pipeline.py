@@ -0,0 +1,90 @@
+import os
+from storage.file_storage import FileStorage
+from storage.jsonl_storage import JSONLStorage
+from storage.parquet_storage import ParquetStorage
+from storage.storage import document_key
+
+# "txt" is the original str(list) dump of text and links; the others also write image metadata and tables
+OUTPUT_FORMATS = {"txt": FileStorage, "jsonl": JSONLStorage, "parquet": ParquetStorage}
+
+def open_file_storage(extractor, output_format="txt"):
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format: {output_format}")
+    return OUTPUT_FORMATS[output_format](extractor)
+
+def output_file_paths(file_path, output_text, output_format="txt", name=None):
+    """Output file per record kind for a document, named after `name` (default: the file's stem).
+    The txt format only has text and links."""
+    name_without_extension = name or os.path.splitext(os.path.basename(file_path))[0]
+    extension = OUTPUT_FORMATS[output_format].extension
+    kinds = {"text": "text_data", "links": "hyperlinks"}
+    if output_format != "txt":
+        kinds.update(images="images", tables="tables")
+    return {kind: os.path.join(output_text, f"{name_without_extension}-output-{suffix}.{extension}")
+            for kind, suffix in kinds.items()}
+
+def _drain(records):
+    """Consume an iterator without keeping its items and return how many there were."""
+    count = 0
+    for _ in records:
+        count += 1
+    return count
+
+def stream_document(extractor, sql_storage=None, output_image="output_images",
+                    output_text="output_text", output_tables="output_tables", image_store=None,
+                    output_format="txt", search_index=None, image_processor=None):
+    """Extract a loaded document page by page and push every record straight into storage.
+
+    Nothing is collected per document: text and link records are written to the
+    output files as they are produced and reach the database in batches of
+    sql_storage.batch_size, so memory stays around one page plus one batch. The
+    document's previous rows are deleted in the same transaction, so storing it again
+    leaves no stale pages, links or images.
+    With an ImageStore, images are written once per distinct content into the store
+    instead of once per occurrence into output_image. output_format picks the file
+    format of the per-document records (see OUTPUT_FORMATS). With a SearchIndex the pages
+    are also buffered for indexing; they are searchable after search_index.commit().
+    With an ImageProcessor, images are transcoded, downscaled and thumbnailed before they are stored.
+    Returns the number of records stored per kind.
+    """
+    if image_store is not None:
+        output_image = None
+    # output_image=None keeps images in memory only
+    for folder in (output_image, output_text, output_tables):
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+
+    document = document_key(extractor.file_path)
+    file_paths = output_file_paths(extractor.file_path, output_text, output_format)
+
+    file_storage = open_file_storage(extractor, output_format)
+    text_records = file_storage.stream_data(extractor.iter_text(), file_paths["text"])
+    if search_index is not None:
+        text_records = search_index.index_pages(document, text_records)
+    link_records = file_storage.stream_data(extractor.iter_links(), file_paths["links"])
+    if image_processor is not None:
+        # Images are written once processed, so the extractor keeps them in memory
+        images = image_processor.process_all(extractor.iter_images(None), output_image)
+    else:
+        images = extractor.iter_images(output_image)
+    if image_store is not None:
+        images = image_store.store_all(images)
+    if "images" in file_paths:
+        images = file_storage.stream_data(images, file_paths["images"])
+    tables = extractor.iter_tables(output_tables)
+    if "tables" in file_paths:
+        tables = file_storage.stream_data(tables, file_paths["tables"])
+
+    counts = {}
+    if sql_storage is None:
+        counts["text"] = _drain(text_records)
+        counts["links"] = _drain(link_records)
+        counts["images"] = _drain(images)
+    else:
+        with sql_storage.transaction():
+            sql_storage.delete_pages(document)
+            counts["text"] = sql_storage.insert_text_rows(document, text_records)
+            counts["links"] = sql_storage.insert_links(document, link_records)
+            counts["images"] = sql_storage.insert_images(document, images)
+    counts["tables"] = _drain(tables)
+    return counts
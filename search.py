@@ -0,0 +1,22 @@
+import argparse
+import time
+from storage.search_index import SearchIndex
+
+def main():
+    parser = argparse.ArgumentParser(description="Search the pages added to a full-text index.")
+    parser.add_argument("index", help="index folder (SEARCH_INDEX_DIR or batch.py --search-index)")
+    parser.add_argument("query", help='terms and "quoted phrases"')
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    search_index = SearchIndex(args.index)
+    start = time.perf_counter()
+    hits = search_index.search(args.query, args.limit)
+    elapsed = time.perf_counter() - start
+    for document, page_number, snippet in hits:
+        print(f"{document} p.{page_number}: {snippet}")
+    print(f"{len(hits)} results in {elapsed * 1000:.1f} ms")
+    search_index.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from orchestrator import STAGES, run_stage
+
+def shard_ranges(page_count, shards):
+    """Split pages 1..page_count into at most `shards` contiguous ranges of nearly equal size."""
+    shards = max(1, min(shards, page_count))
+    size, extra = divmod(page_count, shards)
+    ranges, start = [], 1
+    for shard in range(shards if page_count else 0):
+        stop = start + size + (1 if shard < extra else 0)
+        ranges.append(range(start, stop))
+        start = stop
+    return ranges
+
+def _extract_shard(extractor, page_range, output_image, output_tables):
+    # The extractor arrives pickled without its document handle, so each worker opens the file itself
+    start = time.perf_counter()
+    extractor.page_range = page_range
+    extractor.load(extractor.file_path)
+    results = {stage: run_stage(extractor, stage, output_image, output_tables)[0] for stage in STAGES}
+    return results, time.perf_counter() - start
+
+def extract_sharded(extractor, output_image=None, output_tables=None, shards=None):
+    """Extract one large document by splitting it into page ranges handled by a process pool.
+
+    Results are merged in page order and tables without a page are renumbered, so the output
+    matches a serial run. Returns ({stage: records}, {"pages a-b": seconds, ..., "total": seconds}).
+    """
+    if not extractor.supports_page_range:
+        raise ValueError(f"{type(extractor).__name__} cannot extract page ranges")
+    start = time.perf_counter()
+    ranges = shard_ranges(extractor.page_count(), shards or os.cpu_count() or 1)
+
+    # tabula tables are numbered from 1 in each shard, so shards write apart and are renamed afterwards
+    shard_folders = [tempfile.mkdtemp(prefix=".shard-", dir=output_tables) if output_tables else None
+                     for _ in ranges]
+    try:
+        with ProcessPoolExecutor(max(1, len(ranges))) as pool:
+            futures = [pool.submit(_extract_shard, extractor, page_range, output_image, folder)
+                       for page_range, folder in zip(ranges, shard_folders)]
+            shard_results = [future.result() for future in futures]
+
+        results = {stage: [] for stage in STAGES}
+        timings = {}
+        for page_range, (shard, seconds) in zip(ranges, shard_results):
+            timings[f"pages {page_range.start}-{page_range.stop - 1}"] = seconds
+            for stage in ("text", "links", "images"):
+                results[stage].extend(shard[stage])
+            for table in shard["tables"]:
+                if table.page_number is None:
+                    # tabula tables are numbered across the document
+                    numbered = sum(1 for other in results["tables"] if other.page_number is None)
+                    table_path = os.path.join(output_tables, f"table_pdf_{numbered + 1}.csv")
+                else:
+                    table_path = os.path.join(output_tables, os.path.basename(table.table_path))
+                os.replace(table, table_path)
+                results["tables"].append(table.replace(table_path=table_path))
+    finally:
+        for folder in shard_folders:
+            if folder:
+                shutil.rmtree(folder, ignore_errors=True)
+
+    timings["total"] = time.perf_counter() - start
+    return results, timings
@@ -0,0 +1,63 @@
+import queue
+import threading
+from contextlib import contextmanager
+
+class PoolTimeoutError(Exception):
+    """Raised when no pooled connection became free within the timeout."""
+    pass
+
+class ConnectionPool:
+    """A fixed-size pool of DB-API connections shared by the threads of one process.
+
+    Connections are opened lazily by connect() and reused afterwards. When all of them
+    are in use, acquire() blocks until one is released instead of failing right away.
+    """
+
+    def __init__(self, connect, size):
+        if size < 1:
+            raise ValueError("Pool size must be at least 1")
+        self.size = size
+        self._connect = connect
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def acquire(self, timeout=None):
+        if not self._slots.acquire(timeout=timeout):
+            raise PoolTimeoutError(f"No database connection free after {timeout}s")
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            return self._connect()
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, connection, discard=False):
+        """Return a connection to the pool, or close it when it may be unusable."""
+        try:
+            if discard:
+                connection.close()
+            else:
+                self._idle.put(connection)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        connection = self.acquire(timeout)
+        try:
+            yield connection
+        except Exception:
+            self.release(connection, discard=True)
+            raise
+        self.release(connection)
+
+    def close(self):
+        """Close the idle connections; connections still in use are closed when released with discard."""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
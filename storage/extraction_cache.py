@@ -0,0 +1,223 @@
+import copy
+import filecmp
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import time
+import uuid
+from typing import Any, Dict, Iterator, List, Optional
+from data_extractor.extractor import DataExtractor, EXTRACTOR_VERSION
+from data_extractor.records import PageText, Link, ImageRef, TableRef
+from metrics import collect
+
+DEFAULT_CACHE_DIR = ".extraction_cache"
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024  # 1 GiB
+
+RECORD_FILES = ("text.pkl", "links.pkl", "images.pkl", "tables.pkl")
+
+def file_digest(file_path: str) -> str:
+    """SHA-256 of a file's content, read in 1 MiB chunks."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _read_records(path: str) -> Iterator[Any]:
+    with open(path, 'rb') as file:
+        while True:
+            try:
+                yield pickle.load(file)
+            except EOFError:
+                return
+
+def _restore_file(cached_path: str, output_folder: str) -> str:
+    # Names like table_pdf_1.csv repeat across documents, so an existing file is only kept if it has the same content
+    target_path = os.path.join(output_folder, os.path.basename(cached_path))
+    if not (os.path.exists(target_path) and filecmp.cmp(cached_path, target_path, shallow=False)):
+        shutil.copyfile(cached_path, target_path)
+    return target_path
+
+def _has_content(path: str, data: bytes) -> bool:
+    if not os.path.exists(path) or os.path.getsize(path) != len(data):
+        return False
+    with open(path, 'rb') as file:
+        return file.read() == data
+
+class _ExtractionResults:
+    """The list-returning extract_* methods of DataExtractor, built on iter_*."""
+
+    def extract_text(self) -> List[PageText]:
+        return collect("extract_text", self.iter_text())
+
+    def extract_links(self) -> List[Link]:
+        return collect("extract_links", self.iter_links())
+
+    def extract_images(self, output_folder: Optional[str] = None) -> List[ImageRef]:
+        # Cache hits only write the images that are missing or differ, so no bytes are counted here
+        return collect("extract_images", self.iter_images(output_folder))
+
+    def extract_tables(self, output_folder: str) -> List[TableRef]:
+        return collect("extract_tables", self.iter_tables(output_folder))
+
+class CachedExtraction(_ExtractionResults):
+    """Extraction results served from the cache, with the same iter_*/extract_* methods as a DataExtractor."""
+
+    def __init__(self, entry_dir: str, file_path: str):
+        self.entry_dir = entry_dir
+        self.file_path = file_path
+
+    def reopen(self) -> "CachedExtraction":
+        # Every iter_* call opens its own file, so one instance can serve several threads
+        return self
+
+    def iter_text(self) -> Iterator[PageText]:
+        return _read_records(os.path.join(self.entry_dir, "text.pkl"))
+
+    def iter_links(self) -> Iterator[Link]:
+        return _read_records(os.path.join(self.entry_dir, "links.pkl"))
+
+    def iter_images(self, output_folder: Optional[str] = None) -> Iterator[ImageRef]:
+        for image in _read_records(os.path.join(self.entry_dir, "images.pkl")):
+            image_path = os.path.basename(image["image_path"])
+            if output_folder:
+                image_path = os.path.join(output_folder, image_path)
+                if not _has_content(image_path, image["image"]):
+                    with open(image_path, 'wb') as image_file:
+                        image_file.write(image["image"])
+            yield image.replace(image_path=image_path)
+
+    def iter_tables(self, output_folder: str) -> Iterator[TableRef]:
+        for table in _read_records(os.path.join(self.entry_dir, "tables.pkl")):
+            # Cached with the bare file name
+            cached_path = os.path.join(self.entry_dir, "files", table.table_path)
+            yield table.replace(table_path=_restore_file(cached_path, output_folder))
+
+class CacheRecorder(_ExtractionResults):
+    """Wrap a loaded DataExtractor and save everything it yields into a new cache entry.
+
+    The entry is written to a temporary folder and only becomes visible to other
+    runs once commit() is called after every stream has been consumed.
+    """
+
+    def __init__(self, cache: "ExtractionCache", key: str, extractor: DataExtractor):
+        self.cache = cache
+        self.key = key
+        self.extractor = extractor
+        self.file_path = extractor.file_path
+        self.tmp_dir = os.path.join(cache.cache_dir, f"{key}.tmp-{uuid.uuid4().hex}")
+        os.makedirs(os.path.join(self.tmp_dir, "files"))
+
+    def reopen(self) -> "CacheRecorder":
+        """Record into the same entry through an extractor with its own file handle."""
+        clone = copy.copy(self)
+        clone.extractor = self.extractor.reopen()
+        return clone
+
+    def _record(self, records, file_name, to_cached=None):
+        with open(os.path.join(self.tmp_dir, file_name), 'wb') as file:
+            for record in records:
+                pickle.dump(to_cached(record) if to_cached else record, file, pickle.HIGHEST_PROTOCOL)
+                yield record
+
+    def _copy_file(self, table: TableRef) -> TableRef:
+        file_name = os.path.basename(table.table_path)
+        shutil.copyfile(table.table_path, os.path.join(self.tmp_dir, "files", file_name))
+        return table.replace(table_path=file_name)
+
+    def iter_text(self) -> Iterator[PageText]:
+        return self._record(self.extractor.iter_text(), "text.pkl")
+
+    def iter_links(self) -> Iterator[Link]:
+        return self._record(self.extractor.iter_links(), "links.pkl")
+
+    def iter_images(self, output_folder: Optional[str] = None) -> Iterator[ImageRef]:
+        # Image records carry their bytes, so no file needs to be copied
+        return self._record(self.extractor.iter_images(output_folder), "images.pkl")
+
+    def iter_tables(self, output_folder: str) -> Iterator[TableRef]:
+        return self._record(self.extractor.iter_tables(output_folder), "tables.pkl", self._copy_file)
+
+    def record_results(self, results: Dict[str, List[Any]]):
+        """Save results that were extracted without going through this recorder, keyed by stage."""
+        for stage, file_name in zip(("text", "links", "images", "tables"), RECORD_FILES):
+            to_cached = self._copy_file if stage == "tables" else None
+            for _ in self._record(results[stage], file_name, to_cached):
+                pass
+
+    def commit(self):
+        """Publish the entry and evict old entries if the cache grew past its size cap."""
+        if not all(os.path.exists(os.path.join(self.tmp_dir, name)) for name in RECORD_FILES):
+            self.discard()
+            return
+        entry_dir = self.cache.entry_dir(self.key)
+        try:
+            os.rename(self.tmp_dir, entry_dir)
+        except OSError:
+            # Another process cached the same document first
+            self.discard()
+        self.cache.evict()
+
+    def discard(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+class ExtractionCache:
+    """On-disk extraction cache keyed by the content hash of the input document, EXTRACTOR_VERSION and the extractor options."""
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key_for(file_path: str, options: Optional[Dict[str, str]] = None) -> str:
+        """Cache key of a file; options that change the results (e.g. the table engine) get their own entries."""
+        key = f"{file_digest(file_path)}-v{EXTRACTOR_VERSION}"
+        if options:
+            key += "-" + hashlib.sha256(json.dumps(options, sort_keys=True).encode()).hexdigest()[:12]
+        return key
+
+    def entry_dir(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key)
+
+    def get(self, key: str, file_path: str) -> Optional[CachedExtraction]:
+        """Return the cached results for a key, or None on a miss."""
+        entry_dir = self.entry_dir(key)
+        if not os.path.isdir(entry_dir):
+            return None
+        # The folder mtime is the last-used time for LRU eviction
+        now = time.time()
+        os.utime(entry_dir, (now, now))
+        return CachedExtraction(entry_dir, file_path)
+
+    def recorder(self, key: str, extractor: DataExtractor) -> CacheRecorder:
+        return CacheRecorder(self, key, extractor)
+
+    @staticmethod
+    def _entry_size(entry_dir: str) -> int:
+        size = 0
+        for root, _, names in os.walk(entry_dir):
+            for name in names:
+                size += os.path.getsize(os.path.join(root, name))
+        return size
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            entry_dir = os.path.join(self.cache_dir, name)
+            if ".tmp-" in name or not os.path.isdir(entry_dir):
+                continue
+            try:
+                entries.append((os.path.getmtime(entry_dir), self._entry_size(entry_dir), entry_dir))
+            except OSError:
+                continue
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry_dir in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total -= size
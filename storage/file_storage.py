@@ -1,11 +1,38 @@
-from typing import Any
+from typing import Any, Iterable, Iterator
 from storage.storage import Storage
 from data_extractor.extractor import DataExtractor
+from data_extractor.records import as_dict
+from metrics import Measurement, measure
 
 class FileStorage(Storage):
+    extension = "txt"
+
     def __init__(self, extractor: DataExtractor):
         self.extractor = extractor
 
     def store_data(self, data: Any, file_path: str):
-        with open(file_path, 'w') as file:
+        if isinstance(data, list):
+            # The txt dump keeps the dict repr it had before the record types
+            data = [as_dict(record) for record in data]
+        with measure("file_write") as measurement, open(file_path, 'w') as file:
             file.write(str(data))
+            measurement.records = len(data) if isinstance(data, list) else 1
+            measurement.bytes_written = file.tell()
+
+    def stream_data(self, records: Iterable[Any], file_path: str) -> Iterator[Any]:
+        """Write records as they pass through, producing the same file as store_data(list(records))."""
+        # Only the writes are timed, not the extraction that produces the records
+        measurement = Measurement("file_write")
+        with open(file_path, 'w') as file:
+            file.write('[')
+            for index, record in enumerate(records):
+                measurement.start()
+                if index:
+                    file.write(', ')
+                file.write(repr(as_dict(record)))
+                measurement.stop()
+                measurement.records += 1
+                yield record
+            file.write(']')
+            measurement.bytes_written = file.tell()
+        measurement.record()
@@ -0,0 +1,77 @@
+import hashlib
+import os
+import uuid
+from typing import Any, Dict, Iterable, Iterator
+
+def image_hash(image: Dict[str, Any]) -> str:
+    """SHA-256 of the image bytes, reusing the one computed by the extractor when present."""
+    return image.get("image_hash") or hashlib.sha256(image["image"]).hexdigest()
+
+class DedupStats:
+    """Counts of image occurrences against the unique blobs that actually had to be stored."""
+
+    def __init__(self):
+        self.occurrences = 0
+        self.unique = 0
+        self.bytes_in = 0
+        self.bytes_stored = 0
+
+    def add(self, size: int, is_new: bool):
+        self.occurrences += 1
+        self.bytes_in += size
+        if is_new:
+            self.unique += 1
+            self.bytes_stored += size
+
+    def merge(self, stats: Dict[str, Any]):
+        self.occurrences += stats["occurrences"]
+        self.unique += stats["unique"]
+        self.bytes_in += stats["bytes_in"]
+        self.bytes_stored += stats["bytes_stored"]
+
+    def as_dict(self) -> Dict[str, Any]:
+        # Occurrences per stored blob; 1.0 means nothing was deduplicated
+        if self.unique:
+            dedup_ratio = self.occurrences / self.unique
+        else:
+            dedup_ratio = float("inf") if self.occurrences else 0.0
+        return {
+            "occurrences": self.occurrences,
+            "unique": self.unique,
+            "bytes_in": self.bytes_in,
+            "bytes_stored": self.bytes_stored,
+            "dedup_ratio": dedup_ratio,
+            "bytes_saved": self.bytes_in - self.bytes_stored
+        }
+
+class ImageStore:
+    """Content-addressed image store: each unique image is written once under root/ab/cd/<sha256>.<ext>."""
+
+    def __init__(self, root: str):
+        self.root = root
+        self.stats = DedupStats()
+        os.makedirs(root, exist_ok=True)
+
+    def path_for(self, digest: str, ext: str) -> str:
+        return os.path.join(self.root, digest[:2], digest[2:4], f"{digest}.{ext}")
+
+    def put(self, image: Dict[str, Any]) -> str:
+        """Store the image bytes unless the same content is already there. Returns the blob path."""
+        digest = image_hash(image)
+        path = self.path_for(digest, image.get("ext") or "bin")
+        is_new = not os.path.exists(path)
+        if is_new:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write then rename, so concurrent workers storing the same image never see a partial file
+            tmp_path = f"{path}.tmp-{uuid.uuid4().hex}"
+            with open(tmp_path, 'wb') as image_file:
+                image_file.write(image["image"])
+            os.replace(tmp_path, path)
+        self.stats.add(len(image["image"]), is_new)
+        return path
+
+    def store_all(self, images: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Store every image record as it passes through."""
+        for image in images:
+            self.put(image)
+            yield image
@@ -0,0 +1,91 @@
+import json
+import os
+import sqlite3
+from typing import Any, Dict, Optional, Set, Tuple
+from data_extractor.extractor import EXTRACTOR_VERSION
+from storage.extraction_cache import file_digest
+from storage.storage import document_key
+
+def file_fingerprint(file_path: str) -> Dict[str, Any]:
+    """Size, mtime, content hash and extractor version of a file, as recorded in the manifest."""
+    stat = os.stat(file_path)
+    return {
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "content_hash": file_digest(file_path),
+        "extractor_version": EXTRACTOR_VERSION
+    }
+
+def changed_pages(previous: Dict[int, str], current: Dict[int, str]) -> Tuple[Set[int], Set[int]]:
+    """(pages that are new or whose hash differs, pages that no longer exist) between two page_hashes() results."""
+    changed = {page for page, digest in current.items() if previous.get(page) != digest}
+    return changed, set(previous) - set(current)
+
+class IngestManifest:
+    """SQLite record of every ingested file, so a batch run can skip unchanged files and pages.
+
+    A file whose size and mtime match its entry is skipped without being read. Otherwise its
+    content hash is compared, and for PDF/PPTX the hash of every page.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("""
+        CREATE TABLE IF NOT EXISTS files (
+            path TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            content_hash TEXT NOT NULL,
+            extractor_version INTEGER NOT NULL,
+            page_hashes TEXT
+        )
+        """)
+        self.connection.commit()
+
+    @staticmethod
+    def _key(file_path: str) -> str:
+        return document_key(file_path)
+
+    def get(self, file_path: str) -> Optional[Dict[str, Any]]:
+        """The recorded fingerprint of a file, with page_hashes as {page_number: hash} or None."""
+        row = self.connection.execute(
+            "SELECT size, mtime_ns, content_hash, extractor_version, page_hashes FROM files WHERE path = ?",
+            (self._key(file_path),)
+        ).fetchone()
+        if row is None:
+            return None
+        size, mtime_ns, content_hash, extractor_version, page_hashes = row
+        return {
+            "size": size,
+            "mtime_ns": mtime_ns,
+            "content_hash": content_hash,
+            "extractor_version": extractor_version,
+            # JSON object keys are strings
+            "page_hashes": {int(page): digest for page, digest in json.loads(page_hashes).items()} if page_hashes else None
+        }
+
+    @staticmethod
+    def is_unchanged(entry: Optional[Dict[str, Any]], file_path: str) -> bool:
+        """Whether a file still has the size and mtime of its entry, checked with one stat call."""
+        if entry is None or entry["extractor_version"] != EXTRACTOR_VERSION:
+            return False
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return False
+        return stat.st_size == entry["size"] and stat.st_mtime_ns == entry["mtime_ns"]
+
+    def record(self, file_path: str, fingerprint: Dict[str, Any]):
+        """Save a file's fingerprint once its rows are stored."""
+        page_hashes = fingerprint.get("page_hashes")
+        self.connection.execute(
+            "REPLACE INTO files (path, size, mtime_ns, content_hash, extractor_version, page_hashes) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (self._key(file_path), fingerprint["size"], fingerprint["mtime_ns"], fingerprint["content_hash"],
+             fingerprint["extractor_version"], json.dumps(page_hashes) if page_hashes is not None else None)
+        )
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
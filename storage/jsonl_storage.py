@@ -0,0 +1,50 @@
+import json
+from collections.abc import Mapping
+from typing import Any, Dict, Iterable, Iterator
+from storage.storage import Storage
+from data_extractor.extractor import DataExtractor
+from metrics import Measurement
+
+DEFAULT_FLUSH_ROWS = 1000
+
+def record_row(record: Any) -> Dict[str, Any]:
+    """A record as a flat row: plain table paths become {"table_path": ...} and image bytes are left out."""
+    if not isinstance(record, Mapping):
+        return {"table_path": record}
+    return {key: value for key, value in record.items() if not isinstance(value, bytes)}
+
+class JSONLStorage(Storage):
+    """Write records as JSON Lines, one record per line, so files can be streamed, appended to and scanned."""
+
+    extension = "jsonl"
+
+    def __init__(self, extractor: DataExtractor, flush_rows: int = DEFAULT_FLUSH_ROWS):
+        self.extractor = extractor
+        self.flush_rows = flush_rows
+
+    def store_data(self, data: Iterable[Any], file_path: str, append: bool = False):
+        for _ in self.stream_data(data, file_path, append):
+            pass
+
+    def stream_data(self, records: Iterable[Any], file_path: str, append: bool = False) -> Iterator[Any]:
+        """Write records as they pass through, flushing the file every flush_rows records."""
+        measurement = Measurement("file_write")
+        with open(file_path, 'a' if append else 'w', encoding='utf-8') as file:
+            start_offset = file.tell()
+            for index, record in enumerate(records, start=1):
+                measurement.start()
+                file.write(json.dumps(record_row(record), ensure_ascii=False))
+                file.write('\n')
+                if index % self.flush_rows == 0:
+                    file.flush()
+                measurement.stop()
+                measurement.records = index
+                yield record
+            measurement.bytes_written = file.tell() - start_offset
+        measurement.record()
+
+    @staticmethod
+    def read_data(file_path: str) -> Iterator[Dict[str, Any]]:
+        with open(file_path, encoding='utf-8') as file:
+            for line in file:
+                yield json.loads(line)
@@ -0,0 +1,90 @@
+import json
+import os
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TYPE_CHECKING
+from storage.storage import Storage
+from storage.jsonl_storage import record_row
+from data_extractor.extractor import DataExtractor
+from metrics import Measurement
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+DEFAULT_ROW_GROUP_ROWS = 10000
+
+def _pyarrow():
+    # pyarrow is optional and only needed when Parquet output is requested
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("Parquet output requires pyarrow: pip install pyarrow") from None
+    return pyarrow
+
+def _columnar_row(record: Any) -> Dict[str, Any]:
+    # Nested dicts such as font_styles have document-specific keys, so they are stored as JSON text
+    return {key: json.dumps(value) if isinstance(value, dict) else value
+            for key, value in record_row(record).items()}
+
+def _widen_nulls(schema):
+    """Type columns that were empty in the first row group as strings, so later row groups still fit."""
+    pa = _pyarrow()
+    fields = []
+    for field in schema:
+        if pa.types.is_null(field.type):
+            field = field.with_type(pa.string())
+        elif pa.types.is_list(field.type) and pa.types.is_null(field.type.value_type):
+            field = field.with_type(pa.list_(pa.string()))
+        fields.append(field)
+    return pa.schema(fields)
+
+class ParquetStorage(Storage):
+    """Write records as a columnar Parquet file, one row group per row_group_rows records."""
+
+    extension = "parquet"
+
+    def __init__(self, extractor: DataExtractor, row_group_rows: int = DEFAULT_ROW_GROUP_ROWS):
+        self.extractor = extractor
+        self.row_group_rows = row_group_rows
+
+    def store_data(self, data: Iterable[Any], file_path: str):
+        for _ in self.stream_data(data, file_path):
+            pass
+
+    def stream_data(self, records: Iterable[Any], file_path: str) -> Iterator[Any]:
+        """Write records as they pass through, keeping at most one row group in memory."""
+        writer, rows = None, []
+        measurement = Measurement("file_write")
+        try:
+            for record in records:
+                rows.append(_columnar_row(record))
+                measurement.records += 1
+                if len(rows) >= self.row_group_rows:
+                    measurement.start()
+                    writer = self._write_row_group(writer, rows, file_path)
+                    measurement.stop()
+                    rows = []
+                yield record
+            measurement.start()
+            if rows or writer is None:
+                writer = self._write_row_group(writer, rows, file_path)
+        finally:
+            if writer is not None:
+                writer.close()
+        measurement.stop()
+        measurement.bytes_written = os.path.getsize(file_path)
+        measurement.record()
+
+    @staticmethod
+    def _write_row_group(writer, rows: List[Dict[str, Any]], file_path: str):
+        import pandas as pd
+        pa = _pyarrow()
+        table = pa.Table.from_pandas(pd.DataFrame(rows), preserve_index=False)
+        if writer is None:
+            writer = pa.parquet.ParquetWriter(file_path, _widen_nulls(table.schema))
+        writer.write_table(table.cast(writer.schema))
+        return writer
+
+    @staticmethod
+    def read_data(file_path: str, columns: Optional[List[str]] = None) -> "pd.DataFrame":
+        import pandas as pd
+        return pd.read_parquet(file_path, columns=columns)
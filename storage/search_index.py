@@ -0,0 +1,393 @@
+import json
+import math
+import mmap
+import os
+import re
+import uuid
+import zlib
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"\w+")
+PHRASE_PATTERN = re.compile(r'"([^"]*)"')
+SEGMENT_MAGIC = b"XTSEG001"
+MANIFEST_FILE = "manifest.json"
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+DEFAULT_MAX_BUFFERED_PAGES = 10000
+DEFAULT_MAX_SEGMENTS = 16
+MERGE_FACTOR = 8
+SNIPPET_CHARS = 80
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+def parse_query(query: str) -> Tuple[List[str], List[List[str]]]:
+    """Split a query into loose terms and "quoted phrases", both tokenized."""
+    phrases = [tokenize(phrase) for phrase in PHRASE_PATTERN.findall(query)]
+    terms = tokenize(PHRASE_PATTERN.sub(" ", query))
+    return terms, [phrase for phrase in phrases if phrase]
+
+def _write_segment(path: str, pages: List[Tuple[str, int, str, str]]):
+    """Write (file_name, page_number, text, headings) pages as one immutable segment file.
+
+    The file is an 8-byte magic, a JSON header and 8-byte aligned little-endian arrays,
+    so a reader can memory-map it and use the arrays in place with numpy.
+    """
+    file_ids, file_names = {}, []
+    doc_file, doc_len = [], []
+    vocabulary = {}
+    term_ids, docs, positions = [np.empty(0, dtype=np.int64)], [np.empty(0, dtype=np.int64)], [np.empty(0, dtype=np.int64)]
+    for doc, (file_name, page_number, text, headings) in enumerate(pages):
+        if file_name not in file_ids:
+            file_ids[file_name] = len(file_names)
+            file_names.append(file_name)
+        text_ids = [vocabulary.setdefault(token, len(vocabulary)) for token in tokenize(text)]
+        heading_ids = [vocabulary.setdefault(token, len(vocabulary)) for token in tokenize(headings)]
+        term_ids.append(np.array(text_ids + heading_ids, dtype=np.int64))
+        docs.append(np.full(len(text_ids) + len(heading_ids), doc, dtype=np.int64))
+        # Headings are indexed after the text with a gap, so they count twice but never join a phrase
+        positions.append(np.concatenate([np.arange(len(text_ids)),
+                                         np.arange(len(text_ids) + 1, len(text_ids) + 1 + len(heading_ids))]))
+        doc_file.append(file_ids[file_name])
+        doc_len.append(len(text_ids) + len(heading_ids))
+
+    # Python orders str by code point, which is also the order of their UTF-8 bytes
+    terms = sorted(vocabulary)
+    term_rank = np.empty(len(terms), dtype=np.int64)
+    term_rank[[vocabulary[term] for term in terms]] = np.arange(len(terms))
+
+    # One entry per token occurrence, sorted by term, then doc, then position
+    term_ids = term_rank[np.concatenate(term_ids)]
+    docs, positions = np.concatenate(docs), np.concatenate(positions)
+    order = np.lexsort((positions, docs, term_ids))
+    term_ids, docs, positions = term_ids[order], docs[order], positions[order]
+
+    # A posting starts wherever the (term, doc) pair changes
+    changes = np.ones(len(term_ids), dtype=bool)
+    changes[1:] = (term_ids[1:] != term_ids[:-1]) | (docs[1:] != docs[:-1])
+    starts = np.flatnonzero(changes)
+    post_offsets = np.searchsorted(term_ids[starts], np.arange(len(terms) + 1))
+    post_tfs = np.diff(np.append(starts, len(positions)))
+    term_bytes = [term.encode() for term in terms]
+
+    def blob(strings, compress=False):
+        encoded = [value if isinstance(value, bytes) else value.encode() for value in strings]
+        if compress:
+            # Stored text is only read back for snippets and merges
+            encoded = [zlib.compress(value, 1) for value in encoded]
+        offsets = np.zeros(len(encoded) + 1, dtype="<u8")
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        return offsets, np.frombuffer(b"".join(encoded), dtype="u1")
+
+    term_offsets, term_blob = blob(term_bytes)
+    file_offsets, file_blob = blob(file_names)
+    text_offsets, text_blob = blob([text for _, _, text, _ in pages], compress=True)
+    heading_offsets, heading_blob = blob([headings for _, _, _, headings in pages], compress=True)
+    sections = {
+        "doc_file": np.array(doc_file, dtype="<u4"),
+        "doc_page": np.array([page_number or 0 for _, page_number, _, _ in pages], dtype="<u4"),
+        "doc_len": np.array(doc_len, dtype="<u4"),
+        "term_offsets": term_offsets,
+        "term_blob": term_blob,
+        "post_offsets": post_offsets.astype("<u8"),
+        "post_docs": docs[starts].astype("<u4"),
+        "post_tfs": post_tfs.astype("<u4"),
+        # The positions of a term are contiguous, so one offset per term is enough
+        "pos_offsets": np.append(starts, len(positions))[post_offsets].astype("<u8"),
+        "positions": positions.astype("<u4"),
+        "file_offsets": file_offsets,
+        "file_blob": file_blob,
+        "text_offsets": text_offsets,
+        "text_blob": text_blob,
+        "heading_offsets": heading_offsets,
+        "heading_blob": heading_blob,
+    }
+
+    # Offsets are relative to the end of the header, so the header can be written first
+    layout, offset = {}, 0
+    for name, array in sections.items():
+        layout[name] = [offset, array.dtype.str, len(array)]
+        offset += -(-array.nbytes // 8) * 8
+    header = json.dumps({"docs": len(pages), "sections": layout}).encode()
+    header += b" " * (-len(header) % 8)
+
+    tmp_path = f"{path}.tmp-{uuid.uuid4().hex}"
+    with open(tmp_path, 'wb') as file:
+        file.write(SEGMENT_MAGIC)
+        file.write(np.array([len(header)], dtype="<u8").tobytes())
+        file.write(header)
+        for array in sections.values():
+            file.write(array.tobytes())
+            file.write(b"\0" * (-array.nbytes % 8))
+    os.replace(tmp_path, path)
+
+class _Segment:
+    """A memory-mapped segment; only the pages touched by a query are read from disk."""
+
+    def __init__(self, path: str):
+        self.name = os.path.basename(path)
+        with open(path, 'rb') as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:8] != SEGMENT_MAGIC:
+            raise ValueError(f"Not a search index segment: {path}")
+        header_len = int(np.frombuffer(self._mmap, dtype="<u8", count=1, offset=8)[0])
+        header = json.loads(self._mmap[16:16 + header_len])
+        base = 16 + header_len
+        self.docs = header["docs"]
+        self.arrays = {
+            name: np.frombuffer(self._mmap, dtype=dtype, count=count, offset=base + offset)
+            for name, (offset, dtype, count) in header["sections"].items()
+        }
+        self.live = np.ones(self.docs, dtype=bool)
+
+    def _bytes(self, blob: str, index: int) -> bytes:
+        offsets = self.arrays[f"{blob}_offsets"]
+        return bytes(self.arrays[f"{blob}_blob"][offsets[index]:offsets[index + 1]])
+
+    def _string(self, blob: str, index: int) -> str:
+        return self._bytes(blob, index).decode()
+
+    def file_names(self) -> List[str]:
+        return [self._string("file", index) for index in range(len(self.arrays["file_offsets"]) - 1)]
+
+    def file_name(self, doc: int) -> str:
+        return self._string("file", int(self.arrays["doc_file"][doc]))
+
+    def text(self, doc: int) -> str:
+        return zlib.decompress(self._bytes("text", doc)).decode()
+
+    def headings(self, doc: int) -> str:
+        return zlib.decompress(self._bytes("heading", doc)).decode()
+
+    def postings(self, term: str) -> Optional[Tuple[int, int, int]]:
+        """The [start, stop) range of a term's postings and where its positions start, or None.
+
+        The term is found by binary search over the sorted terms.
+        """
+        key = term.encode()
+        offsets, term_blob = self.arrays["term_offsets"], self.arrays["term_blob"]
+        low, high = 0, len(offsets) - 1
+        while low < high:
+            middle = (low + high) // 2
+            if bytes(term_blob[offsets[middle]:offsets[middle + 1]]) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low == len(offsets) - 1 or bytes(term_blob[offsets[low]:offsets[low + 1]]) != key:
+            return None
+        post_offsets = self.arrays["post_offsets"]
+        return int(post_offsets[low]), int(post_offsets[low + 1]), int(self.arrays["pos_offsets"][low])
+
+    def _position_keys(self, start: int, stop: int, positions_start: int) -> np.ndarray:
+        """doc << 32 | position for every occurrence of a term, in ascending order."""
+        docs = np.repeat(self.arrays["post_docs"][start:stop].astype(np.int64), self.arrays["post_tfs"][start:stop])
+        return (docs << 32) | self.arrays["positions"][positions_start:positions_start + len(docs)]
+
+    def phrase_docs(self, phrase: List[str]) -> np.ndarray:
+        """Docs containing the terms of a phrase at consecutive positions."""
+        ranges = [self.postings(term) for term in phrase]
+        if any(postings is None for postings in ranges):
+            return np.empty(0, dtype=np.int64)
+        # Keys of the phrase start that are followed by every next term, one position further each time
+        keys = self._position_keys(*ranges[0])
+        for postings in ranges[1:]:
+            keys = np.intersect1d(keys + 1, self._position_keys(*postings), assume_unique=True)
+        return np.unique(keys >> 32)
+
+    def close(self):
+        # numpy views keep the map alive until they are gone
+        self.arrays = {}
+        try:
+            self._mmap.close()
+        except BufferError:
+            pass
+
+class SearchIndex:
+    """Local inverted index over page text and headings with BM25 ranking and phrase queries.
+
+    Pages are buffered and written as immutable segments; the manifest lists the segments
+    and which segment holds the current pages of each file, so re-adding a file replaces
+    it. Small segments are merged once there are more than max_segments. There is one
+    writer at a time; readers pick up new segments with refresh().
+    """
+
+    def __init__(self, root: str, max_buffered_pages: int = DEFAULT_MAX_BUFFERED_PAGES,
+                 max_segments: int = DEFAULT_MAX_SEGMENTS):
+        self.root = root
+        self.max_buffered_pages = max_buffered_pages
+        self.max_segments = max_segments
+        self._pending = {}
+        self._pending_pages = 0
+        self._segments = {}
+        os.makedirs(root, exist_ok=True)
+        self.refresh()
+
+    # * manifest and segments
+    def _manifest_path(self) -> str:
+        return os.path.join(self.root, MANIFEST_FILE)
+
+    def refresh(self):
+        """Load the manifest and map the segments it lists."""
+        try:
+            with open(self._manifest_path()) as file:
+                self.manifest = json.load(file)
+        except FileNotFoundError:
+            self.manifest = {"segments": [], "files": {}}
+        for name in list(self._segments):
+            if name not in self.manifest["segments"]:
+                self._segments.pop(name).close()
+        for name in self.manifest["segments"]:
+            if name not in self._segments:
+                self._segments[name] = _Segment(os.path.join(self.root, name))
+
+        # A page is live when its file's current pages are in its segment
+        files = self.manifest["files"]
+        self.live_docs, total_length = 0, 0
+        for name, segment in self._segments.items():
+            file_live = np.array([files.get(file_name) == name for file_name in segment.file_names()], dtype=bool)
+            segment.live = file_live[segment.arrays["doc_file"]] if len(file_live) else segment.live
+            self.live_docs += int(segment.live.sum())
+            total_length += int(segment.arrays["doc_len"][segment.live].sum())
+        self.average_length = total_length / self.live_docs if self.live_docs else 0.0
+
+    def _save_manifest(self):
+        tmp_path = f"{self._manifest_path()}.tmp-{uuid.uuid4().hex}"
+        with open(tmp_path, 'w') as file:
+            json.dump(self.manifest, file)
+        os.replace(tmp_path, self._manifest_path())
+
+    def _new_segment_name(self) -> str:
+        return f"segment-{uuid.uuid4().hex}.idx"
+
+    # * indexing
+    def index_pages(self, document: str, pages: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Buffer extract_text() records of a document as they pass through.
+
+        Documents are keyed like the SQL storage (see document_key), so same-named files from
+        different folders are indexed side by side. The document's pages are only replaced in
+        the index once the iterator is exhausted, and they always end up in a single segment.
+        """
+        buffered = []
+        for page in pages:
+            buffered.append((document, page.get("page_number"), page.get("text") or "",
+                             "\n".join(page.get("headings") or [])))
+            yield page
+        self._pending_pages += len(buffered) - len(self._pending.get(document, ()))
+        self._pending[document] = buffered
+        if self._pending_pages >= self.max_buffered_pages:
+            self.commit()
+
+    def add_document(self, document: str, pages: Iterable[Dict[str, Any]]):
+        for _ in self.index_pages(document, pages):
+            pass
+
+    def remove_document(self, document: str):
+        """Drop a document from the index; its pages stay on disk until their segment is merged."""
+        self._pending_pages -= len(self._pending.pop(document, ()))
+        if self.manifest["files"].pop(document, None) is not None:
+            self._save_manifest()
+            self.refresh()
+
+    def commit(self):
+        """Write the buffered pages as a new segment and make them searchable."""
+        if not self._pending:
+            return
+        name = self._new_segment_name()
+        _write_segment(os.path.join(self.root, name), [page for pages in self._pending.values() for page in pages])
+        self.manifest["segments"].append(name)
+        for file_name in self._pending:
+            self.manifest["files"][file_name] = name
+        self._pending, self._pending_pages = {}, 0
+        self._save_manifest()
+        self.refresh()
+        if len(self.manifest["segments"]) > self.max_segments:
+            self.merge(MERGE_FACTOR)
+
+    def merge(self, count: Optional[int] = None):
+        """Rewrite the live pages of the `count` smallest segments (all by default) as one segment."""
+        by_size = sorted(self.manifest["segments"], key=lambda name: self._segments[name].docs)
+        merged = by_size[:count] if count else by_size
+        if len(merged) < 2:
+            return
+        pages = []
+        for name in merged:
+            segment = self._segments[name]
+            for doc in np.nonzero(segment.live)[0]:
+                pages.append((segment.file_name(doc), int(segment.arrays["doc_page"][doc]),
+                              segment.text(doc), segment.headings(doc)))
+        new_name = self._new_segment_name()
+        _write_segment(os.path.join(self.root, new_name), pages)
+        self.manifest["segments"] = [name for name in self.manifest["segments"] if name not in merged] + [new_name]
+        for file_name, name in self.manifest["files"].items():
+            if name in merged:
+                self.manifest["files"][file_name] = new_name
+        self._save_manifest()
+        self.refresh()
+        # Readers that still map the old files keep them alive until they refresh
+        for name in merged:
+            os.remove(os.path.join(self.root, name))
+
+    # * search
+    def _idf(self, term: str) -> float:
+        df = 0
+        for segment in self._segments.values():
+            postings = segment.postings(term)
+            if postings is not None:
+                df += int(segment.live[segment.arrays["post_docs"][postings[0]:postings[1]]].sum())
+        return math.log(1 + (self.live_docs - df + 0.5) / (df + 0.5))
+
+    def search(self, query: str, limit: int = 10) -> List[Tuple[str, int, str]]:
+        """Rank pages by BM25 over the query terms, keeping only pages that contain every "phrase".
+
+        Returns (document, page_number, snippet) for the best `limit` pages.
+        """
+        terms, phrases = parse_query(query)
+        scored_terms = sorted(set(terms) | {term for phrase in phrases for term in phrase})
+        if not scored_terms or not self.live_docs:
+            return []
+        idf = {term: self._idf(term) for term in scored_terms}
+
+        hits = []
+        for segment in self._segments.values():
+            scores = np.zeros(segment.docs)
+            post_docs, post_tfs = segment.arrays["post_docs"], segment.arrays["post_tfs"]
+            doc_len = segment.arrays["doc_len"]
+            for term in scored_terms:
+                postings = segment.postings(term)
+                if postings is None:
+                    continue
+                docs = post_docs[postings[0]:postings[1]]
+                tf = post_tfs[postings[0]:postings[1]].astype(np.float64)
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_len[docs] / self.average_length)
+                scores[docs] += idf[term] * tf * (BM25_K1 + 1) / (tf + norm)
+
+            matches = segment.live & (scores > 0)
+            for phrase in phrases:
+                phrase_match = np.zeros(segment.docs, dtype=bool)
+                phrase_match[segment.phrase_docs(phrase)] = True
+                matches &= phrase_match
+            docs = np.nonzero(matches)[0]
+            if len(docs) > limit:
+                docs = docs[np.argpartition(-scores[docs], limit)[:limit]]
+            hits.extend((float(scores[doc]), segment, int(doc)) for doc in docs)
+
+        hits.sort(key=lambda hit: -hit[0])
+        return [(segment.file_name(doc), int(segment.arrays["doc_page"][doc]),
+                 self._snippet(segment.text(doc), scored_terms))
+                for _, segment, doc in hits[:limit]]
+
+    @staticmethod
+    def _snippet(text: str, terms: List[str]) -> str:
+        """The text around the first occurrence of a query term."""
+        match = re.search(r"\b(" + "|".join(map(re.escape, terms)) + r")\b", text, re.IGNORECASE)
+        center = match.start() if match else 0
+        start = max(0, center - SNIPPET_CHARS // 2)
+        snippet = " ".join(text[start:start + SNIPPET_CHARS].split())
+        return ("..." if start else "") + snippet + ("..." if start + SNIPPET_CHARS < len(text) else "")
+
+    def close(self):
+        for segment in self._segments.values():
+            segment.close()
+        self._segments = {}
@@ -1,110 +1,616 @@
 import os
-from PIL import Image
-import mysql.connector
+import copy
+import threading
+from urllib.parse import urlsplit
+from contextlib import contextmanager
+import hashlib
 import json
+from data_extractor.records import ImageRef, RecordBatch
+from storage.image_store import DedupStats, image_hash
+from storage.connection_pool import ConnectionPool
+from metrics import measure
+
+DEFAULT_BATCH_SIZE = 500
+
+# Schemas already bootstrapped by this process, so later storages skip the DDL round trips
+_bootstrapped_schemas = set()
+_bootstrap_lock = threading.Lock()
 
 class SQLStorage:
-    def __init__(self, host, user, password):
-        self.connection = mysql.connector.connect(
-            host=host,
-            user=user,
-            password=password
-        )
+    def __init__(self, host, user, password, batch_size=DEFAULT_BATCH_SIZE, pool_size=None):
+        self._connect_args = {"host": host, "user": user, "password": password}
+        self._open_connections(pool_size)
+        self._init_session(batch_size)
+
+    def _open_connections(self, pool_size):
+        """Open the storage's own connection, and a pool of pool_size connections for sessions when set."""
+        self.db_name = None
+        self.pool = ConnectionPool(self._open_connection, pool_size) if pool_size else None
+        # Not taken from the pool, so holding this storage open never starves its sessions
+        self.connection = self._open_connection()
         self.cursor = self.connection.cursor()
 
+    def _open_connection(self):
+        # Imported on first connect, so SQLiteStorage and runs without a database never load the driver
+        import mysql.connector
+        if self.db_name:
+            return mysql.connector.connect(database=self.db_name, **self._connect_args)
+        return mysql.connector.connect(**self._connect_args)
+
+    def _acquire_connection(self):
+        return self.pool.acquire() if self.pool else self._open_connection()
+
+    def _release_connection(self, connection, discard=False):
+        if self.pool:
+            self.pool.release(connection, discard)
+        else:
+            connection.close()
+
+    def _init_session(self, batch_size):
+        self.batch_size = batch_size
+        self._in_transaction = False
+        # Image blobs known to be committed to image_blobs, so their bytes are not sent again
+        self._known_image_hashes = set()
+        # Committed documents.id by document key, so each document is looked up once
+        self._document_ids = {}
+        # Blobs and documents written by this storage's open transaction; other sessions only
+        # see them once they are committed, and a rollback forgets them
+        self._pending_image_hashes = set()
+        self._pending_document_ids = {}
+        self._cache_lock = threading.Lock()
+        self.image_stats = DedupStats()
+        self._stats_lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @contextmanager
+    def session(self):
+        """Hand out a storage with its own connection and cursor, for use by one worker thread.
+
+        The connection comes from the pool (or is opened) on entry and goes back on exit.
+        Sessions share the image hashes and document ids that any of them committed, and their
+        image stats are added to this storage's.
+        """
+        session = copy.copy(self)
+        session.connection = self._acquire_connection()
+        try:
+            session.cursor = session.connection.cursor()
+            session._init_session(self.batch_size)
+            session._known_image_hashes = self._known_image_hashes
+            session._document_ids = self._document_ids
+            session._cache_lock = self._cache_lock
+            if self.db_name:
+                session.use_database(self.db_name)
+            yield session
+        except Exception:
+            self._release_connection(session.connection, discard=True)
+            raise
+        session.cursor.close()
+        self._release_connection(session.connection)
+        with self._stats_lock:
+            self.image_stats.merge(session.image_stats.as_dict())
+
+    def _execute(self, query, params=()):
+        self.cursor.execute(query, params)
+
+    def _executemany(self, query, rows):
+        # mysql-connector rewrites INSERT ... VALUES into a single multi-row statement
+        self.cursor.executemany(query, rows)
+
+    def _write_many(self, query, rows):
+        with measure("sql_write") as measurement:
+            self._executemany(query, rows)
+            measurement.rows = len(rows)
+
+    def _commit_connection(self):
+        with measure("sql_commit"):
+            self.connection.commit()
+        with self._cache_lock:
+            self._known_image_hashes.update(self._pending_image_hashes)
+            self._document_ids.update(self._pending_document_ids)
+        self._pending_image_hashes.clear()
+        self._pending_document_ids.clear()
+
+    def _commit(self):
+        # Inside transaction() the commit happens once, when the block ends
+        if not self._in_transaction:
+            self._commit_connection()
+
+    @contextmanager
+    def transaction(self):
+        """Run every write inside the block as one transaction and roll it back on failure."""
+        outermost = not self._in_transaction
+        self._in_transaction = True
+        try:
+            yield self
+            if outermost:
+                self._commit_connection()
+        except Exception:
+            if outermost:
+                self.connection.rollback()
+                # Blobs and documents inserted in the rolled back transaction are gone again
+                self._pending_image_hashes.clear()
+                self._pending_document_ids.clear()
+            raise
+        finally:
+            if outermost:
+                self._in_transaction = False
+
+    def _batches(self, rows):
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    @staticmethod
+    def _fields(records, *names):
+        """The named fields of every record as tuples; a RecordBatch hands over its columns directly."""
+        if isinstance(records, RecordBatch):
+            return records.rows(*names)
+        return (tuple(record.get(name) for name in names) for record in records)
+
+    def _insert_many(self, query, rows):
+        """Insert rows from any iterable in batches of batch_size, all in one transaction."""
+        inserted = 0
+        with self.transaction():
+            for batch in self._batches(rows):
+                self._write_many(query, batch)
+                inserted += len(batch)
+        return inserted
+
 
     def create_database(self, db_name="python"):
         create_db_query = f"CREATE DATABASE IF NOT EXISTS {db_name};"
-        self.cursor.execute(create_db_query)
+        self._execute(create_db_query)
         self.connection.commit()
 
     def use_database(self, db_name="python"):
         use_db_query = f"USE {db_name};"
-        self.cursor.execute(use_db_query)
+        self._execute(use_db_query)
         self.connection.commit()
+        # Connections opened later for the pool or sessions select it on connect
+        self.db_name = db_name
 
-    def create_table_if_not_exists(self):
-        # Creating a table for text data, hyperlinks, and images
-        create_text_table_query = """
+    def _schema_key(self, db_name):
+        return (self._connect_args["host"], db_name)
+
+    def bootstrap(self, db_name="python"):
+        """Create the database and tables once per process; later calls only select the database."""
+        key = self._schema_key(db_name)
+        with _bootstrap_lock:
+            if key is not None and key in _bootstrapped_schemas:
+                self.use_database(db_name)
+                return
+            self.create_database(db_name)
+            self.use_database(db_name)
+            self.create_table_if_not_exists()
+            if key is not None:
+                _bootstrapped_schemas.add(key)
+
+    # * schema
+    # Every document has one row in documents, keyed by its path (see document_key); the other
+    # tables reference it by document_id. Paths can be longer than an index key, so the unique
+    # key is on their hash.
+    # Image bytes live in image_blobs only, so scanning extracted_images never touches a blob.
+    TABLES = {
+        "documents": """
+        CREATE TABLE IF NOT EXISTS documents (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            file_name VARCHAR(255) NOT NULL,
+            file_path TEXT NOT NULL,
+            path_hash CHAR(64) NOT NULL
+        );
+        """,
+        "extracted_text": """
         CREATE TABLE IF NOT EXISTS extracted_text (
             id INT AUTO_INCREMENT PRIMARY KEY,
-            file_name TEXT NOT NULL,
+            document_id INT NOT NULL,
             page_number INT,
-            text TEXT,
+            text MEDIUMTEXT,
             headings TEXT,
-            font_styles TEXT
+            font_styles TEXT,
+            FOREIGN KEY (document_id) REFERENCES documents (id) ON DELETE CASCADE
         );
-        """
-        create_links_table_query = """
+        """,
+        "extracted_links": """
         CREATE TABLE IF NOT EXISTS extracted_links (
             id INT AUTO_INCREMENT PRIMARY KEY,
-            file_name TEXT NOT NULL,
+            document_id INT NOT NULL,
             page_number INT,
             linked_text TEXT,
-            url TEXT
+            url TEXT,
+            domain VARCHAR(255),
+            FOREIGN KEY (document_id) REFERENCES documents (id) ON DELETE CASCADE
         );
-        """
-        create_images_table_query = """
+        """,
+        "image_blobs": """
+        CREATE TABLE IF NOT EXISTS image_blobs (
+            image_hash CHAR(64) PRIMARY KEY,
+            image LONGBLOB NOT NULL,
+            image_ext VARCHAR(10),
+            image_resolution VARCHAR(20),
+            image_size BIGINT
+        );
+        """,
+        "extracted_images": """
         CREATE TABLE IF NOT EXISTS extracted_images (
             id INT AUTO_INCREMENT PRIMARY KEY,
-            file_name TEXT NOT NULL,
+            document_id INT NOT NULL,
             page_number INT,
             image_path TEXT NOT NULL,
-            image LONGBLOB,
-            image_resolution VARCHAR(20),  
-            image_size BIGINT
+            image_resolution VARCHAR(20),
+            image_size BIGINT,
+            image_hash CHAR(64),
+            FOREIGN KEY (document_id) REFERENCES documents (id) ON DELETE CASCADE
         );
-        """
-        # Execute the table creation queries
-        self.cursor.execute(create_text_table_query)
-        self.cursor.execute(create_links_table_query)
-        self.cursor.execute(create_images_table_query)
+        """,
+    }
+
+    # name: (table, kind, [(column, prefix length)]). Unique keys turn REPLACE INTO into an upsert.
+    # Links have none: a page may link to the same url twice, and a document's rows are deleted
+    # before it is stored again (see delete_pages). TEXT columns need a prefix length in MySQL indexes.
+    INDEXES = {
+        "uq_document_path": ("documents", "UNIQUE", [("path_hash", None)]),
+        "uq_text_document_page": ("extracted_text", "UNIQUE", [("document_id", None), ("page_number", None)]),
+        "ix_link_document_page": ("extracted_links", "INDEX", [("document_id", None), ("page_number", None)]),
+        "ix_link_domain": ("extracted_links", "INDEX", [("domain", None), ("document_id", None)]),
+        "uq_image_document_path": ("extracted_images", "UNIQUE", [("document_id", None), ("image_path", 255)]),
+        "ix_image_page": ("extracted_images", "INDEX", [("document_id", None), ("page_number", None)]),
+        "ix_image_hash": ("extracted_images", "INDEX", [("image_hash", None)]),
+        "ft_text": ("extracted_text", "FULLTEXT", [("text", None), ("headings", None)]),
+    }
+
+    def create_table_if_not_exists(self):
+        # Tables from before the documents table are rebuilt first, keeping their rows
+        legacy_tables = self._legacy_tables()
+        for table in legacy_tables:
+            self._execute(f"ALTER TABLE {table} RENAME TO {table}_legacy")
+
+        for query in self.TABLES.values():
+            self._execute(query)
+        for name, (table, kind, columns) in self.INDEXES.items():
+            self._ensure_index(name, table, kind, columns)
+
+        if legacy_tables:
+            self._migrate_legacy_tables(legacy_tables)
         self.connection.commit()
 
-    def insert_data(self, file_name, page_number, text, headings, font_styles):
-            # Ensure that lists or dictionaries are converted to JSON strings before insertion
-            if isinstance(text, (list, dict)):
-                text = json.dumps(text)  # Convert list or dict to JSON string
-            if isinstance(headings, (list, dict)):
-                headings = json.dumps(headings)  # Convert list or dict to JSON string
-            if isinstance(font_styles, (list, dict)):
-                font_styles = json.dumps(font_styles)  # Convert list or dict to JSON string
-
-            query = """
-            INSERT INTO extracted_text (file_name, page_number, text, headings, font_styles)
-            VALUES (%s, %s, %s, %s, %s)
-            """
-            self.cursor.execute(query, (file_name, page_number, text, headings, font_styles))
-            self.connection.commit()
+    def _table_columns(self, table):
+        self._execute(f"SHOW COLUMNS FROM {table}")
+        return [row[0] for row in self.cursor.fetchall()]
+
+    def _table_exists(self, table):
+        self._execute("SHOW TABLES LIKE %s", (table,))
+        return bool(self.cursor.fetchall())
 
-    def insert_link(self, file_name, page_number, linked_text, url):
-        query = """
-        INSERT INTO extracted_links (file_name, page_number, linked_text, url)
-        VALUES (%s, %s, %s, %s)
+    def _ensure_index(self, name, table, kind, columns):
+        self._execute(f"SHOW INDEX FROM {table} WHERE Key_name = %s", (name,))
+        if self.cursor.fetchall():
+            return
+        key_columns = ", ".join(f"{column}({length})" if length else column for column, length in columns)
+        key = {"UNIQUE": "UNIQUE KEY", "INDEX": "INDEX", "FULLTEXT": "FULLTEXT INDEX"}[kind]
+        self._execute(f"ALTER TABLE {table} ADD {key} {name} ({key_columns})")
+
+    # * migration from the file_name-keyed schema
+    LEGACY_TABLES = ("extracted_text", "extracted_links", "extracted_images")
+
+    def _legacy_tables(self):
+        """Child tables that still key their rows by file_name instead of document_id."""
+        return [table for table in self.LEGACY_TABLES
+                if self._table_exists(table) and "document_id" not in self._table_columns(table)]
+
+    # Column that orders the rows of a table
+    ROW_ID = "id"
+
+    def _legacy_rows(self, table, columns):
+        """Rows of a legacy table, read batch_size at a time so the writes can use the same connection."""
+        last_id = 0
+        while True:
+            self._execute(f"SELECT {self.ROW_ID}, {columns} FROM {table} WHERE {self.ROW_ID} > %s "
+                          f"ORDER BY {self.ROW_ID} LIMIT {int(self.batch_size)}", (last_id,))
+            rows = self.cursor.fetchall()
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            for row in rows:
+                yield row[1:]
+
+    def _migrate_legacy_tables(self, legacy_tables):
+        for table in legacy_tables:
+            self._execute(f"SELECT DISTINCT file_name FROM {table}_legacy")
+            for (file_name,) in self.cursor.fetchall():
+                self._document_id(file_name)
+
+        with self.transaction():
+            if "extracted_text" in legacy_tables:
+                # Ordered so that the newest of any duplicate rows wins
+                self._execute(f"""
+                REPLACE INTO extracted_text (document_id, page_number, text, headings, font_styles)
+                SELECT documents.id, legacy.page_number, legacy.text, legacy.headings, legacy.font_styles
+                FROM extracted_text_legacy legacy JOIN documents ON documents.file_path = legacy.file_name
+                ORDER BY legacy.{self.ROW_ID}
+                """)
+            if "extracted_links" in legacy_tables:
+                # The domain column is new, so it is filled in from the url on the way
+                rows = self._legacy_rows("extracted_links_legacy", "file_name, page_number, linked_text, url")
+                self._insert_many(self.INSERT_LINK_QUERY, (self._link_params(*row) for row in rows))
+            if "extracted_images" in legacy_tables:
+                # Legacy rows carry their bytes, which move into image_blobs here
+                rows = self._legacy_rows(
+                    "extracted_images_legacy", "file_name, page_number, image_path, image_resolution, image_size, image"
+                )
+                for file_name, page_number, image_path, resolution, size, image in rows:
+                    if image is None:
+                        # Without the bytes there is no blob to reference
+                        self._write_many(self.INSERT_IMAGE_QUERY, [(self._document_id(file_name), page_number,
+                                                                     image_path, resolution, size, None)])
+                        continue
+                    width, _, height = (resolution or "").partition(" x ")
+                    self._insert_image_batch(file_name, [{
+                        "page_number": page_number,
+                        "image_path": image_path,
+                        "image": image,
+                        "ext": os.path.splitext(image_path)[1].lstrip('.'),
+                        "width": int(width) if width else None,
+                        "height": int(height) if height else None,
+                        "size": size
+                    }])
+
+        for table in legacy_tables:
+            self._execute(f"DROP TABLE {table}_legacy")
+
+    INSERT_DOCUMENT_QUERY = "INSERT IGNORE INTO documents (file_name, file_path, path_hash) VALUES (%s, %s, %s)"
+    INSERT_TEXT_QUERY = """
+    REPLACE INTO extracted_text (document_id, page_number, text, headings, font_styles)
+    VALUES (%s, %s, %s, %s, %s)
+    """
+    INSERT_LINK_QUERY = """
+    INSERT INTO extracted_links (document_id, page_number, linked_text, url, domain)
+    VALUES (%s, %s, %s, %s, %s)
+    """
+    INSERT_IMAGE_QUERY = """
+    REPLACE INTO extracted_images (document_id, page_number, image_path, image_resolution, image_size, image_hash)
+    VALUES (%s, %s, %s, %s, %s, %s)
+    """
+    INSERT_IMAGE_BLOB_QUERY = """
+    INSERT IGNORE INTO image_blobs (image_hash, image, image_ext, image_resolution, image_size)
+    VALUES (%s, %s, %s, %s, %s)
+    """
+
+    @staticmethod
+    def _to_json(value):
+        # Ensure that lists or dictionaries are converted to JSON strings before insertion
+        if isinstance(value, (list, dict)):
+            return json.dumps(value)
+        return value
+
+    @staticmethod
+    def _path_hash(document):
+        # File names may carry undecodable bytes, which os functions keep as surrogates
+        return hashlib.sha256(document.encode("utf-8", "surrogateescape")).hexdigest()
+
+    def _document_id(self, document):
+        """The documents.id of a document key (see document_key), adding the document on first use."""
+        document_id = self._document_ids.get(document) or self._pending_document_ids.get(document)
+        if document_id is None:
+            path_hash = self._path_hash(document)
+            file_name = os.path.basename(document)
+            self._execute(self.INSERT_DOCUMENT_QUERY, (file_name, document, path_hash))
+            if self.cursor.rowcount == 1 and file_name != document:
+                self._replace_legacy_document(file_name)
+            self._execute("SELECT id FROM documents WHERE path_hash = %s", (path_hash,))
+            document_id = self.cursor.fetchone()[0]
+            self._pending_document_ids[document] = document_id
+        return document_id
+
+    def _replace_legacy_document(self, file_name):
+        """Delete the rows migrated under a bare file name once a file of that name is stored by path.
+
+        The legacy tables only had file names, so migrated documents are keyed by them.
         """
-        self.cursor.execute(query, (file_name, page_number, linked_text, url))
-        self.connection.commit()
+        self._execute("DELETE FROM documents WHERE path_hash = %s", (self._path_hash(file_name),))
+        if self.cursor.rowcount:
+            with self._cache_lock:
+                self._document_ids.pop(file_name, None)
+            self._pending_document_ids.pop(file_name, None)
 
-    def insert_image(self, file_name, image_path, page_number):
-            # Open the image and get its resolution
-            with Image.open(image_path) as img:
-                width, height = img.size  # Get image width and height
-                resolution = f"{width} x {height}"  # Format resolution as 'a x b'
+    def _text_params(self, document, page_number, text, headings, font_styles):
+        return (self._document_id(document), page_number, self._to_json(text), self._to_json(headings), self._to_json(font_styles))
 
-            # Get the file size in bytes
-            image_size = os.path.getsize(image_path)
+    @staticmethod
+    def image_record_from_file(image_path, page_number):
+        """Build an image record for an image that only exists on disk."""
+        from PIL import Image
+        # Open the image and get its resolution (Pillow only reads the header here)
+        with Image.open(image_path) as img:
+            width, height = img.size  # Get image width and height
 
-            with open(image_path, 'rb') as image_file:
-                image_blob = image_file.read()
+        with open(image_path, 'rb') as image_file:
+            image_blob = image_file.read()
 
-            # Insert the image data along with resolution and size into the database
-            query = """
-            INSERT INTO extracted_images (file_name, page_number, image_path, image_resolution, image_size, image)
-            VALUES (%s, %s, %s, %s, %s, %s)
-            """
-            self.cursor.execute(query, (file_name, page_number, image_path, resolution, image_size, image_blob))
-            self.connection.commit()
+        return ImageRef(
+            page_number=page_number,
+            image_path=image_path,
+            image=image_blob,
+            image_hash=hashlib.sha256(image_blob).hexdigest(),
+            ext=os.path.splitext(image_path)[1].lstrip('.'),
+            width=width,
+            height=height,
+            size=len(image_blob)
+        )
+
+    @staticmethod
+    def _resolution(image):
+        if image.get('width') and image.get('height'):
+            return f"{image['width']} x {image['height']}"  # Format resolution as 'a x b'
+        return None
+
+    def _link_params(self, document, page_number, linked_text, url):
+        # The host is stored on its own so links to a domain can be found through an index
+        domain = urlsplit(url).hostname if url else None
+        return (self._document_id(document), page_number, linked_text, url, domain)
+
+    def _image_params(self, document, image):
+        # Extractor records already carry the bytes, size and header resolution
+        return (self._document_id(document), image.get('page_number'), image.get('image_path'), self._resolution(image),
+                image.get('size'), image_hash(image))
+
+    def _missing_image_hashes(self, hashes):
+        """Hashes from the batch whose blob is not in image_blobs yet."""
+        unknown = [digest for digest in hashes
+                   if digest not in self._known_image_hashes and digest not in self._pending_image_hashes]
+        if not unknown:
+            return set()
+        placeholders = ", ".join(["%s"] * len(unknown))
+        self._execute(f"SELECT image_hash FROM image_blobs WHERE image_hash IN ({placeholders})", unknown)
+        stored = {row[0] for row in self.cursor.fetchall()}
+        # Not ours, so another connection committed them
+        with self._cache_lock:
+            self._known_image_hashes.update(stored)
+        return set(unknown) - stored
+
+    def _insert_image_batch(self, document, images):
+        """Insert the occurrence rows of a batch, sending each blob only if the database does not have it."""
+        by_hash = {}
+        for image in images:
+            by_hash.setdefault(image_hash(image), image)
+        missing = self._missing_image_hashes(list(by_hash))
+
+        blob_rows = [
+            (digest, by_hash[digest]['image'], by_hash[digest].get('ext'),
+             self._resolution(by_hash[digest]), by_hash[digest].get('size'))
+            for digest in missing
+        ]
+        if blob_rows:
+            self._write_many(self.INSERT_IMAGE_BLOB_QUERY, blob_rows)
+        self._write_many(self.INSERT_IMAGE_QUERY, [self._image_params(document, image) for image in images])
+
+        for image in images:
+            digest = image_hash(image)
+            self.image_stats.add(len(image['image']), digest in missing)
+            missing.discard(digest)
+        self._pending_image_hashes.update(by_hash)
+
+    def insert_data(self, document, page_number, text, headings, font_styles):
+        with measure("sql_write") as measurement:
+            self._execute(self.INSERT_TEXT_QUERY, self._text_params(document, page_number, text, headings, font_styles))
+            measurement.rows = 1
+        self._commit()
+
+    def insert_link(self, document, page_number, linked_text, url):
+        with measure("sql_write") as measurement:
+            self._execute(self.INSERT_LINK_QUERY, self._link_params(document, page_number, linked_text, url))
+            measurement.rows = 1
+        self._commit()
+
+    def insert_image(self, document, image_path, page_number, image=None):
+        """Insert one image. Without an extractor image record the file at image_path is read instead."""
+        if image is None:
+            image = self.image_record_from_file(image_path, page_number)
+        # Insert the image data along with resolution and size into the database
+        self._insert_image_batch(document, [image])
+        self._commit()
+
+    # * bulk inserts, one transaction per call (or per enclosing transaction() block)
+    def insert_text_rows(self, document, rows):
+        """Insert extract_text() records, or a RecordBatch of them, in batches. Returns the number of rows inserted."""
+        return self._insert_many(self.INSERT_TEXT_QUERY, (
+            self._text_params(document, *fields)
+            for fields in self._fields(rows, 'page_number', 'text', 'headings', 'font_styles')
+        ))
+
+    def insert_links(self, document, links):
+        """Insert extract_links() records, or a RecordBatch of them, in batches. Returns the number of rows inserted."""
+        return self._insert_many(self.INSERT_LINK_QUERY, (
+            self._link_params(document, *fields) for fields in self._fields(links, 'page_number', 'linked_text', 'url')
+        ))
+
+    def insert_images(self, document, images):
+        """Insert extract_images() records in batches. Returns the number of rows inserted."""
+        inserted = 0
+        with self.transaction():
+            for batch in self._batches(images):
+                self._insert_image_batch(document, batch)
+                inserted += len(batch)
+        return inserted
+
+    # The rows keyed by (document, page) that are replaced when a document is ingested again
+    PAGE_TABLES = ("extracted_text", "extracted_links", "extracted_images")
+
+    def delete_pages(self, document, page_numbers=None):
+        """Delete the text, link and image rows of some pages of a document, or of every page when
+        page_numbers is None. Image blobs stay, other documents may share them. Returns the rows deleted."""
+        deleted = 0
+        with self.transaction(), measure("sql_delete") as measurement:
+            document_id = self._document_id(document)
+            for table in self.PAGE_TABLES:
+                if page_numbers is None:
+                    self._execute(f"DELETE FROM {table} WHERE document_id = %s", (document_id,))
+                    deleted += self.cursor.rowcount
+                    continue
+                for batch in self._batches(sorted(page_numbers)):
+                    placeholders = ", ".join(["%s"] * len(batch))
+                    self._execute(f"DELETE FROM {table} WHERE document_id = %s AND page_number IN ({placeholders})",
+                                  [document_id] + batch)
+                    deleted += self.cursor.rowcount
+            measurement.rows = deleted
+        return deleted
+
+    # * queries, all served by the indexes in INDEXES
+    def document_pages(self, document):
+        """(page_number, text) of every page of a document, in page order."""
+        self._execute(
+            "SELECT extracted_text.page_number, extracted_text.text FROM documents "
+            "JOIN extracted_text ON extracted_text.document_id = documents.id "
+            "WHERE documents.path_hash = %s ORDER BY extracted_text.page_number",
+            (self._path_hash(document),)
+        )
+        return self.cursor.fetchall()
+
+    def links_to_domain(self, domain):
+        """(file_path, page_number, url) of every link to a host name."""
+        self._execute(
+            "SELECT documents.file_path, extracted_links.page_number, extracted_links.url FROM extracted_links "
+            "JOIN documents ON documents.id = extracted_links.document_id WHERE extracted_links.domain = %s",
+            (domain.lower(),)
+        )
+        return self.cursor.fetchall()
+
+    def document_images(self, document):
+        """(page_number, image_path, image_hash) of every image occurrence in a document, without the bytes."""
+        self._execute(
+            "SELECT extracted_images.page_number, extracted_images.image_path, extracted_images.image_hash "
+            "FROM documents JOIN extracted_images ON extracted_images.document_id = documents.id "
+            "WHERE documents.path_hash = %s ORDER BY extracted_images.page_number",
+            (self._path_hash(document),)
+        )
+        return self.cursor.fetchall()
+
+    SEARCH_TEXT_QUERY = (
+        "SELECT documents.file_path, extracted_text.page_number FROM extracted_text "
+        "JOIN documents ON documents.id = extracted_text.document_id "
+        "WHERE MATCH (extracted_text.text, extracted_text.headings) AGAINST (%s IN NATURAL LANGUAGE MODE)"
+    )
+
+    def search_text(self, words):
+        """(file_path, page_number) of the pages matching a full-text search."""
+        self._execute(self.SEARCH_TEXT_QUERY, (words,))
+        return self.cursor.fetchall()
+
+    def image_dedup_stats(self):
+        """Image occurrences written by this storage against the blobs it actually had to insert."""
+        return self.image_stats.as_dict()
 
     def close(self):
         self.cursor.close()
         self.connection.close()
+        if self.pool:
+            self.pool.close()
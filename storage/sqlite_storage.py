@@ -0,0 +1,79 @@
+import sqlite3
+from contextlib import contextmanager
+from storage.sql_storage import SQLStorage, DEFAULT_BATCH_SIZE
+
+# Seconds a connection waits for another connection's write lock before failing
+BUSY_TIMEOUT = 30
+
+class SQLiteStorage(SQLStorage):
+    """Local SQLite stand-in for SQLStorage, used for benchmarks and runs without a MySQL server."""
+
+    def __init__(self, database=":memory:", batch_size=DEFAULT_BATCH_SIZE, pool_size=None):
+        if database == ":memory:" and pool_size:
+            raise ValueError("An in-memory SQLite database cannot be pooled; use a database file")
+        self.database = database
+        self._open_connections(pool_size)
+        self._init_session(batch_size)
+
+    def _open_connection(self):
+        # A pooled connection moves between worker threads, but is only used by one at a time
+        connection = sqlite3.connect(self.database, timeout=BUSY_TIMEOUT, check_same_thread=False)
+        # SQLite only enforces the documents foreign keys when asked to, per connection
+        connection.execute("PRAGMA foreign_keys = ON")
+        return connection
+
+    def _schema_key(self, db_name):
+        # Every in-memory database starts empty
+        return None if self.database == ":memory:" else self.database
+
+    @contextmanager
+    def session(self):
+        if self.database == ":memory:":
+            raise ValueError("An in-memory SQLite database cannot be shared between sessions; use a database file")
+        with super().session() as session:
+            yield session
+
+    # Tables from before the documents schema declared "id INT", which SQLite does not fill in
+    ROW_ID = "rowid"
+
+    # SQLite has no FULLTEXT index, so search falls back to a scan
+    SEARCH_TEXT_QUERY = (
+        "SELECT documents.file_path, extracted_text.page_number FROM extracted_text "
+        "JOIN documents ON documents.id = extracted_text.document_id "
+        "WHERE instr(extracted_text.text, %s) > 0"
+    )
+
+    @staticmethod
+    def _sqlite_query(query):
+        # SQLStorage queries use the MySQL "%s" paramstyle and dialect
+        return (query.replace("%s", "?")
+                .replace("INSERT IGNORE", "INSERT OR IGNORE")
+                .replace("INT AUTO_INCREMENT PRIMARY KEY", "INTEGER PRIMARY KEY"))
+
+    def _execute(self, query, params=()):
+        self.cursor.execute(self._sqlite_query(query), params)
+
+    def _executemany(self, query, rows):
+        self.cursor.executemany(self._sqlite_query(query), rows)
+
+    def create_database(self, db_name="python"):
+        # A SQLite file is a single database
+        pass
+
+    def use_database(self, db_name="python"):
+        pass
+
+    def _table_columns(self, table):
+        self._execute(f"PRAGMA table_info({table})")
+        return [row[1] for row in self.cursor.fetchall()]
+
+    def _table_exists(self, table):
+        self._execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = %s", (table,))
+        return bool(self.cursor.fetchall())
+
+    def _ensure_index(self, name, table, kind, columns):
+        if kind == "FULLTEXT":
+            return
+        key_columns = ", ".join(column for column, _ in columns)
+        unique = "UNIQUE " if kind == "UNIQUE" else ""
+        self._execute(f"CREATE {unique}INDEX IF NOT EXISTS {name} ON {table} ({key_columns})")
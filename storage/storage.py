@@ -1,6 +1,11 @@
 import abc
+import os
 from typing import Any
 
+def document_key(file_path: str) -> str:
+    """The key a document is stored under: its absolute path, so same-named files in different folders stay apart."""
+    return os.path.abspath(file_path)
+
 class Storage(abc.ABC):
     @abc.abstractmethod
     def store_data(self, data: Any):
@@ -0,0 +1,35 @@
+import hashlib
+import os
+import sys
+import fitz
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The modules are imported from the repository root, as the scripts do
+sys.path.insert(0, ROOT)
+
+from data_extractor.records import ImageRef, PageText
+
+@pytest.fixture
+def make_image():
+    def make(data=b"\x89PNG image bytes", page_number=1, image_path="image_page_1_1.png"):
+        return ImageRef(page_number, image_path, data, hashlib.sha256(data).hexdigest(), "png", 4, 3, len(data))
+    return make
+
+@pytest.fixture
+def make_page():
+    def make(page_number=1, text="page text"):
+        return PageText(page_number, text, ["Heading"], {"bold": 1})
+    return make
+
+@pytest.fixture
+def multi_page_pdf(tmp_path):
+    """sample.pdf three times over (9 pages), with a table on pages 3, 6 and 9."""
+    path = str(tmp_path / "long.pdf")
+    pdf_document = fitz.open()
+    for _ in range(3):
+        with fitz.open(os.path.join(ROOT, "sample.pdf")) as sample:
+            pdf_document.insert_pdf(sample)
+    pdf_document.save(path)
+    pdf_document.close()
+    return path
@@ -0,0 +1,117 @@
+import asyncio
+import json
+import os
+import shutil
+import daemon
+from daemon import DONE_FOLDER, FAILED_FOLDER, IngestDaemon
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+async def request(server, method, path, payload=None):
+    """Send one HTTP request to a test server; returns (status, headers, JSON body)."""
+    host, port = server.sockets[0].getsockname()[:2]
+    reader, writer = await asyncio.open_connection(host, port)
+    body = json.dumps(payload).encode() if payload is not None else b""
+    writer.write(f"{method} {path} HTTP/1.1\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b"\r\n\r\n")
+    status_line, *header_lines = head.decode().split("\r\n")
+    headers = dict(line.split(": ", 1) for line in header_lines)
+    return int(status_line.split(" ")[1]), headers, json.loads(body)
+
+def serve_http(ingest_daemon, scenario):
+    async def main():
+        server = await asyncio.start_server(ingest_daemon._handle_http, "127.0.0.1", 0)
+        async with server:
+            return await scenario(server)
+    return asyncio.run(main())
+
+def run_until(ingest_daemon, finished, timeout=60):
+    """Run the daemon until finished() is true, then stop it and wait for it to drain."""
+    async def main():
+        running = asyncio.create_task(ingest_daemon.run())
+        try:
+            async with asyncio.timeout(timeout):
+                while not finished():
+                    await asyncio.sleep(0.05)
+        finally:
+            ingest_daemon.stop()
+            await running
+    asyncio.run(main())
+
+def test_full_queue_answers_503_with_retry_after(tmp_path):
+    file_path = tmp_path / "report.pdf"
+    shutil.copy(os.path.join(ROOT, "sample.pdf"), file_path)
+    ingest_daemon = IngestDaemon(output_root=str(tmp_path), queue_size=1, allowed_roots=[str(tmp_path)])
+
+    async def scenario(server):
+        accepted = await request(server, "POST", "/jobs", {"path": str(file_path)})
+        rejected = await request(server, "POST", "/jobs", {"path": str(file_path)})
+        return accepted, rejected
+
+    (status, _, job), (rejected_status, headers, body) = serve_http(ingest_daemon, scenario)
+    assert (status, job["status"]) == (202, "queued")
+    assert rejected_status == 503 and headers["Retry-After"] == "1"
+    assert body["queue_depth"] == 1 and not body["accepting"]
+    assert ingest_daemon.counts["rejected"] == 1
+
+def test_paths_outside_the_allowed_roots_are_forbidden(tmp_path):
+    allowed = tmp_path / "allowed"
+    allowed.mkdir()
+    shutil.copy(os.path.join(ROOT, "sample.pdf"), tmp_path / "outside.pdf")
+    # A link inside the root does not make the file it points to allowed
+    os.symlink(tmp_path / "outside.pdf", allowed / "link.pdf")
+    ingest_daemon = IngestDaemon(output_root=str(tmp_path), allowed_roots=[str(allowed)])
+
+    async def scenario(server):
+        return [await request(server, "POST", "/jobs", {"path": path})
+                for path in ("/etc/passwd", str(tmp_path / "outside.pdf"), str(allowed / "link.pdf"),
+                             str(allowed / "missing.pdf"))]
+
+    statuses = [status for status, _, _ in serve_http(ingest_daemon, scenario)]
+    assert statuses == [403, 403, 403, 404]
+    assert ingest_daemon.counts["submitted"] == 0
+
+def test_inbox_files_move_to_done_or_failed(tmp_path):
+    inbox = tmp_path / "inbox"
+    inbox.mkdir()
+    shutil.copy(os.path.join(ROOT, "sample.pdf"), inbox / "good.pdf")
+    (inbox / "broken.pdf").write_bytes(b"not a pdf")
+    ingest_daemon = IngestDaemon(output_root=str(tmp_path / "output"), inbox=str(inbox), workers=1,
+                                 poll_interval=0.05)
+    run_until(ingest_daemon, lambda: ingest_daemon.counts["done"] + ingest_daemon.counts["failed"] == 2)
+    assert os.listdir(inbox / DONE_FOLDER) == ["good.pdf"]
+    assert os.listdir(inbox / FAILED_FOLDER) == ["broken.pdf"]
+    assert sorted(entry for entry in os.listdir(inbox)) == [DONE_FOLDER, FAILED_FOLDER]
+    assert [job.status for job in ingest_daemon.jobs.values()] == ["failed", "done"]
+
+def crash_first_worker(file_path, output_root, *args):
+    # Runs in the worker process, forked after the test patched daemon.process_file
+    marker = os.path.join(output_root, "crashed")
+    if not os.path.exists(marker):
+        open(marker, "w").close()
+        os._exit(1)
+    return process_file(file_path, output_root, *args)
+
+process_file = daemon.process_file
+
+def test_pool_is_replaced_and_the_job_retried_after_a_worker_dies(tmp_path, monkeypatch):
+    monkeypatch.setattr(daemon, "process_file", crash_first_worker)
+    file_path = tmp_path / "report.pdf"
+    shutil.copy(os.path.join(ROOT, "sample.pdf"), file_path)
+    ingest_daemon = IngestDaemon(output_root=str(tmp_path), workers=1, allowed_roots=[str(tmp_path)])
+    pools = []
+
+    def finished():
+        if not pools and ingest_daemon.process_pool is not None:
+            pools.append(ingest_daemon.process_pool)
+            ingest_daemon.submit(str(file_path))
+        return ingest_daemon.counts["done"] + ingest_daemon.counts["failed"] == 1
+
+    run_until(ingest_daemon, finished)
+    [job] = ingest_daemon.jobs.values()
+    assert (job.status, job.retries) == ("done", 1)
+    assert os.path.exists(tmp_path / "crashed")
+    assert ingest_daemon.process_pool is not pools[0]
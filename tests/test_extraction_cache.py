@@ -0,0 +1,60 @@
+import os
+from data_extractor.records import TableRef
+from storage.extraction_cache import ExtractionCache
+
+def test_key_depends_on_the_extractor_options(tmp_path):
+    path = tmp_path / "report.pdf"
+    path.write_bytes(b"%PDF-1.7 content")
+    pymupdf = ExtractionCache.key_for(str(path), {"pdf_table_engine": "pymupdf"})
+    tabula = ExtractionCache.key_for(str(path), {"pdf_table_engine": "tabula"})
+    assert pymupdf != tabula
+    assert pymupdf == ExtractionCache.key_for(str(path), {"pdf_table_engine": "pymupdf"})
+    assert ExtractionCache.key_for(str(path)).startswith(pymupdf.rsplit("-", 1)[0])
+
+class StubExtractor:
+    """Yields one image and writes one table CSV, as an extractor would."""
+
+    def __init__(self, file_path, make_image):
+        self.file_path = file_path
+        self.image = make_image(b"image of this document", image_path="image_page_1_1.png")
+
+    def iter_text(self):
+        return iter(())
+
+    def iter_links(self):
+        return iter(())
+
+    def iter_images(self, output_folder=None):
+        yield self.image
+
+    def iter_tables(self, output_folder):
+        table_path = os.path.join(output_folder, "table_pdf_1.csv")
+        with open(table_path, "w") as file:
+            file.write("table of this document\n")
+        yield TableRef(table_path, 1)
+
+def test_hit_overwrites_same_named_files_of_other_documents(tmp_path, make_image):
+    path = tmp_path / "report.pdf"
+    path.write_bytes(b"%PDF-1.7 content")
+    cache = ExtractionCache(str(tmp_path / "cache"))
+    key = cache.key_for(str(path))
+    first_output = tmp_path / "first"
+    first_output.mkdir()
+    recorder = cache.recorder(key, StubExtractor(str(path), make_image))
+    recorder.extract_text(), recorder.extract_links()
+    recorder.extract_images(str(first_output)), recorder.extract_tables(str(first_output))
+    recorder.commit()
+
+    # Another document wrote the same names into the shared output folders
+    output = tmp_path / "output"
+    output.mkdir()
+    (output / "table_pdf_1.csv").write_text("table of another document\n")
+    (output / "image_page_1_1.png").write_bytes(b"image of another document")
+
+    hit = cache.get(key, str(path))
+    [table] = hit.extract_tables(str(output))
+    [image] = hit.extract_images(str(output))
+    with open(table) as file:
+        assert file.read() == "table of this document\n"
+    with open(image.image_path, "rb") as file:
+        assert file.read() == b"image of this document"
@@ -0,0 +1,70 @@
+import fitz
+import pytest
+from docx import Document
+from docx.shared import Pt
+from data_extractor.docxExtractor import DocxExtractor
+from data_extractor.font_styles import FontStyleCounter
+from data_extractor.pdfExtractor import PdfExtractor
+from loader.docx_loader import DOCXLoader
+from loader.pdf_loader import PDFLoader
+
+def counts(bold=0, italic=0, fonts=None, sizes=None):
+    return {"bold": bold, "italic": italic, "fonts": fonts or {}, "sizes": sizes or {}}
+
+def test_counter_keeps_pages_and_totals():
+    counter = FontStyleCounter()
+    counter.add(1, bold=True, font="Arial", size=11.04)
+    counter.add(1, italic=True, font="Arial", size=11)
+    counter.add(None, bold=True, size=8)
+    counter.add(3, font="Times")
+    assert counter.page(1) == counts(1, 1, {"Arial": 2}, {11.0: 2})
+    assert counter.page(2) == counts()
+    assert counter.page(3) == counts(fonts={"Times": 1})
+    # Runs without a page only count towards the document
+    assert counter.document() == counts(2, 1, {"Arial": 2, "Times": 1}, {11.0: 2, 8.0: 1})
+
+@pytest.fixture
+def styled_pdf(tmp_path):
+    path = str(tmp_path / "styled.pdf")
+    pdf_document = fitz.open()
+    page = pdf_document.new_page()
+    page.insert_text((72, 72), "plain", fontname="helv", fontsize=11)
+    page.insert_text((72, 100), "bold", fontname="hebo", fontsize=14)
+    pdf_document.new_page().insert_text((72, 72), "italic", fontname="heit", fontsize=11)
+    pdf_document.save(path)
+    pdf_document.close()
+    return path
+
+def test_pdf_counts_per_page_and_document(styled_pdf):
+    extractor = PdfExtractor(PDFLoader(backend="pymupdf"))
+    extractor.load(styled_pdf)
+    page_1 = counts(1, 0, {"Helvetica": 1, "Helvetica-Bold": 1}, {11.0: 1, 14.0: 1})
+    page_2 = counts(0, 1, {"Helvetica-Oblique": 1}, {11.0: 1})
+    assert [page.font_styles for page in extractor.extract_text()] == [page_1, page_2]
+    assert extractor.extract_font_styles() == counts(
+        1, 1, {"Helvetica": 1, "Helvetica-Bold": 1, "Helvetica-Oblique": 1}, {11.0: 2, 14.0: 1})
+
+@pytest.fixture
+def styled_docx(tmp_path):
+    path = str(tmp_path / "styled.docx")
+    document = Document()
+    title = document.add_paragraph().add_run("Title")
+    title.bold, title.font.name, title.font.size = True, "Arial", Pt(14)
+    # An empty paragraph is not a page, but its runs count towards the document
+    document.add_paragraph().add_run("").italic = True
+    body = document.add_paragraph()
+    first = body.add_run("Body ")
+    first.italic, first.font.name, first.font.size = True, "Times New Roman", Pt(11)
+    body.add_run("text")
+    document.save(path)
+    return path
+
+@pytest.mark.parametrize("backend", ["object-model", "lxml"])
+def test_docx_counts_per_paragraph_and_document(styled_docx, backend):
+    extractor = DocxExtractor(DOCXLoader(backend=backend))
+    extractor.load(styled_docx)
+    pages = extractor.extract_text()
+    assert [(page.page_number, page.text) for page in pages] == [(1, "Title"), (2, "Body text")]
+    assert pages[0].font_styles == counts(1, 0, {"Arial": 1}, {14.0: 1})
+    assert pages[1].font_styles == counts(0, 1, {"Times New Roman": 1}, {11.0: 1})
+    assert extractor.extract_font_styles() == counts(1, 2, {"Arial": 1, "Times New Roman": 1}, {14.0: 1, 11.0: 1})
@@ -0,0 +1,89 @@
+import hashlib
+import io
+import os
+import pytest
+from PIL import Image
+from data_extractor.image_processing import ImageOptions, ImageProcessor, transform_image
+from data_extractor.records import ImageRef
+
+def encode(size=(400, 200), image_format="PNG", mode="RGB"):
+    output = io.BytesIO()
+    Image.new(mode, size, "red").save(output, format=image_format)
+    return output.getvalue()
+
+def image_record(data, ext, image_path=None, width=None, height=None):
+    return ImageRef(1, image_path or f"image_page_1_1.{ext}", data, hashlib.sha256(data).hexdigest(),
+                    ext, width, height, len(data))
+
+def read(path):
+    with open(path, "rb") as file:
+        return file.read()
+
+@pytest.fixture
+def png():
+    return image_record(encode(), "png", width=400, height=200)
+
+def test_images_that_match_the_options_are_written_without_decoding(tmp_path, png, monkeypatch):
+    def no_decoding(*args, **kwargs):
+        raise AssertionError("decoded")
+    monkeypatch.setattr(Image, "open", no_decoding)
+    with ImageProcessor(ImageOptions(format="png", max_size=800)) as processor:
+        [image] = processor.process_all([png], str(tmp_path))
+    assert image.image is png.image
+    assert image.image_path == str(tmp_path / "image_page_1_1.png")
+    assert read(image.image_path) == png.image
+    assert processor.stats.as_dict()["transformed"] == 0
+
+def test_transcoding_changes_format_and_hash(tmp_path, png):
+    image, done = transform_image(png, ImageOptions(format="jpeg"), str(tmp_path))
+    assert done["transformed"] == 1 and done["resized"] == 0
+    assert (image.ext, image.width, image.height) == ("jpeg", 400, 200)
+    assert image.image_path == str(tmp_path / "image_page_1_1.jpeg")
+    assert image.image_hash == hashlib.sha256(read(image.image_path)).hexdigest()
+    with Image.open(image.image_path) as written:
+        assert written.format == "JPEG"
+
+def test_images_above_max_size_are_downscaled(png):
+    image, done = transform_image(png, ImageOptions(max_size=100))
+    assert done == {"transformed": 1, "resized": 1, "thumbnails": 0, "failed": 0}
+    assert (image.width, image.height, image.ext) == (100, 50, "png")
+    assert image.size < png.size
+    # Already within the limit
+    assert transform_image(image, ImageOptions(max_size=100))[0].image is image.image
+
+def test_thumbnails_are_written_next_to_kept_images(tmp_path, png):
+    image, done = transform_image(png, ImageOptions(thumbnail_size=64), str(tmp_path))
+    assert done["thumbnails"] == 1 and done["transformed"] == 0
+    assert image.image is png.image
+    assert image.thumbnail_path == str(tmp_path / "thumbnails" / "image_page_1_1.jpeg")
+    with Image.open(image.thumbnail_path) as thumbnail:
+        assert thumbnail.size == (64, 32)
+
+@pytest.mark.parametrize("workers, executor", [(1, "thread"), (2, "thread"), (2, "process")])
+def test_processor_keeps_the_order_and_counts(tmp_path, workers, executor):
+    images = [image_record(encode((100 + i, 50)), "png", f"image_page_{i}_1.png") for i in range(5)]
+    with ImageProcessor(ImageOptions(format="webp"), workers, executor, max_in_flight=2) as processor:
+        processed = list(processor.process_all(images, str(tmp_path)))
+    assert [image.width for image in processed] == [100 + i for i in range(5)]
+    assert all(image.ext == "webp" for image in processed)
+    stats = processor.stats.as_dict()
+    assert (stats["images"], stats["transformed"], stats["failed"]) == (5, 5, 0)
+
+def test_unreadable_images_are_kept_as_they_are(tmp_path):
+    # A placeable WMF header; Pillow has no WMF decoder outside Windows
+    wmf = image_record(b"\xd7\xcd\xc6\x9a" + b"\0" * 60, "wmf", width=10, height=10)
+    image, done = transform_image(wmf, ImageOptions(format="png", thumbnail_size=64), str(tmp_path))
+    assert done == {"transformed": 0, "resized": 0, "thumbnails": 0, "failed": 1}
+    assert (image.image, image.ext, image.thumbnail_path) == (wmf.image, "wmf", None)
+    assert read(image.image_path) == wmf.image
+    assert image.image_path == str(tmp_path / "image_page_1_1.wmf")
+
+def test_missing_ext_is_taken_from_the_image(tmp_path):
+    jpeg = image_record(encode(image_format="JPEG"), None, image_path="image_page_1_1")
+    image, done = transform_image(jpeg, ImageOptions(max_size=100), str(tmp_path))
+    assert done["failed"] == 0 and done["resized"] == 1
+    assert image.ext == "jpeg" and image.image_path == str(tmp_path / "image_page_1_1.jpeg")
+    # Passed through without a format, the extracted name is kept
+    unknown = image_record(b"not an image", None, image_path="image_page_1_2")
+    image, done = transform_image(unknown, ImageOptions(max_size=100), str(tmp_path))
+    assert done["failed"] == 1 and os.path.basename(image.image_path) == "image_page_1_2"
@@ -0,0 +1,75 @@
+import os
+import fitz
+import pytest
+from data_extractor.pdfExtractor import PdfExtractor
+from loader.pdf_loader import PDFLoader
+from storage.ingest_manifest import IngestManifest, changed_pages, file_fingerprint
+
+def write_pdf(path, texts):
+    pdf_document = fitz.open()
+    for text in texts:
+        pdf_document.new_page().insert_text((72, 72), text)
+    pdf_document.save(str(path))
+    pdf_document.close()
+
+def page_hashes(path):
+    extractor = PdfExtractor(PDFLoader(backend="pymupdf"))
+    extractor.load(str(path))
+    return extractor.page_hashes()
+
+@pytest.fixture
+def manifest(tmp_path):
+    manifest = IngestManifest(str(tmp_path / "manifest.db"))
+    yield manifest
+    manifest.close()
+
+# * changed pages
+def test_changed_pages_reports_new_edited_and_removed_pages():
+    previous = {1: "a", 2: "b", 3: "c"}
+    assert changed_pages(previous, {1: "a", 2: "B", 4: "d"}) == ({2, 4}, {3})
+    assert changed_pages(previous, dict(previous)) == (set(), set())
+
+def test_editing_one_page_changes_only_its_hash(tmp_path):
+    path = tmp_path / "report.pdf"
+    write_pdf(path, ["page 1", "page 2", "page 3"])
+    before = page_hashes(path)
+    write_pdf(path, ["page 1", "page 2 edited", "page 3"])
+    assert changed_pages(before, page_hashes(path)) == ({2}, set())
+
+def test_dropping_the_last_page_reports_it_removed(tmp_path):
+    path = tmp_path / "report.pdf"
+    write_pdf(path, ["page 1", "page 2", "page 3"])
+    before = page_hashes(path)
+    write_pdf(path, ["page 1", "page 2"])
+    assert changed_pages(before, page_hashes(path)) == (set(), {3})
+
+# * manifest
+def test_recorded_fingerprint_round_trips(tmp_path, manifest):
+    path = tmp_path / "report.pdf"
+    write_pdf(path, ["page 1"])
+    fingerprint = dict(file_fingerprint(str(path)), page_hashes=page_hashes(path))
+    assert manifest.get(str(path)) is None
+    manifest.record(str(path), fingerprint)
+    assert manifest.get(str(path)) == fingerprint
+
+def test_entries_are_keyed_by_absolute_path(tmp_path, manifest, monkeypatch):
+    for folder in ("a", "b"):
+        (tmp_path / folder).mkdir()
+        (tmp_path / folder / "report.pdf").write_bytes(folder.encode())
+    manifest.record(str(tmp_path / "a" / "report.pdf"), file_fingerprint(str(tmp_path / "a" / "report.pdf")))
+    assert manifest.get(str(tmp_path / "b" / "report.pdf")) is None
+    monkeypatch.chdir(tmp_path / "a")
+    assert manifest.get("report.pdf") is not None
+
+def test_is_unchanged_follows_size_mtime_and_version(tmp_path, manifest):
+    path = tmp_path / "notes.docx"
+    path.write_bytes(b"first")
+    manifest.record(str(path), file_fingerprint(str(path)))
+    entry = manifest.get(str(path))
+    assert IngestManifest.is_unchanged(entry, str(path))
+    assert not IngestManifest.is_unchanged(dict(entry, extractor_version=-1), str(path))
+    assert not IngestManifest.is_unchanged(None, str(path))
+    path.write_bytes(b"second version")
+    assert not IngestManifest.is_unchanged(entry, str(path))
+    os.remove(path)
+    assert not IngestManifest.is_unchanged(entry, str(path))
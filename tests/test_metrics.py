@@ -0,0 +1,16 @@
+import pytest
+from metrics import document, peak_rss_bytes, process_peak_rss_bytes, reset_peak_rss
+
+def test_document_peak_rss_is_its_own():
+    if not reset_peak_rss():
+        pytest.skip("the peak RSS of this platform cannot be reset")
+    with document("large.pdf", log=False) as large:
+        ballast = bytearray(128 * 1024 * 1024)
+        ballast[::4096] = b"x" * len(ballast[::4096])
+        del ballast
+    with document("small.pdf", log=False) as small:
+        pass
+    assert large.summary["peak_rss_scope"] == small.summary["peak_rss_scope"] == "document"
+    assert small.summary["peak_rss_bytes"] < large.summary["peak_rss_bytes"] - 64 * 1024 * 1024
+    # The process gauge keeps the lifetime peak
+    assert process_peak_rss_bytes() >= large.summary["peak_rss_bytes"] > peak_rss_bytes()
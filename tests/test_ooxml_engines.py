@@ -0,0 +1,40 @@
+import os
+import pytest
+from data_extractor.docxExtractor import DocxExtractor
+from data_extractor.pptExtractor import PPTExtractor
+from loader.docx_loader import DOCXLoader
+from loader.ppt_loader import PPTLoader
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FORMATS = [("sample.docx", DOCXLoader, DocxExtractor), ("sample.pptx", PPTLoader, PPTExtractor)]
+
+def extract(file_name, loader_class, extractor_class, backend, output_folder):
+    extractor = extractor_class(loader_class(backend=backend))
+    extractor.load(os.path.join(ROOT, file_name))
+    os.makedirs(output_folder)
+    tables = []
+    for table in extractor.extract_tables(output_folder):
+        with open(table) as file:
+            tables.append((os.path.basename(table), table.page_number, file.read()))
+    return {
+        "text": extractor.extract_text(),
+        "links": extractor.extract_links(),
+        # Written to different folders, so compare the file names
+        "images": [image.replace(image_path=os.path.basename(image.image_path))
+                   for image in extractor.extract_images(output_folder)],
+        "tables": tables,
+        "font_styles": extractor.extract_font_styles()
+    }
+
+@pytest.mark.parametrize("file_name, loader_class, extractor_class", FORMATS)
+def test_lxml_engine_matches_the_object_model(tmp_path, file_name, loader_class, extractor_class):
+    object_model = extract(file_name, loader_class, extractor_class, "object-model", str(tmp_path / "object-model"))
+    lxml = extract(file_name, loader_class, extractor_class, "lxml", str(tmp_path / "lxml"))
+    for stage in ("text", "links", "images", "tables"):
+        assert object_model[stage], f"{file_name} has no {stage} to compare"
+        assert len(lxml[stage]) == len(object_model[stage])
+        for lxml_record, object_model_record in zip(lxml[stage], object_model[stage]):
+            assert lxml_record == object_model_record
+    assert lxml["font_styles"] == object_model["font_styles"]
+    assert sorted(os.listdir(tmp_path / "lxml")) == sorted(os.listdir(tmp_path / "object-model"))
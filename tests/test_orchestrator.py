@@ -0,0 +1,106 @@
+import os
+import fitz
+import pytest
+from data_extractor.pdfExtractor import PdfExtractor
+from loader.pdf_loader import PDFLoader
+from orchestrator import STAGES, run_changed_pages, run_stages
+
+def load(file_path, table_engine="pymupdf"):
+    extractor = PdfExtractor(PDFLoader(backend="pymupdf"), table_engine=table_engine)
+    extractor.load(file_path)
+    return extractor
+
+def searched_pages(monkeypatch):
+    pages = []
+    find_tables = fitz.Page.find_tables
+    def recording_find_tables(page, *args, **kwargs):
+        pages.append(page.number + 1)
+        return find_tables(page, *args, **kwargs)
+    monkeypatch.setattr(fitz.Page, "find_tables", recording_find_tables)
+    return pages
+
+class HandleRecordingExtractor(PdfExtractor):
+    """Records the document handle each stage ran on; reopened copies share the list."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.calls = []
+
+    def _record(self, stage):
+        # The handle itself, so that its id is not reused by a later one
+        self.calls.append((stage, self.file))
+
+    def extract_text(self):
+        self._record("text")
+        return super().extract_text()
+
+    def extract_links(self):
+        self._record("links")
+        return super().extract_links()
+
+    def extract_images(self, output_folder=None):
+        self._record("images")
+        return super().extract_images(output_folder)
+
+    def extract_tables(self, output_folder):
+        self._record("tables")
+        return super().extract_tables(output_folder)
+
+def comparable(results):
+    # Every run writes into its own folders
+    return {
+        "text": results["text"],
+        "links": results["links"],
+        "images": [image.replace(image_path=os.path.basename(image.image_path)) for image in results["images"]],
+        "tables": [table.replace(table_path=os.path.basename(table.table_path)) for table in results["tables"]]
+    }
+
+def run(tmp_path, name, extractor, **options):
+    images, tables = tmp_path / name / "images", tmp_path / name / "tables"
+    images.mkdir(parents=True)
+    tables.mkdir()
+    return run_stages(extractor, str(images), str(tables), **options)
+
+# * stages
+@pytest.mark.parametrize("process_stages", [(), ("text",)])
+def test_concurrent_stages_match_a_serial_run(tmp_path, multi_page_pdf, process_stages):
+    serial, serial_timings = run(tmp_path, "serial", load(multi_page_pdf))
+    concurrent, timings = run(tmp_path, "concurrent", load(multi_page_pdf), max_workers=4,
+                              process_stages=process_stages)
+    assert list(concurrent) == list(serial) == list(STAGES)
+    assert comparable(concurrent) == comparable(serial)
+    assert set(timings) == set(serial_timings) == set(STAGES) | {"total"}
+
+def test_thread_stages_use_their_own_handles(tmp_path, multi_page_pdf):
+    extractor = HandleRecordingExtractor(PDFLoader(backend="pymupdf"))
+    extractor.load(multi_page_pdf)
+    run_stages(extractor, None, str(tmp_path), max_workers=4)
+    assert sorted(stage for stage, _ in extractor.calls) == sorted(STAGES)
+    handles = {id(handle) for _, handle in extractor.calls}
+    assert len(handles) == len(STAGES)
+    # The first stage keeps the handle that was already open
+    assert id(extractor.file) in handles
+
+# * changed pages
+def test_changed_pages_only_search_those_pages_for_tables(tmp_path, monkeypatch, multi_page_pdf):
+    output_tables = str(tmp_path / "tables")
+    os.mkdir(output_tables)
+    full, _ = run_stages(load(multi_page_pdf), None, output_tables)
+    before = sorted(os.listdir(output_tables))
+    assert before == ["table_pdf_page_3_1.csv", "table_pdf_page_6_1.csv", "table_pdf_page_9_1.csv"]
+    # A table page 6 no longer has
+    open(os.path.join(output_tables, "table_pdf_page_6_2.csv"), "w").close()
+
+    pages = searched_pages(monkeypatch)
+    results, _ = run_changed_pages(load(multi_page_pdf), [5, 6], None, output_tables)
+    assert pages == [5, 6]
+    assert results["tables"] == [full["tables"][1]]
+    assert [image.page_number for image in results["images"]] == [image.page_number for image in full["images"]
+                                                                  if image.page_number in (5, 6)]
+    # Text and links are complete, their output files are rewritten whole
+    assert results["text"] == full["text"] and results["links"] == full["links"]
+    assert sorted(os.listdir(output_tables)) == before
+
+def test_tabula_tables_are_not_page_scoped(multi_page_pdf):
+    assert "tables" in load(multi_page_pdf).page_scoped_stages
+    assert "tables" not in load(multi_page_pdf, "tabula").page_scoped_stages
@@ -0,0 +1,89 @@
+import os
+import fitz
+import pandas as pd
+import pytest
+from data_extractor.pdfExtractor import PdfExtractor
+from loader.pdf_loader import PDFLoader
+
+SAMPLE_PDF = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sample.pdf")
+
+def load(file_path):
+    extractor = PdfExtractor(PDFLoader(backend="pymupdf"))
+    extractor.load(file_path)
+    return extractor
+
+@pytest.fixture
+def extractor():
+    return load(SAMPLE_PDF)
+
+def fail_pages(monkeypatch, failing):
+    find_tables = fitz.Page.find_tables
+    def flaky_find_tables(page, *args, **kwargs):
+        if page.number + 1 in failing:
+            raise RuntimeError("table finder failed")
+        return find_tables(page, *args, **kwargs)
+    monkeypatch.setattr(fitz.Page, "find_tables", flaky_find_tables)
+
+def record_tabula_calls(monkeypatch, extractor):
+    calls = []
+    def tabula_page_tables(page_nums):
+        calls.append(page_nums)
+        return {page_num: [f"tabula table of page {page_num}"] for page_num in page_nums}
+    monkeypatch.setattr(extractor, "_tabula_page_tables", tabula_page_tables)
+    return calls
+
+def test_failing_pages_share_one_tabula_call_and_keep_their_place(monkeypatch, multi_page_pdf):
+    extractor = load(multi_page_pdf)
+    [(_, page_6_table)] = [table for table in extractor._pymupdf_tables() if table[0] == 6]
+    fail_pages(monkeypatch, {3, 9})
+    calls = record_tabula_calls(monkeypatch, extractor)
+    tables = list(extractor._pymupdf_tables())
+    assert calls == [[3, 9]]
+    assert [page_num for page_num, _ in tables] == [3, 6, 9]
+    assert tables[0] == (3, "tabula table of page 3") and tables[2] == (9, "tabula table of page 9")
+    assert tables[1][1].equals(page_6_table)
+
+def test_tables_before_the_first_failing_page_are_streamed(monkeypatch, multi_page_pdf):
+    extractor = load(multi_page_pdf)
+    fail_pages(monkeypatch, {6})
+    calls = record_tabula_calls(monkeypatch, extractor)
+    tables = extractor._pymupdf_tables()
+    assert next(tables)[0] == 3
+    assert calls == []
+    assert [page_num for page_num, _ in tables] == [6, 9]
+    assert calls == [[6]]
+
+def test_tabula_is_not_called_when_every_page_works(monkeypatch, extractor):
+    calls = record_tabula_calls(monkeypatch, extractor)
+    list(extractor._pymupdf_tables())
+    assert calls == []
+
+def test_sharded_fallback_tables_match_a_serial_run(tmp_path, monkeypatch, multi_page_pdf):
+    # Pages 3 and 6 hold tables; the serial run and both shards fall back on them
+    fail_pages(monkeypatch, {3, 6})
+    monkeypatch.setattr(PdfExtractor, "_tabula_page_tables",
+                        lambda self, page_nums: {page_num: [pd.DataFrame({"page": [page_num]})] for page_num in page_nums})
+    serial = load(multi_page_pdf)
+    serial_tables = [table.page_number for table in serial.extract_tables(str(tmp_path))]
+    sharded = []
+    for page_range in (range(1, 5), range(5, 10)):
+        shard = load(multi_page_pdf)
+        shard.page_range = page_range
+        sharded += [table.page_number for table in shard.extract_tables(str(tmp_path))]
+    assert sharded == serial_tables == [3, 6, 9]
+
+def test_tabula_runs_once_over_one_file_per_page(monkeypatch, extractor):
+    import tabula
+    runs = []
+    def convert_into_by_batch(folder, output_format, pages):
+        # tabula writes <name>.json next to every <name>.pdf
+        runs.append(sorted(os.listdir(folder)))
+        for name in os.listdir(folder):
+            with fitz.open(os.path.join(folder, name)) as page_document:
+                assert len(page_document) == 1
+            with open(os.path.join(folder, name[:-len(".pdf")] + ".json"), "w") as file:
+                file.write('[{"data": [[{"text": "page"}], [{"text": "%s"}]]}]' % name)
+    monkeypatch.setattr(tabula, "convert_into_by_batch", convert_into_by_batch)
+    tables = extractor._tabula_page_tables([1, 3])
+    assert runs == [["page_1.pdf", "page_3.pdf"]]
+    assert tables[3][0].to_dict("list") == {"page": ["page_3.pdf"]}
@@ -0,0 +1,52 @@
+import pytest
+from data_extractor.records import Link
+from pipeline import stream_document
+from storage.sqlite_storage import SQLiteStorage
+
+class StubExtractor:
+    """Serves fixed records through the iter_* interface of DataExtractor."""
+
+    def __init__(self, file_path, pages, links=(), images=()):
+        self.file_path = file_path
+        self.pages, self.links, self.images = pages, list(links), list(images)
+
+    def iter_text(self):
+        return iter(self.pages)
+
+    def iter_links(self):
+        return iter(self.links)
+
+    def iter_images(self, output_folder=None):
+        return iter(self.images)
+
+    def iter_tables(self, output_folder=None):
+        return iter(())
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / "extracted.db"))
+    storage.bootstrap()
+    yield storage
+    storage.close()
+
+def count(storage, table):
+    storage.cursor.execute(f"SELECT COUNT(*) FROM {table}")
+    return storage.cursor.fetchone()[0]
+
+def stream(tmp_path, storage, extractor):
+    return stream_document(extractor, storage, output_image=str(tmp_path / "images"),
+                           output_text=str(tmp_path / "text"), output_tables=str(tmp_path / "tables"))
+
+def test_streaming_again_removes_stale_rows(tmp_path, storage, make_page, make_image):
+    file_path = str(tmp_path / "report.pdf")
+    stream(tmp_path, storage, StubExtractor(file_path, [make_page(1), make_page(2)],
+                                            [Link("a", "https://example.com/a", 2)], [make_image(page_number=2)]))
+    stream(tmp_path, storage, StubExtractor(file_path, [make_page(1)]))
+    assert (count(storage, "extracted_text"), count(storage, "extracted_links"), count(storage, "extracted_images")) == (1, 0, 0)
+
+def test_repeated_links_on_a_page_are_kept(tmp_path, storage, make_page):
+    links = [Link("first", "https://example.com/", 1), Link("second", "https://example.com/", 1)]
+    extractor = StubExtractor(str(tmp_path / "report.pdf"), [make_page(1)], links)
+    assert stream(tmp_path, storage, extractor)["links"] == 2
+    stream(tmp_path, storage, extractor)
+    assert count(storage, "extracted_links") == 2
@@ -0,0 +1,68 @@
+import json
+import pandas as pd
+import pytest
+from data_extractor.records import Link, TableRef
+from storage.jsonl_storage import JSONLStorage
+from storage.parquet_storage import ParquetStorage
+
+def records(make_page, make_image):
+    return {
+        "text": [make_page(1), make_page(2, "ünïcode text")],
+        "links": [Link(None, "https://example.com/", 1), Link("site", "https://example.org/", 2)],
+        "images": [make_image(), make_image(b"other", 2, "image_page_2_1.png")],
+        "tables": [TableRef("output_tables/table_pdf_page_1_1.csv", 1), TableRef("table_pdf_1.csv", None)]
+    }
+
+def expected_rows(records):
+    # Image bytes are left out of the files
+    return [{key: value for key, value in record.items() if key != "image"} for record in records]
+
+# * JSON Lines
+@pytest.mark.parametrize("kind", ["text", "links", "images", "tables"])
+def test_jsonl_round_trip(tmp_path, make_page, make_image, kind):
+    path = str(tmp_path / f"{kind}.jsonl")
+    written = records(make_page, make_image)[kind]
+    storage = JSONLStorage(None, flush_rows=1)
+    assert list(storage.stream_data(written, path)) == written
+    assert list(JSONLStorage.read_data(path)) == expected_rows(written)
+
+def test_jsonl_appends(tmp_path, make_page):
+    path = str(tmp_path / "text.jsonl")
+    storage = JSONLStorage(None)
+    storage.store_data([make_page(1)], path)
+    storage.store_data([make_page(2)], path, append=True)
+    assert [row["page_number"] for row in JSONLStorage.read_data(path)] == [1, 2]
+
+# * Parquet
+@pytest.mark.parametrize("kind", ["text", "links", "images", "tables"])
+def test_parquet_round_trip(tmp_path, make_page, make_image, kind):
+    pytest.importorskip("pyarrow")
+    path = str(tmp_path / f"{kind}.parquet")
+    written = records(make_page, make_image)[kind]
+    # One record per row group; the first row group of links and tables has a None column
+    ParquetStorage(None, row_group_rows=1).store_data(written, path)
+    rows = ParquetStorage.read_data(path).to_dict("records")
+    for row, expected in zip(rows, expected_rows(written), strict=True):
+        for key, value in expected.items():
+            if isinstance(value, dict):
+                # Nested dicts are stored as JSON text
+                assert json.loads(row[key]) == value
+            elif isinstance(value, list):
+                assert list(row[key]) == value
+            elif value is None:
+                # pandas reads a missing number as NaN
+                assert pd.isna(row[key])
+            else:
+                assert row[key] == value
+
+def test_parquet_reads_selected_columns(tmp_path, make_page):
+    pytest.importorskip("pyarrow")
+    path = str(tmp_path / "text.parquet")
+    ParquetStorage(None).store_data([make_page(1), make_page(2)], path)
+    assert ParquetStorage.read_data(path, ["page_number"]).to_dict("list") == {"page_number": [1, 2]}
+
+def test_empty_parquet_file_can_be_read(tmp_path):
+    pytest.importorskip("pyarrow")
+    path = str(tmp_path / "links.parquet")
+    ParquetStorage(None).store_data([], path)
+    assert len(ParquetStorage.read_data(path)) == 0
@@ -0,0 +1,61 @@
+import os
+import pickle
+from array import array
+import pytest
+from data_extractor.records import Link, PageText, RecordBatch, TableRef, as_dict
+
+def test_records_read_like_dicts(make_page):
+    page = make_page(2, "text")
+    assert page["text"] == "text" and page.get("missing") is None
+    assert list(page) == ["page_number", "text", "headings", "font_styles"]
+    assert dict(page) == page.as_dict() == as_dict(page)
+    with pytest.raises(KeyError):
+        page["missing"]
+
+def test_records_are_immutable_and_replace_copies(make_page):
+    page = make_page()
+    with pytest.raises(AttributeError):
+        page.text = "changed"
+    assert page.replace(text="changed").text == "changed"
+    assert page.text == "page text"
+
+def test_records_pickle_round_trip(make_page, make_image):
+    for record in (make_page(), make_image(), Link(None, "https://example.com/", 3), TableRef("t.csv", None)):
+        assert pickle.loads(pickle.dumps(record)) == record
+
+def test_table_ref_is_path_like(tmp_path):
+    path = tmp_path / "table_pdf_1.csv"
+    path.write_text("a,b\n")
+    assert os.path.getsize(TableRef(str(path), 1)) == 4
+
+def test_as_dict_leaves_other_values_alone():
+    value = {"text": "plain dict"}
+    assert as_dict(value) is value
+
+# * batches
+def test_batch_stores_int_columns_as_arrays(make_page):
+    batch = RecordBatch.from_records(PageText, [make_page(1), make_page(2, "second")])
+    assert len(batch) == 2
+    assert batch.column("page_number") == array('q', [1, 2])
+    assert batch.column("text") == ["page text", "second"]
+
+def test_batch_yields_records_and_rows_in_order(make_page):
+    pages = [make_page(1), make_page(2, "second")]
+    batch = RecordBatch.from_records(PageText, pages)
+    assert list(batch) == pages
+    assert list(batch.rows("text", "page_number")) == [("page text", 1), ("second", 2)]
+    assert batch.to_dicts() == [page.as_dict() for page in pages]
+
+def test_batch_accepts_dicts_and_optional_ints():
+    batch = RecordBatch.from_records(Link, [{"linked_text": None, "url": "https://example.com/", "page_number": 1}])
+    assert list(batch) == [Link(None, "https://example.com/", 1)]
+    tables = RecordBatch.from_records(TableRef, [TableRef("t.csv", None)])
+    assert tables.column("page_number") == [None]
+
+def test_batch_pickle_round_trip(make_image):
+    batch = RecordBatch.from_records(type(make_image()), [make_image(), make_image(b"other", 2, "b.png")])
+    assert list(pickle.loads(pickle.dumps(batch))) == list(batch)
+
+def test_empty_batch(make_page):
+    batch = RecordBatch.from_records(PageText, [])
+    assert len(batch) == 0 and list(batch) == [] and batch.to_dicts() == []
@@ -0,0 +1,15 @@
+from storage.search_index import SearchIndex
+from storage.storage import document_key
+
+def test_same_named_files_are_indexed_side_by_side(tmp_path, make_page):
+    index = SearchIndex(str(tmp_path / "index"))
+    first, second = document_key("in/a/sample.pdf"), document_key("in/b/sample.pdf")
+    index.add_document(first, [make_page(1, "quarterly revenue report")])
+    index.add_document(second, [make_page(1, "quarterly revenue forecast")])
+    index.commit()
+    assert sorted(document for document, _, _ in index.search("quarterly revenue")) == sorted([first, second])
+    # Indexing a document again replaces only its own pages
+    index.add_document(second, [make_page(1, "annual plan")])
+    index.commit()
+    assert [document for document, _, _ in index.search("quarterly")] == [first]
+    index.close()
@@ -0,0 +1,48 @@
+import os
+from data_extractor.pdfExtractor import PdfExtractor
+from loader.pdf_loader import PDFLoader
+from orchestrator import STAGES, run_stage
+from sharding import extract_sharded, shard_ranges
+
+def load(file_path):
+    extractor = PdfExtractor(PDFLoader(backend="pymupdf"))
+    extractor.load(file_path)
+    return extractor
+
+def folders(tmp_path, name):
+    images, tables = tmp_path / name / "images", tmp_path / name / "tables"
+    images.mkdir(parents=True)
+    tables.mkdir()
+    return str(images), str(tables)
+
+def read_files(folder):
+    contents = {}
+    for name in sorted(os.listdir(folder)):
+        with open(os.path.join(folder, name), "rb") as file:
+            contents[name] = file.read()
+    return contents
+
+def without_folder(records, field):
+    return [record.replace(**{field: os.path.basename(record[field])}) for record in records]
+
+def test_shard_ranges_cover_every_page_once():
+    assert shard_ranges(10, 3) == [range(1, 5), range(5, 8), range(8, 11)]
+    assert shard_ranges(2, 8) == [range(1, 2), range(2, 3)]
+    assert shard_ranges(0, 4) == []
+
+def test_sharded_run_matches_a_serial_run(tmp_path, multi_page_pdf):
+    serial_images, serial_tables = folders(tmp_path, "serial")
+    extractor = load(multi_page_pdf)
+    serial = {stage: run_stage(extractor, stage, serial_images, serial_tables)[0] for stage in STAGES}
+
+    sharded_images, sharded_tables = folders(tmp_path, "sharded")
+    sharded, timings = extract_sharded(load(multi_page_pdf), sharded_images, sharded_tables, shards=3)
+
+    assert len(timings) == 4
+    assert sharded["text"] == serial["text"]
+    assert sharded["links"] == serial["links"]
+    assert without_folder(sharded["images"], "image_path") == without_folder(serial["images"], "image_path")
+    assert without_folder(sharded["tables"], "table_path") == without_folder(serial["tables"], "table_path")
+    # Byte for byte the same files, with tables renumbered across shards and no shard folders left
+    assert read_files(sharded_images) == read_files(serial_images)
+    assert read_files(sharded_tables) == read_files(serial_tables)
@@ -0,0 +1,89 @@
+import os
+import zipfile
+import pytest
+from loader.sniffing import (CorruptedFileError, OLE2_MAGIC, UnsupportedFormatError, pdf_trailer_problem,
+                             sniff_format)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def sample(name):
+    return os.path.join(ROOT, name)
+
+def write(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+def sample_pdf_bytes():
+    with open(sample("sample.pdf"), "rb") as file:
+        return file.read()
+
+# * format
+@pytest.mark.parametrize("name, ext", [("sample.pdf", ".pdf"), ("sample.docx", ".docx"), ("sample.pptx", ".pptx")])
+def test_samples_are_recognised(name, ext):
+    assert sniff_format(sample(name)) == ext
+
+def test_format_comes_from_the_bytes_not_the_name(tmp_path):
+    with open(sample("sample.docx"), "rb") as file:
+        assert sniff_format(write(tmp_path, "report.pdf", file.read())) == ".docx"
+
+def test_pdf_header_after_junk_is_found(tmp_path):
+    assert sniff_format(write(tmp_path, "a.pdf", b"\r\njunk" + sample_pdf_bytes())) == ".pdf"
+
+def test_pdf_with_broken_trailer_is_still_a_pdf(tmp_path):
+    # The loader decides whether it can repair the file
+    assert sniff_format(write(tmp_path, "a.pdf", sample_pdf_bytes()[:-200])) == ".pdf"
+
+def test_legacy_office_file_is_unsupported(tmp_path):
+    with pytest.raises(UnsupportedFormatError, match="legacy binary Office"):
+        sniff_format(write(tmp_path, "a.doc", OLE2_MAGIC + b"\0" * 512))
+
+def test_plain_text_is_unsupported(tmp_path):
+    with pytest.raises(UnsupportedFormatError):
+        sniff_format(write(tmp_path, "a.pdf", b"hello"))
+
+def test_zip_that_is_not_an_office_document_is_unsupported(tmp_path):
+    path = str(tmp_path / "a.docx")
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("notes.txt", "hello")
+    with pytest.raises(UnsupportedFormatError, match="not an Office document"):
+        sniff_format(path)
+
+def test_truncated_zip_is_corrupted(tmp_path):
+    with open(sample("sample.docx"), "rb") as file:
+        data = file.read()
+    with pytest.raises(CorruptedFileError, match="broken zip archive"):
+        sniff_format(write(tmp_path, "a.docx", data[:len(data) // 2]))
+
+def test_package_without_main_part_is_corrupted(tmp_path):
+    path = str(tmp_path / "a.docx")
+    with zipfile.ZipFile(sample("sample.docx")) as source, zipfile.ZipFile(path, "w") as archive:
+        for item in source.infolist():
+            if item.filename != "word/document.xml":
+                archive.writestr(item, source.read(item))
+    with pytest.raises(CorruptedFileError):
+        sniff_format(path)
+
+# * PDF trailer
+def test_intact_pdf_has_no_trailer_problem():
+    assert pdf_trailer_problem(sample("sample.pdf")) is None
+
+def test_junk_before_the_header_does_not_shift_startxref(tmp_path):
+    assert pdf_trailer_problem(write(tmp_path, "a.pdf", b"junk" + sample_pdf_bytes())) is None
+
+def test_truncated_pdf_has_no_eof_marker(tmp_path):
+    data = sample_pdf_bytes()
+    problem = pdf_trailer_problem(write(tmp_path, "a.pdf", data[:data.rindex(b"%%EOF")]))
+    assert "no %%EOF" in problem
+
+def test_startxref_past_the_end_is_reported(tmp_path):
+    data = sample_pdf_bytes()
+    start = data.rindex(b"startxref")
+    data = data[:start] + b"startxref\n999999999\n%%EOF\n"
+    assert pdf_trailer_problem(write(tmp_path, "a.pdf", data)) == "startxref points past the end of the file"
+
+def test_startxref_off_target_is_reported(tmp_path):
+    data = sample_pdf_bytes()
+    start = data.rindex(b"startxref")
+    data = data[:start] + b"startxref\n0\n%%EOF\n"
+    assert pdf_trailer_problem(write(tmp_path, "a.pdf", data)) == "startxref does not point at an xref table or stream"
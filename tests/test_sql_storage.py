@@ -0,0 +1,168 @@
+import sqlite3
+import threading
+import time
+import pytest
+from storage.connection_pool import ConnectionPool, PoolTimeoutError
+from storage.sqlite_storage import SQLiteStorage
+
+@pytest.fixture
+def database(tmp_path):
+    return str(tmp_path / "extracted.db")
+
+@pytest.fixture
+def storage(database):
+    storage = SQLiteStorage(database, pool_size=2)
+    storage.bootstrap()
+    yield storage
+    storage.close()
+
+def rows(storage, query):
+    storage.cursor.execute(query)
+    return storage.cursor.fetchall()
+
+def orphaned_images(storage):
+    return rows(storage, "SELECT image_hash FROM extracted_images WHERE image_hash IS NOT NULL "
+                         "AND image_hash NOT IN (SELECT image_hash FROM image_blobs)")
+
+# * bootstrap
+def test_bootstrap_creates_every_table(storage):
+    tables = {name for (name,) in rows(storage, "SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert set(SQLiteStorage.TABLES) <= tables
+
+def test_bootstrap_again_keeps_rows(storage, database, make_page):
+    storage.insert_text_rows("/docs/a.pdf", [make_page()])
+    with SQLiteStorage(database) as other:
+        other.bootstrap()
+        assert other.document_pages("/docs/a.pdf") == [(1, "page text")]
+
+def test_in_memory_database_cannot_be_pooled_or_shared():
+    with pytest.raises(ValueError):
+        SQLiteStorage(":memory:", pool_size=2)
+    storage = SQLiteStorage()
+    storage.bootstrap()
+    with pytest.raises(ValueError):
+        with storage.session():
+            pass
+    storage.close()
+
+# * pool and sessions
+def test_pool_blocks_until_a_connection_is_released(database):
+    pool = ConnectionPool(lambda: SQLiteStorage(database).connection, 1)
+    connection = pool.acquire()
+    with pytest.raises(PoolTimeoutError):
+        pool.acquire(timeout=0.05)
+    pool.release(connection)
+    assert pool.acquire(timeout=0.05) is connection
+    pool.close()
+
+def test_sessions_use_their_own_pooled_connections(storage, make_page):
+    with storage.session() as first, storage.session() as second:
+        assert first.connection is not second.connection
+        assert first.connection is not storage.connection
+        first.insert_text_rows("/docs/a.pdf", [make_page()])
+        second.insert_text_rows("/docs/b.pdf", [make_page(text="other")])
+        connection = first.connection
+    with storage.session() as third:
+        # Released connections are reused
+        assert third.connection in (connection, second.connection)
+    assert storage.document_pages("/docs/b.pdf") == [(1, "other")]
+
+def test_session_stats_are_merged(storage, make_image):
+    with storage.session() as session:
+        session.insert_images("/docs/a.pdf", [make_image(), make_image(image_path="copy.png")])
+    stats = storage.image_dedup_stats()
+    assert (stats["occurrences"], stats["unique"]) == (2, 1)
+
+def test_same_named_files_are_separate_documents(storage, make_page):
+    storage.insert_text_rows("/in/a/sample.pdf", [make_page(text="a")])
+    storage.insert_text_rows("/in/b/sample.pdf", [make_page(text="b")])
+    storage.delete_pages("/in/b/sample.pdf")
+    assert storage.document_pages("/in/a/sample.pdf") == [(1, "a")]
+    assert rows(storage, "SELECT file_name FROM documents") == [("sample.pdf",), ("sample.pdf",)]
+
+# * rollback
+def test_rollback_removes_every_row(storage, make_page, make_image):
+    with pytest.raises(RuntimeError):
+        with storage.transaction():
+            storage.insert_text_rows("/docs/a.pdf", [make_page()])
+            storage.insert_images("/docs/a.pdf", [make_image()])
+            raise RuntimeError("store failed")
+    assert rows(storage, "SELECT COUNT(*) FROM documents") == [(0,)]
+    assert rows(storage, "SELECT COUNT(*) FROM image_blobs") == [(0,)]
+    # Neither the blob nor the document id of the rolled back transaction is reused
+    storage.insert_images("/docs/a.pdf", [make_image()])
+    assert rows(storage, "SELECT COUNT(*) FROM image_blobs") == [(1,)]
+    assert orphaned_images(storage) == []
+
+def test_blob_pending_in_another_session_is_still_sent(storage, make_image):
+    image = make_image()
+    with storage.session() as first, storage.session() as second:
+        writer = threading.Thread(target=second.insert_images, args=("/docs/b.pdf", [image]))
+        with pytest.raises(RuntimeError):
+            with first.transaction():
+                first.insert_images("/docs/a.pdf", [image])
+                # second decides which blobs to send, then waits for first's write lock
+                writer.start()
+                time.sleep(0.3)
+                raise RuntimeError("store failed")
+        writer.join()
+    assert rows(storage, "SELECT COUNT(*) FROM image_blobs") == [(1,)]
+    assert orphaned_images(storage) == []
+
+def test_rollback_in_one_session_keeps_what_others_committed(storage, make_image, make_page):
+    image = make_image()
+    with storage.session() as first, storage.session() as second:
+        first.insert_images("/docs/a.pdf", [image])
+        with pytest.raises(RuntimeError):
+            with second.transaction():
+                second.insert_text_rows("/docs/b.pdf", [make_page()])
+                raise RuntimeError("store failed")
+        first.insert_images("/docs/c.pdf", [image])
+        # The blob committed by first is still known, so it is not sent again
+        assert first.image_dedup_stats()["unique"] == 1
+
+# * migration
+def test_legacy_file_name_tables_are_migrated(database):
+    connection = sqlite3.connect(database)
+    connection.executescript("""
+    CREATE TABLE extracted_text (file_name TEXT, page_number INT, text TEXT, headings TEXT, font_styles TEXT);
+    CREATE TABLE extracted_links (file_name TEXT, page_number INT, linked_text TEXT, url TEXT);
+    CREATE TABLE extracted_images (file_name TEXT, page_number INT, image_path TEXT, image_resolution TEXT,
+                                   image_size INT, image BLOB);
+    INSERT INTO extracted_text VALUES ('a.pdf', 1, 'old text', '[]', '{}');
+    INSERT INTO extracted_links VALUES ('a.pdf', 1, 'site', 'https://example.com/page');
+    INSERT INTO extracted_images VALUES ('a.pdf', 1, 'one.png', '4 x 3', 5, x'89504e4701');
+    INSERT INTO extracted_images VALUES ('a.pdf', 2, 'gone.png', NULL, NULL, NULL);
+    """)
+    connection.commit()
+    connection.close()
+
+    with SQLiteStorage(database) as storage:
+        storage.bootstrap()
+        assert storage.document_pages("a.pdf") == [(1, "old text")]
+        assert rows(storage, "SELECT domain FROM extracted_links") == [("example.com",)]
+        # Only the row that still had its bytes references a blob
+        assert rows(storage, "SELECT image_path, image_hash IS NULL FROM extracted_images ORDER BY page_number") == [
+            ("one.png", 0), ("gone.png", 1)]
+        assert rows(storage, "SELECT COUNT(*) FROM image_blobs") == [(1,)]
+        assert orphaned_images(storage) == []
+        tables = {name for (name,) in rows(storage, "SELECT name FROM sqlite_master WHERE type = 'table'")}
+        assert not any(name.endswith("_legacy") for name in tables)
+
+def test_storing_a_migrated_file_by_path_replaces_its_legacy_rows(database, make_page):
+    connection = sqlite3.connect(database)
+    connection.executescript("""
+    CREATE TABLE extracted_text (file_name TEXT, page_number INT, text TEXT, headings TEXT, font_styles TEXT);
+    INSERT INTO extracted_text VALUES ('a.pdf', 1, 'old text', '[]', '{}');
+    INSERT INTO extracted_text VALUES ('b.pdf', 1, 'other text', '[]', '{}');
+    """)
+    connection.commit()
+    connection.close()
+
+    with SQLiteStorage(database) as storage:
+        storage.bootstrap()
+        assert storage.document_pages("a.pdf") == [(1, "old text")]
+        storage.insert_text_rows("/docs/a.pdf", [make_page(text="new text")])
+        assert storage.document_pages("a.pdf") == []
+        assert rows(storage, "SELECT file_path FROM documents ORDER BY file_path") == [("/docs/a.pdf",), ("b.pdf",)]
+        assert rows(storage, "SELECT text FROM extracted_text ORDER BY text") == [("new text",), ("other text",)]